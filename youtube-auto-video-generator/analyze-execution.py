@@ -4,7 +4,10 @@ Analyze Step Functions execution in detail
 """
 import json
 import boto3
-from datetime import datetime
+
+from videogen.claim_check import reference_resolver
+from videogen.history import ExecutionHistoryIndex
+from videogen.history_fetch import iter_execution_history
 
 def analyze_step_functions_execution():
     client = boto3.client('stepfunctions', region_name='ap-northeast-1')
@@ -12,32 +15,16 @@ def analyze_step_functions_execution():
     execution_arn = 'arn:aws:states:ap-northeast-1:455931011903:execution:VideoGen-VideoGeneration-dev:test-execution-1749902824'
 
     # Get execution history
-    response = client.get_execution_history(executionArn=execution_arn)
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    s3 = boto3.client('s3', region_name='ap-northeast-1')
+    index = ExecutionHistoryIndex(iter_execution_history(client, execution_arn),
+                                  resolve=reference_resolver(s3))
 
     print("=" * 80)
     print("Step Functions Execution Analysis")
     print("=" * 80)
 
-    task_outputs = {}
-
-    for event in response['events']:
-        if event['type'] == 'TaskSucceeded':
-            event_id = event['id']
-            output_raw = event.get('taskSucceededEventDetails', {}).get('output')
-
-            if output_raw:
-                try:
-                    output = json.loads(output_raw)
-                    # Find corresponding task state entered event
-                    for e in response['events']:
-                        if (e['type'] == 'TaskStateEntered' and
-                            e['id'] < event_id and
-                            e.get('stateEnteredEventDetails')):
-                            task_name = e['stateEnteredEventDetails']['name']
-                            task_outputs[task_name] = output
-                            break
-                except json.JSONDecodeError:
-                    continue
+    task_outputs = index.last_outputs()
 
     # Print task outputs
     for task_name, output in task_outputs.items():
@@ -45,22 +32,34 @@ def analyze_step_functions_execution():
         print("-" * 40)
         print(json.dumps(output, indent=2, ensure_ascii=False)[:500] + "..." if len(json.dumps(output)) > 500 else json.dumps(output, indent=2, ensure_ascii=False))
 
+    # Per-state timing
+    print("\n⏱️  State Durations:")
+    print("-" * 40)
+    for state_name, durations in index.durations().items():
+        if durations:
+            print(f"{state_name}: {sum(durations):.2f}s ({len(durations)} visit(s))")
+
     # Check for data flow issues
     print("\n🔍 Data Flow Analysis:")
     print("-" * 40)
 
-    if 'ComposeVideoTask' in task_outputs:
-        compose_output = task_outputs['ComposeVideoTask']
-        print(f"ComposeVideo output keys: {list(compose_output.keys())}")
+    # In perVideo mode each Map item has its own task visits, so aggregate them
+    compose_outputs = [output.get('Payload', output) for output in index.outputs('ComposeVideoTask')]
+    if compose_outputs:
+        print(f"ComposeVideo output keys: {list(compose_outputs[-1].keys())}")
 
-        if 'composedVideos' in compose_output:
-            print(f"composedVideos count: {len(compose_output['composedVideos'])}")
+        if all('composedVideos' in output for output in compose_outputs):
+            print(f"composedVideos count: {sum(len(output['composedVideos']) for output in compose_outputs)}")
         else:
             print("❌ Missing 'composedVideos' in ComposeVideo output!")
 
-    if 'UploadToYouTubeTask' in task_outputs:
-        upload_output = task_outputs['UploadToYouTubeTask']
-        print(f"UploadToYouTube status: {upload_output.get('statusCode')}")
+    for visit in index.visits_by_state.get('UploadToYouTubeTask', []):
+        output = index.output(visit)
+        if output is None:
+            continue
+        upload_output = output.get('Payload', output)
+        item = f" (item {visit['iteration']})" if visit['iteration'] is not None else ''
+        print(f"UploadToYouTube status{item}: {upload_output.get('statusCode')}")
         if upload_output.get('statusCode') != 200:
             print(f"UploadToYouTube error: {upload_output.get('error')}")
 
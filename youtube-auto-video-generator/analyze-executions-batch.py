@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Batch Step Functions analytics - per-state latency percentiles across many runs
+"""
+import argparse
+
+import boto3
+from botocore.config import Config
+
+from videogen.analytics import append_csv, fetch_indexes, iter_executions, summarize
+
+STATE_MACHINE_ARN = 'arn:aws:states:ap-northeast-1:455931011903:stateMachine:VideoGen-VideoGeneration-dev'
+
+def _fmt(value):
+    return '-' if value is None else f"{value:.2f}"
+
+def analyze_executions_batch(state_machine_arn, max_executions, workers, output):
+    client = boto3.client(
+        'stepfunctions',
+        region_name='ap-northeast-1',
+        config=Config(max_pool_connections=workers, retries={'mode': 'adaptive'}),
+    )
+
+    print("=" * 80)
+    print("Step Functions Batch Analytics")
+    print("=" * 80)
+
+    executions = [
+        execution for execution in iter_executions(client, state_machine_arn, max_executions=max_executions)
+        if execution['status'] != 'RUNNING'
+    ]
+    print(f"📋 Analyzing {len(executions)} finished executions with {workers} workers...")
+
+    indexes = fetch_indexes(client, [e['executionArn'] for e in executions], max_workers=workers)
+    summary = summarize(indexes)
+
+    failed = sum(1 for e in executions if e['status'] != 'SUCCEEDED')
+    if executions:
+        print(f"Execution failure rate: {failed}/{len(executions)} ({failed / len(executions):.1%})")
+
+    print(f"\n{'State':<28}{'Visits':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'Retries':>9}{'Fail%':>8}")
+    print("-" * 79)
+    for row in summary:
+        print(f"{row['state']:<28}{row['visits']:>7}{_fmt(row['p50_seconds']):>9}"
+              f"{_fmt(row['p95_seconds']):>9}{_fmt(row['p99_seconds']):>9}"
+              f"{row['retries']:>9}{row['failure_rate']:>8.1%}")
+
+    append_csv(summary, output)
+    print(f"\n✅ Appended {len(summary)} rows to {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--state-machine-arn', default=STATE_MACHINE_ARN)
+    parser.add_argument('--max-executions', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--output', default='execution-stats.csv')
+    args = parser.parse_args()
+
+    analyze_executions_batch(args.state_machine_arn, args.max_executions, args.workers, args.output)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark Lambda cold starts: init duration and deployed code/layer size per function
+"""
+import argparse
+
+import boto3
+from botocore.config import Config
+
+from videogen.benchmark import load, save
+from videogen.lambda_metrics import measure_cold_starts
+
+SPREADSHEET_ID = '1LynUd8B4xuzmoTp5JwnBsZsAJ8M1Apbx271NyChXIo0'
+
+# No-op payloads: the cold start loads every module the handler requires,
+# but nothing is written. ReadSpreadsheet reads only the header row,
+# WriteScript gets no scripts and UploadToYouTube no videos
+FUNCTIONS = {
+    'ReadSpreadsheet': ('videogen-readspreadsheet-dev', {
+        "spreadsheetId": SPREADSHEET_ID,
+        "sheetName": "Sheet1",
+        "range": "A1:Z1",
+    }),
+    'WriteScript': ('videogen-writescript-dev', {"videosWithScripts": [], "spreadsheetId": SPREADSHEET_ID}),
+    'UploadToYouTube': ('videogen-uploadtoyoutube-dev', {"composedVideos": []}),
+}
+
+def megabytes(size):
+    return f"{size / 1e6:.1f}"
+
+def change(before, after):
+    if not before:
+        return '-'
+    return f"{(after - before) / before:+.0%}"
+
+def benchmark_cold_start(names, samples, output, baseline):
+    lambda_client = boto3.client(
+        'lambda',
+        region_name='ap-northeast-1',
+        config=Config(read_timeout=900, retries={'mode': 'standard'}),
+    )
+
+    print("=" * 80)
+    print("Lambda Cold Start Benchmark")
+    print("=" * 80)
+    print(f"{samples} forced cold starts per function\n")
+    print(f"{'Function':<18}{'Code MB':>9}{'Layers MB':>11}{'Init p50':>10}{'Init min':>10}"
+          f"{'Handler p50':>13}{'Cold':>6}")
+    print("-" * 77)
+
+    results = {}
+    for name in names:
+        function_name, payload = FUNCTIONS[name]
+        result = measure_cold_starts(lambda_client, function_name, payload, samples)
+        results[name] = result
+        if not result['cold_starts']:
+            print(f"{name:<18}{megabytes(result['code_bytes']):>9}{megabytes(result['layer_bytes']):>11}"
+                  f"{'-':>10}{'-':>10}{'-':>13}{0:>6}")
+            continue
+        print(f"{name:<18}{megabytes(result['code_bytes']):>9}{megabytes(result['layer_bytes']):>11}"
+              f"{result['init_ms_median']:>10.0f}{result['init_ms_min']:>10.0f}"
+              f"{result['duration_ms_median']:>13.0f}{result['cold_starts']:>6}")
+
+    save(output, results)
+    print(f"\n📝 Results written to {output}")
+
+    if baseline:
+        previous = load(baseline)
+        print(f"\nAgainst {baseline}:")
+        print(f"{'Function':<18}{'Size MB':>16}{'':>7}{'Init p50 ms':>16}{'':>7}")
+        print("-" * 64)
+        for name, result in results.items():
+            before = previous.get(name)
+            if not before or 'init_ms_median' not in before or 'init_ms_median' not in result:
+                continue
+            size = f"{megabytes(before['total_bytes'])} → {megabytes(result['total_bytes'])}"
+            init = f"{before['init_ms_median']:.0f} → {result['init_ms_median']:.0f}"
+            print(f"{name:<18}{size:>16}{change(before['total_bytes'], result['total_bytes']):>7}"
+                  f"{init:>16}{change(before['init_ms_median'], result['init_ms_median']):>7}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', nargs='*', choices=sorted(FUNCTIONS), default=sorted(FUNCTIONS))
+    parser.add_argument('--samples', type=int, default=5, help='forced cold starts per function')
+    parser.add_argument('--output', default='cold-start-results.json')
+    parser.add_argument('--baseline', help='results file from before the change to compare against')
+    args = parser.parse_args()
+
+    benchmark_cold_start(args.functions, args.samples, args.output, args.baseline)
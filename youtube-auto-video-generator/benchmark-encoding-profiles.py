@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ComposeVideo encoding profiles on the sample image and MP3 in test-data
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from videogen.compose import FFMPEG_PATH, video_filter
+from videogen.encoding import PROFILES, encode_args, get_profile
+from videogen.fixtures import png_bytes, silent_mp3_bytes
+
+SAMPLE_IMAGE = 'test-data/sample-image.png'
+SAMPLE_AUDIO = 'test-data/sample-speech.mp3'
+SAMPLE_SECONDS = 30
+
+def ensure_samples():
+    """Write the deterministic samples if they are missing"""
+    for path, generate in ((SAMPLE_IMAGE, png_bytes), (SAMPLE_AUDIO, lambda: silent_mp3_bytes(SAMPLE_SECONDS))):
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(generate())
+            print(f"📝 Generated {path}")
+
+def encode(profile, output_path):
+    command = [
+        FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-y',
+        '-loop', '1', '-framerate', str(profile['fps']), '-i', SAMPLE_IMAGE,
+        '-i', SAMPLE_AUDIO,
+        '-vf', video_filter(),
+        *encode_args(profile),
+        '-shortest', output_path,
+    ]
+    started = time.perf_counter()
+    subprocess.run(command, check=True)
+    return time.perf_counter() - started
+
+def benchmark_encoding_profiles(profile_names, repeat):
+    ensure_samples()
+
+    print("=" * 80)
+    print("Encoding Profile Benchmark")
+    print("=" * 80)
+    print(f"Input: {SAMPLE_IMAGE} + {SAMPLE_AUDIO} ({SAMPLE_SECONDS}s)")
+    print(f"\n{'Profile':<12}{'Preset':<12}{'FPS':>5}{'CRF':>5}{'Encode (s)':>12}{'Size (KB)':>12}{'kbps':>10}")
+    print("-" * 68)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        for name in profile_names:
+            profile = get_profile(name)
+            output_path = os.path.join(workdir, f"{name}.mp4")
+            best = min(encode(profile, output_path) for _ in range(repeat))
+            size = os.path.getsize(output_path)
+            print(f"{name:<12}{profile['preset']:<12}{profile['fps']:>5}{profile['crf']:>5}"
+                  f"{best:>12.2f}{size / 1024:>12.0f}{size * 8 / SAMPLE_SECONDS / 1000:>10.0f}")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--repeat', type=int, default=3, help='report the best of this many encodes')
+    args = parser.parse_args()
+
+    if shutil.which(FFMPEG_PATH) is None:
+        print(f"❌ {FFMPEG_PATH} not found; set FFMPEG_PATH to the ffmpeg binary")
+    else:
+        benchmark_encoding_profiles(args.profiles, args.repeat)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-row against batched script generation on the sample rows in test-data
+"""
+import argparse
+import time
+
+from videogen.local_handlers import read_csv_rows
+from videogen.openai_client import OpenAIClient, summarize_metrics
+from videogen.script_generation import ScriptGenerator
+from videogen.stubs import OpenAIStubServer
+
+# gpt-3.5-turbo list prices in USD per million tokens
+INPUT_PRICE = 0.50
+OUTPUT_PRICE = 1.50
+
+def run(server, concurrency, batch_size, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        client = OpenAIClient('sk-bench', base_url=server.base_url, concurrency=concurrency)
+        started = time.perf_counter()
+        result = ScriptGenerator(client, batch_size=batch_size).generate(rows)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+def benchmark_script_batching(latency, seconds_per_token, repeat):
+    rows = [(video, video['theme']) for video in read_csv_rows()]
+    modes = [
+        ('per-row, sequential', 1, 1),
+        ('per-row, concurrent', 8, 1),
+        # Batches still only take as many rows as their durations fit in one completion
+        (f'batched (up to {len(rows)} rows)', 8, len(rows)),
+    ]
+
+    print("=" * 80)
+    print("Script Batching Benchmark")
+    print("=" * 80)
+    print(f"Input: {len(rows)} sample rows, stub latency {latency * 1000:.0f} ms "
+          f"+ {seconds_per_token * 1000:.0f} ms per completion token")
+    print(f"\n{'Mode':<24}{'Requests':>9}{'Latency (s)':>13}{'Prompt':>9}{'Completion':>12}"
+          f"{'Total':>8}{'USD':>10}{'Cut off':>9}{'Retried':>9}")
+    print("-" * 103)
+
+    with OpenAIStubServer(latency=latency, seconds_per_token=seconds_per_token) as server:
+        for name, concurrency, batch_size in modes:
+            elapsed, result = run(server, concurrency, batch_size, rows, repeat)
+            summary = summarize_metrics(result['metrics'])
+            cost = (summary['promptTokens'] * INPUT_PRICE + summary['completionTokens'] * OUTPUT_PRICE) / 1e6
+            print(f"{name:<24}{result['requests']:>9}{elapsed:>13.2f}{summary['promptTokens']:>9}"
+                  f"{summary['completionTokens']:>12}{summary['totalTokens']:>8}{cost:>10.6f}"
+                  f"{result['truncated']:>9}{result['fallbacks']:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.4, help='stub time to first token, seconds')
+    parser.add_argument('--seconds-per-token', type=float, default=0.01, help='stub generation speed')
+    parser.add_argument('--repeat', type=int, default=3, help='report the fastest of this many runs')
+    args = parser.parse_args()
+
+    benchmark_script_batching(args.latency, args.seconds_per_token, args.repeat)
@@ -42,7 +42,16 @@ const lambdaHeavyStack = new LambdaHeavyStack(
 const stepFunctionsStack = new StepFunctionsStack(
   app,
   naming.stepFunctionsStackName(),
-  commonProps
+  {
+    ...commonProps,
+    processingMode:
+      app.node.tryGetContext("processingMode") || config.processingMode,
+    maxConcurrency: Number(
+      app.node.tryGetContext("maxConcurrency") || config.maxConcurrency
+    ),
+    drainUploadQueue:
+      String(app.node.tryGetContext("drainUploadQueue") ?? config.drainUploadQueue) === "true",
+  }
 );
 
 // Add dependencies to ensure proper deployment order
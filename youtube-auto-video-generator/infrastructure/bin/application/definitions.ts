@@ -0,0 +1,68 @@
+#!/usr/bin/env node
+/**
+ * Writes the synthesized state machine definitions that the local runner
+ * (videogen/local_runner.py) interprets, so local runs follow exactly what
+ * StepFunctionsStack deploys; each mode is also written with the upload queue
+ * drain enabled (<mode>-drain.asl.json). Run from infrastructure/ after changing the stack:
+ *
+ *   npx ts-node bin/application/definitions.ts          # rewrite the files
+ *   npx ts-node bin/application/definitions.ts --check  # fail if they are stale
+ */
+import * as fs from "fs";
+import * as path from "path";
+import * as cdk from "aws-cdk-lib";
+import { StepFunctionsStack } from "../../lib/application/step-functions-stack";
+import { ProcessingMode } from "../../config/stage-config";
+
+const OUTPUT_DIR = path.join("..", "videogen", "definitions");
+const MODES: ProcessingMode[] = ["batch", "perVideo"];
+
+function synthesizeDefinition(processingMode: ProcessingMode, drainUploadQueue: boolean): unknown {
+  const app = new cdk.App();
+  const stack = new StepFunctionsStack(app, "LocalDefinition", {
+    stage: "dev",
+    processingMode,
+    drainUploadQueue,
+  });
+  const template = app.synth().getStackByName(stack.stackName).template;
+  const stateMachine = Object.values(template.Resources as Record<string, any>).find(
+    (resource) => resource.Type === "AWS::StepFunctions::StateMachine"
+  );
+  const definition = stateMachine.Properties.DefinitionString;
+  const parts: unknown[] = definition["Fn::Join"] ? definition["Fn::Join"][1] : [definition];
+  return JSON.parse(parts.map(resolvePart).join(""));
+}
+
+function resolvePart(part: any): string {
+  if (typeof part === "string") {
+    return part;
+  }
+  // Imported function ARNs are written as their export names, which name the function
+  if (part["Fn::ImportValue"]) {
+    return part["Fn::ImportValue"];
+  }
+  if (part.Ref === "AWS::Partition") {
+    return "aws";
+  }
+  throw new Error(`Unexpected token in the definition: ${JSON.stringify(part)}`);
+}
+
+const check = process.argv.includes("--check");
+const stale: string[] = [];
+fs.mkdirSync(OUTPUT_DIR, { recursive: true });
+for (const [mode, drainUploadQueue] of MODES.flatMap((m) => [[m, false], [m, true]] as const)) {
+  const file = path.join(OUTPUT_DIR, `${mode}${drainUploadQueue ? "-drain" : ""}.asl.json`);
+  const content = JSON.stringify(synthesizeDefinition(mode, drainUploadQueue), null, 2) + "\n";
+  if (check) {
+    if (!fs.existsSync(file) || fs.readFileSync(file, "utf-8") !== content) {
+      stale.push(file);
+    }
+  } else {
+    fs.writeFileSync(file, content);
+    console.log(`Wrote ${file}`);
+  }
+}
+if (stale.length) {
+  console.error(`Out of date, regenerate with bin/application/definitions.ts: ${stale.join(", ")}`);
+  process.exit(1);
+}
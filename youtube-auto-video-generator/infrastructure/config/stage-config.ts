@@ -1,17 +1,33 @@
+export type ProcessingMode = "batch" | "perVideo";
+
 export interface StageConfig {
   stage: string;
   region: string;
   account?: string;
+  // "batch" passes every row through each task in one payload;
+  // "perVideo" fans out one Map iteration per spreadsheet row
+  processingMode: ProcessingMode;
+  // Upper bound on concurrent Map iterations in perVideo mode
+  maxConcurrency: number;
+  // Upload videos deferred for lack of YouTube quota before reading new
+  // rows. Off until UploadToYouTube handles the { drainUploadQueue: true } payload
+  drainUploadQueue: boolean;
 }
 
 export const stageConfigs: Record<string, StageConfig> = {
   dev: {
     stage: "dev",
     region: "ap-northeast-1", // Tokyo
+    processingMode: "batch",
+    maxConcurrency: 5,
+    drainUploadQueue: false,
   },
   prod: {
     stage: "prod",
     region: "ap-northeast-1", // Tokyo
+    processingMode: "batch",
+    maxConcurrency: 5,
+    drainUploadQueue: false,
   },
 };
 
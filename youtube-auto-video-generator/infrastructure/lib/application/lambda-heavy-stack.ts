@@ -63,6 +63,12 @@ export class LambdaHeavyStack extends cdk.Stack {
       role: lambdaHeavyRole,
       environment: {
         STAGE: props.stage,
+        // Large fields (scripts, speech marks) travel between states as S3 references
+        PAYLOAD_BUCKET: this.naming.s3Bucket("assets"),
+        PAYLOAD_PREFIX: "payloads/",
+        PAYLOAD_THRESHOLD_BYTES: "8192",
+        // Secrets and API clients are kept at module scope between warm invocations
+        SECRETS_CACHE_TTL_SECONDS: "3600",
       },
     };
 
@@ -103,6 +109,16 @@ export class LambdaHeavyStack extends cdk.Stack {
         handler: "index.handler",
         layers: [commonLayer, googleApisLayer],
         description: "Upload video to YouTube (Container Image Lambda)",
+        environment: {
+          ...commonHeavyLambdaProps.environment,
+          // Resumable upload sessions are stored here so retries continue them
+          UPLOAD_SESSION_BUCKET: this.naming.s3Bucket("assets"),
+          UPLOAD_SESSION_PREFIX: "youtube-sessions/",
+          UPLOAD_CHUNK_SIZE: String(8 * 1024 * 1024),
+          // videos.insert costs 1600 units; overflow is queued for the next quota day
+          UPLOAD_QUEUE_PREFIX: "upload-queue/",
+          YOUTUBE_DAILY_QUOTA_UNITS: "10000",
+        },
       }
     );
 
@@ -56,10 +56,17 @@ export class LambdaLightStack extends cdk.Stack {
       timeout: cdk.Duration.minutes(5),
       memorySize: 512,
       role: lambdaLightRole,
-      layers: [commonLayer, googleApisLayer],
+      // Only the Google-facing functions attach GoogleApisLayer (see below)
+      layers: [commonLayer],
       environment: {
         STAGE: props.stage,
         NODE_OPTIONS: "--enable-source-maps",
+        // Large fields (scripts, speech marks) travel between states as S3 references
+        PAYLOAD_BUCKET: this.naming.s3Bucket("assets"),
+        PAYLOAD_PREFIX: "payloads/",
+        PAYLOAD_THRESHOLD_BYTES: "8192",
+        // Secrets and API clients are kept at module scope between warm invocations
+        SECRETS_CACHE_TTL_SECONDS: "3600",
       },
     };
 
@@ -75,6 +82,7 @@ export class LambdaLightStack extends cdk.Stack {
         ),
         handler: "index.handler",
         description: "Read video data from Google Spreadsheet",
+        layers: [commonLayer, googleApisLayer],
       }
     );
 
@@ -91,6 +99,15 @@ export class LambdaLightStack extends cdk.Stack {
         handler: "index.handler",
         description: "Generate video script using OpenAI API",
         timeout: cdk.Duration.minutes(10), // OpenAI API calls may take longer
+        environment: {
+          ...commonLambdaProps.environment,
+          // Rows are generated concurrently under our tier's rate limits
+          OPENAI_REQUESTS_PER_MINUTE: "3500",
+          OPENAI_TOKENS_PER_MINUTE: "90000",
+          OPENAI_CONCURRENCY: "8",
+          // Rows per chat request; above 1, rows share one JSON-mode request
+          SCRIPT_BATCH_SIZE: "1",
+        },
       }
     );
 
@@ -104,6 +121,7 @@ export class LambdaLightStack extends cdk.Stack {
         code: lambda.Code.fromAsset("../src/lambda-light/WriteScriptFunction"),
         handler: "index.handler",
         description: "Write generated script back to Google Spreadsheet",
+        layers: [commonLayer, googleApisLayer],
       }
     );
 
@@ -120,6 +138,12 @@ export class LambdaLightStack extends cdk.Stack {
         handler: "index.handler",
         description: "Generate images using OpenAI DALL-E API",
         timeout: cdk.Duration.minutes(10), // Image generation may take longer
+        environment: {
+          ...commonLambdaProps.environment,
+          // All images of all rows are requested concurrently under the images-per-minute limit
+          OPENAI_IMAGES_PER_MINUTE: "50",
+          OPENAI_CONCURRENCY: "8",
+        },
       }
     );
 
@@ -135,6 +159,12 @@ export class LambdaLightStack extends cdk.Stack {
         ),
         handler: "index.handler",
         description: "Synthesize speech using Amazon Polly",
+        environment: {
+          ...commonLambdaProps.environment,
+          // Scripts are synthesized in sentence-aligned chunks, several at a time
+          POLLY_CHUNK_CHARACTERS: "1000",
+          POLLY_CONCURRENCY: "4",
+        },
       }
     );
 
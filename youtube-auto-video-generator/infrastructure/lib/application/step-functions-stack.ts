@@ -5,9 +5,17 @@ import * as lambda from "aws-cdk-lib/aws-lambda";
 import * as iam from "aws-cdk-lib/aws-iam";
 import { Construct } from "constructs";
 import { ResourceNaming } from "../../config/resource-naming";
+import { ProcessingMode } from "../../config/stage-config";
+
+// What a Lambda invocation that ran out of time fails with
+const UPLOAD_TIMEOUT_ERRORS = ["Sandbox.Timedout", "Lambda.Unknown"];
 
 export interface StepFunctionsStackProps extends cdk.StackProps {
   stage: string;
+  processingMode?: ProcessingMode;
+  maxConcurrency?: number;
+  // Chain DrainUploadQueueTask in front of ReadSpreadsheet (see StageConfig)
+  drainUploadQueue?: boolean;
 }
 
 export class StepFunctionsStack extends cdk.Stack {
@@ -18,6 +26,7 @@ export class StepFunctionsStack extends cdk.Stack {
     super(scope, id, props);
 
     this.naming = new ResourceNaming(props.stage);
+    const perVideo = props.processingMode === "perVideo";
 
     // Import cross-stack resources
     const stepFunctionsRoleArn = cdk.Fn.importValue(
@@ -262,41 +271,64 @@ export class StepFunctionsStack extends cdk.Stack {
       }
     );
 
+    // The error that led here is kept in the input, under $.error
     const failureState = new stepfunctions.Fail(
       this,
       "VideoGenerationFailure",
       {
         comment: "Video generation failed",
+        error: "VideoGenerationFailed",
+        cause: "A video generation step failed; see the error field of this state's input",
       }
     );
 
+    // In perVideo mode a failed video ends only its own Map iteration, so
+    // the other rows keep going; the error is kept in the iteration output
+    const taskFailureState: stepfunctions.IChainable = perVideo
+      ? new stepfunctions.Pass(this, "RecordVideoFailure", {
+          comment: "Record the failure of a single video and end its iteration",
+        })
+      : failureState;
+
     // Add error handling to individual tasks
     readSpreadsheetTask.addCatch(failureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
 
-    generateScriptTask.addCatch(failureState, {
+    generateScriptTask.addCatch(taskFailureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
 
-    writeScriptTask.addCatch(failureState, {
+    writeScriptTask.addCatch(taskFailureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
 
-    generateResourcesParallel.addCatch(failureState, {
+    generateResourcesParallel.addCatch(taskFailureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
 
-    composeVideoTask.addCatch(failureState, {
+    composeVideoTask.addCatch(taskFailureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
 
-    uploadToYouTubeTask.addCatch(failureState, {
+    // The upload session and byte offset are kept in S3, so another attempt
+    // after a Lambda timeout resumes the same upload. A function that hits
+    // its 15-minute timeout surfaces as Sandbox.Timedout (Lambda.Unknown on
+    // older runtimes); the task has no timeout of its own, so a retry never
+    // overlaps a still-running upload
+    uploadToYouTubeTask.addRetry({
+      errors: UPLOAD_TIMEOUT_ERRORS,
+      interval: cdk.Duration.seconds(30),
+      maxAttempts: 3,
+      backoffRate: 2,
+    });
+
+    uploadToYouTubeTask.addCatch(taskFailureState, {
       errors: ["States.ALL"],
       resultPath: "$.error",
     });
@@ -307,12 +339,10 @@ export class StepFunctionsStack extends cdk.Stack {
         stepfunctions.Condition.numberEquals("$.statusCode", 200),
         transformForWriteScript.next(writeScriptTask)
       )
-      .otherwise(handleGenerateScriptError.next(failureState));
+      .otherwise(handleGenerateScriptError.next(taskFailureState));
 
-    // Define the workflow with proper data flow
-    const definition = readSpreadsheetTask
-      .next(generateScriptTask)
-      .next(checkGenerateScriptResult);
+    // Steps that take videos from script generation to upload
+    const videoWorkflow = generateScriptTask.next(checkGenerateScriptResult);
 
     // Continue workflow after writeScriptTask
     writeScriptTask
@@ -321,8 +351,75 @@ export class StepFunctionsStack extends cdk.Stack {
       .next(combineResultsTask)
       .next(composeVideoTask)
       .next(transformForYouTube)
-      .next(uploadToYouTubeTask)
-      .next(successState);
+      .next(uploadToYouTubeTask);
+
+    let definition: stepfunctions.IChainable;
+    if (perVideo) {
+      // One iteration per spreadsheet row. Each iteration receives a
+      // single-element videosToProcess array, so the Lambda payload
+      // contracts are the same as in batch mode.
+      const processVideosMap = new stepfunctions.Map(
+        this,
+        "ProcessVideosMap",
+        {
+          itemsPath: "$.videosToProcess",
+          itemSelector: {
+            videosToProcess: stepfunctions.JsonPath.array(
+              stepfunctions.JsonPath.stringAt("$$.Map.Item.Value")
+            ),
+            spreadsheetId: stepfunctions.JsonPath.stringAt("$.spreadsheetId"),
+            sheetName: stepfunctions.JsonPath.stringAt("$.sheetName"),
+          },
+          maxConcurrency: props.maxConcurrency ?? 5,
+          comment: "Process each video independently from script to upload",
+        }
+      );
+      processVideosMap.itemProcessor(videoWorkflow);
+      processVideosMap.addCatch(failureState, {
+        errors: ["States.ALL"],
+        resultPath: "$.error",
+      });
+
+      definition = readSpreadsheetTask
+        .next(processVideosMap)
+        .next(successState);
+    } else {
+      uploadToYouTubeTask.next(successState);
+
+      // Define the workflow with proper data flow
+      definition = readSpreadsheetTask.next(videoWorkflow);
+    }
+
+    if (props.drainUploadQueue) {
+      // Uploads videos an earlier run deferred for lack of YouTube quota.
+      // Runs first on every (daily scheduled) execution, so deferred videos
+      // use the new quota day before anything else is generated.
+      const drainUploadQueueTask = new stepfunctionsTasks.LambdaInvoke(
+        this,
+        "DrainUploadQueueTask",
+        {
+          lambdaFunction: uploadToYouTubeFunction,
+          payload: stepfunctions.TaskInput.fromObject({ drainUploadQueue: true }),
+          resultPath: "$.drainedUploads",
+          retryOnServiceExceptions: true,
+        }
+      );
+
+      drainUploadQueueTask.addRetry({
+        errors: UPLOAD_TIMEOUT_ERRORS,
+        interval: cdk.Duration.seconds(30),
+        maxAttempts: 3,
+        backoffRate: 2,
+      });
+
+      // A failed drain must not stop today's generation
+      drainUploadQueueTask.addCatch(readSpreadsheetTask, {
+        errors: ["States.ALL"],
+        resultPath: "$.drainError",
+      });
+
+      definition = drainUploadQueueTask.next(definition);
+    }
 
     // Create the state machine
     this.videoGenerationStateMachine = new stepfunctions.StateMachine(
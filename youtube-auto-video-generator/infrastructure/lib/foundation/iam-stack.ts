@@ -37,6 +37,9 @@ export class IAMStack extends cdk.Stack {
                 "s3:PutObject",
                 "s3:DeleteObject",
                 "s3:ListBucket",
+                "s3:AbortMultipartUpload",
+                "s3:ListMultipartUploadParts",
+                "s3:ListBucketMultipartUploads",
               ],
               resources: [
                 `arn:aws:s3:::${this.naming.s3Bucket("videos")}`,
@@ -94,6 +97,9 @@ export class IAMStack extends cdk.Stack {
                 "s3:PutObject",
                 "s3:DeleteObject",
                 "s3:ListBucket",
+                "s3:AbortMultipartUpload",
+                "s3:ListMultipartUploadParts",
+                "s3:ListBucketMultipartUploads",
               ],
               resources: [
                 `arn:aws:s3:::${this.naming.s3Bucket("videos")}`,
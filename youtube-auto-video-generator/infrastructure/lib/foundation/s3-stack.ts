@@ -3,6 +3,9 @@ import * as s3 from "aws-cdk-lib/aws-s3";
 import { Construct } from "constructs";
 import { ResourceNaming } from "../../config/resource-naming";
 
+// Prefixes of the assets bucket holding generated, re-creatable objects
+const EXPIRING_ASSET_PREFIXES = ["images/", "audio/", "cache/", "payloads/", "youtube-sessions/"];
+
 export interface S3StackProps extends cdk.StackProps {
   stage: string;
 }
@@ -29,6 +32,8 @@ export class S3Stack extends cdk.Stack {
           id: "DeleteOldFiles",
           enabled: true,
           expiration: cdk.Duration.days(30), // Clean up old files after 30 days
+          // Uploads left open by failed attempts are resumed by the next retry, or dropped here
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
         },
       ],
       removalPolicy: cdk.RemovalPolicy.DESTROY, // For dev environment
@@ -43,10 +48,18 @@ export class S3Stack extends cdk.Stack {
       blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
       encryption: s3.BucketEncryption.S3_MANAGED,
       lifecycleRules: [
+        // Clean up generated assets after 7 days. Run state (sheet-state/,
+        // upload-queue/) is not expired, or row claims would vanish under a live run
+        ...EXPIRING_ASSET_PREFIXES.map((prefix) => ({
+          id: `DeleteOldFiles-${prefix.replace("/", "")}`,
+          enabled: true,
+          prefix,
+          expiration: cdk.Duration.days(7),
+        })),
         {
-          id: "DeleteOldFiles",
+          id: "AbortIncompleteUploads",
           enabled: true,
-          expiration: cdk.Duration.days(7), // Clean up assets after 7 days
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
         },
       ],
       removalPolicy: cdk.RemovalPolicy.DESTROY, // For dev environment
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the media pipeline; results are written as JSON
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+
+from videogen.analytics import summarize
+from videogen.benchmark import BenchmarkSuite, Skip, compare, load, save
+from videogen.compose import FFMPEG_PATH, compose_streaming
+from videogen.encoding import get_profile
+from videogen.fixtures import japanese_script, png_bytes, silent_mp3_bytes
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, apply_parameters, build_definition
+from videogen.s3_transfer import MIN_PART_SIZE, download_file, upload_file
+from videogen.segmented import encode_segmented
+from videogen.sheet_snapshot import IncrementalSheetReader
+from videogen.speech import SpeechSynthesizer
+from videogen.stubs import FakePollyClient, LocalS3Client, StubS3Client, linear_history
+
+AUDIO_MINUTES = (1, 3, 10)
+SHEET_ROWS = 500
+PIPELINE_ROWS = 100
+
+WORKFLOW_INPUT = {"spreadsheetId": "bench-spreadsheet", "sheetName": "Sheet1"}
+
+suite = BenchmarkSuite()
+_workdir = tempfile.mkdtemp(prefix='videogen-bench-')
+
+def sheet_rows(count):
+    sample = read_csv_rows()
+    return [dict(sample[i % len(sample)], rowIndex=i + 2) for i in range(count)]
+
+# --- compose ---------------------------------------------------------------
+
+def compose_fixture(minutes):
+    def setup():
+        if shutil.which(FFMPEG_PATH) is None:
+            raise Skip(f"{FFMPEG_PATH} not found")
+        s3 = LocalS3Client(_workdir)
+        s3.put_object(Bucket='assets', Key='images/2_1.png', Body=png_bytes())
+        s3.put_object(Bucket='assets', Key=f'audio/{minutes}min.mp3', Body=silent_mp3_bytes(minutes * 60))
+        return s3
+    return setup
+
+for _minutes in AUDIO_MINUTES:
+    @suite.benchmark(f"compose.streaming_draft_{_minutes}min", setup=compose_fixture(_minutes), repeat=3)
+    def bench_compose(s3, minutes=_minutes):
+        compose_streaming(s3, 'assets', 'images/2_1.png', f'audio/{minutes}min.mp3', 'videos',
+                          f'videos/{minutes}min.mp4', duration_seconds=minutes * 60, profile=get_profile('draft'))
+
+@suite.benchmark("compose.segmented_draft_10min", setup=compose_fixture(10), repeat=3)
+def bench_compose_segmented(s3):
+    image_path = os.path.join(_workdir, 'assets', 'images/2_1.png')
+    encode_segmented([image_path] * 3, os.path.join(_workdir, 'assets', 'audio/10min.mp3'),
+                     os.path.join(_workdir, 'segmented-10min.mp4'), 600, profile=get_profile('draft'))
+
+# --- S3 transfers ------------------------------------------------------------
+
+TRANSFER_BYTES = 8 * MIN_PART_SIZE
+
+def transfer_fixture():
+    path = os.path.join(_workdir, 'transfer.bin')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(TRANSFER_BYTES))
+    s3 = LocalS3Client(_workdir)
+    upload_file(s3, path, 'videos', 'videos/transfer.bin', part_size=MIN_PART_SIZE)
+    return s3, path
+
+@suite.benchmark(f"s3.upload_file_{TRANSFER_BYTES >> 20}mib", setup=transfer_fixture, repeat=3)
+def bench_upload_file(args):
+    s3, path = args
+    upload_file(s3, path, 'videos', 'videos/upload.bin', part_size=MIN_PART_SIZE)
+
+@suite.benchmark(f"s3.download_file_{TRANSFER_BYTES >> 20}mib", setup=transfer_fixture, repeat=3)
+def bench_download_file(args):
+    s3, _ = args
+    download_file(s3, 'videos', 'videos/transfer.bin', os.path.join(_workdir, 'download.bin'),
+                  part_size=MIN_PART_SIZE)
+
+# --- speech ------------------------------------------------------------------
+
+@suite.benchmark("speech.synthesize_10min",
+                 setup=lambda: (SpeechSynthesizer(FakePollyClient()), japanese_script(165)), repeat=3)
+def bench_synthesize(args):
+    speech, script = args
+    speech.synthesize(script)
+
+# --- payload transforms between states --------------------------------------
+
+@suite.benchmark(f"transforms.batch_pipeline_{PIPELINE_ROWS}_rows",
+                 setup=lambda: LocalStateMachine(stub_handlers(sheet_rows(PIPELINE_ROWS))))
+def bench_batch_pipeline(machine):
+    machine.run(WORKFLOW_INPUT)
+
+@suite.benchmark(f"transforms.per_video_pipeline_{PIPELINE_ROWS}_rows",
+                 setup=lambda: LocalStateMachine(stub_handlers(sheet_rows(PIPELINE_ROWS)),
+                                                 build_definition('perVideo', 10)))
+def bench_per_video_pipeline(machine):
+    machine.run(WORKFLOW_INPUT)
+
+@suite.benchmark("transforms.combine_parallel_results", number=100, setup=lambda: [
+    {'videosWithImages': [{'rowIndex': i, 'images': [{'s3Key': f'images/{i}_{n}.png'} for n in (1, 2, 3)]}
+                          for i in range(SHEET_ROWS)], 'spreadsheetId': 'bench'},
+    {'videosWithAudio': [{'rowIndex': i, 'audioS3Key': f'audio/{i}_speech.mp3'} for i in range(SHEET_ROWS)]},
+])
+def bench_combine_parallel_results(branches):
+    apply_parameters(build_definition()['States']['CombineParallelResults']['Parameters'], branches)
+
+# --- history analyzers ------------------------------------------------------
+
+def per_video_history():
+    machine = LocalStateMachine(stub_handlers(sheet_rows(PIPELINE_ROWS)), build_definition('perVideo', 10))
+    return machine.run(WORKFLOW_INPUT)['events']
+
+@suite.benchmark("history.index_per_video_run", setup=per_video_history)
+def bench_history_index(events):
+    ExecutionHistoryIndex(events).last_outputs()
+
+@suite.benchmark("history.summarize_200_executions", setup=lambda: [
+    linear_history(['ReadSpreadsheetTask', 'GenerateScriptTask', 'WriteScriptTask',
+                    'ComposeVideoTask', 'UploadToYouTubeTask'], retries={'ComposeVideoTask': i % 3})
+    for i in range(200)
+])
+def bench_summarize(histories):
+    summarize([ExecutionHistoryIndex(events) for events in histories])
+
+# --- spreadsheet parsing ----------------------------------------------------
+
+def sheet_csv():
+    path = os.path.join(_workdir, 'sheet.csv')
+    rows = sheet_rows(SHEET_ROWS)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=[key for key in rows[0] if key != 'rowIndex'])
+        writer.writeheader()
+        writer.writerows({key: value for key, value in row.items() if key != 'rowIndex'} for row in rows)
+    return path
+
+@suite.benchmark(f"sheet.read_csv_{SHEET_ROWS}_rows", setup=sheet_csv, number=10)
+def bench_read_csv(path):
+    read_csv_rows(path)
+
+@suite.benchmark(f"sheet.incremental_select_{SHEET_ROWS}_rows",
+                 setup=lambda: (IncrementalSheetReader(StubS3Client(), 'assets'), sheet_rows(SHEET_ROWS)))
+def bench_incremental_select(args):
+    reader, rows = args
+    # Completed rows with a snapshot exercise hashing and diffing without claims
+    reader.select('bench', 'Sheet1', [dict(row, status='completed') for row in rows], 'bench-run')
+
+def run_benchmarks(selected, output, baseline, threshold):
+    print("=" * 80)
+    print("Media Pipeline Benchmarks")
+    print("=" * 80)
+
+    def report(name, result):
+        if 'skipped' in result:
+            print(f"⏭️  {name:<48} skipped: {result['skipped']}")
+        else:
+            print(f"⏱️  {name:<48} {result['median'] * 1000:>10.2f} ms (min {result['min'] * 1000:.2f})")
+
+    try:
+        results = suite.run(selected, report)
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+    save(output, results)
+    print(f"\n📝 Results written to {output}")
+
+    if baseline:
+        regressions = compare(results, load(baseline), threshold)
+        for regression in regressions:
+            print(f"❌ {regression['name']}: {regression['baseline'] * 1000:.2f} ms → "
+                  f"{regression['current'] * 1000:.2f} ms ({regression['ratio']:.2f}x)")
+        if not regressions:
+            print(f"✅ No regressions over {threshold:.0%} against {baseline}")
+        return not regressions
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bench', nargs='*', help='only run benchmarks whose name contains one of these')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown of the median')
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmarks(args.bench, args.output, args.baseline, args.threshold) else 1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Run the video generation state machine locally with stub Lambda handlers
+"""
+import argparse
+import json
+
+from videogen.asset_cache import AssetCache
+from videogen.claim_check import ClaimCheckStore
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import DEFAULT_CSV_PATH, LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.stubs import StubS3Client
+from videogen.upload_queue import UploadQueue
+
+def run_local_pipeline(csv_path, rows, iterations, mode='batch', max_concurrency=5, use_cache=False,
+                       daily_quota=None, claim_check=False):
+    sheet_rows = read_csv_rows(csv_path)
+    if rows:
+        # Repeat the sample rows to reach the requested batch size
+        sheet_rows = [
+            dict(sheet_rows[i % len(sheet_rows)], rowIndex=i + 2) for i in range(rows)
+        ]
+
+    # Iterations share the in-memory bucket, so every run after the first hits the cache
+    cache = AssetCache(StubS3Client(), 'local-assets') if use_cache else None
+    queue = UploadQueue(StubS3Client(), 'local-assets', daily_quota=daily_quota) if daily_quota else None
+    claims = ClaimCheckStore(StubS3Client(), 'local-assets') if claim_check else None
+    machine = LocalStateMachine(stub_handlers(sheet_rows, LocalServices(cache=cache, queue=queue, claims=claims)),
+                                build_definition(mode, max_concurrency, drain_upload_queue=queue is not None))
+    workflow_input = {
+        "spreadsheetId": "local-spreadsheet",
+        "sheetName": "Sheet1",
+        "range": "A1:Z100"
+    }
+
+    print("=" * 80)
+    print("Local Pipeline Run")
+    print("=" * 80)
+    print(f"Rows: {len(sheet_rows)} | Iterations: {iterations} | Mode: {mode}")
+
+    results = [machine.run(workflow_input) for _ in range(iterations)]
+    last = results[-1]
+
+    print(f"\n🏁 Status: {last['status']}")
+    if last['status'] != 'SUCCEEDED':
+        print(f"Error: {last['error']}")
+        print(f"Cause: {last['cause']}")
+    else:
+        output = claims.resolve_all(last['output']) if claims else last['output']
+        print(f"Output: {json.dumps(output, indent=2, ensure_ascii=False)[:500]}")
+
+    print("\n⏱️  State Durations (last run):")
+    print("-" * 40)
+    for visit in ExecutionHistoryIndex(last['events']).visits:
+        if visit['duration'] is not None:
+            item = f"[{visit['iteration']}]" if visit['iteration'] is not None else ''
+            print(f"{visit['name'] + item:<32}{visit['duration'] * 1000:>8.2f} ms")
+
+    if cache:
+        print(f"\n🗄️  Asset cache: {cache.stats['hits']} hit(s), {cache.stats['misses']} miss(es), "
+              f"{cache.stats['evictions']} eviction(s)")
+
+    if claims:
+        print(f"\n📦 Claim check: {claims.stats['offloaded']} field(s) passed by reference, "
+              f"{claims.stats['uploaded']} object(s) written, {claims.stats['fetched']} fetched")
+
+    if queue:
+        state = queue.state()
+        print(f"\n📥 Upload quota: {state['unitsUsed']}/{daily_quota} units used on {state['quotaDay']}, "
+              f"{len(state['pending'])} video(s) deferred")
+
+    total = sum(result['duration_seconds'] for result in results)
+    print(f"\n📊 {iterations} run(s) in {total:.3f}s "
+          f"({iterations * len(sheet_rows) / total:.0f} videos/s)")
+    return last['status'] == 'SUCCEEDED'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help='sheet export to read rows from')
+    parser.add_argument('--rows', type=int, default=0, help='repeat the sample rows up to this many')
+    parser.add_argument('--iterations', type=int, default=1)
+    parser.add_argument('--mode', choices=['batch', 'perVideo'], default='batch',
+                        help='processing mode, as in the stage config')
+    parser.add_argument('--max-concurrency', type=int, default=5,
+                        help='Map state MaxConcurrency in perVideo mode')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse generated scripts, images and audio across iterations')
+    parser.add_argument('--daily-quota', type=int,
+                        help='YouTube quota units per day; uploads beyond it are queued')
+    parser.add_argument('--claim-check', action='store_true',
+                        help='pass large payload fields through S3 instead of the state data')
+    args = parser.parse_args()
+
+    run_local_pipeline(args.csv, args.rows, args.iterations, args.mode, args.max_concurrency,
+                       args.cache, args.daily_quota, args.claim_check)
@@ -2,11 +2,19 @@
 """
 Setup test data in Google Spreadsheet
 """
-import json
-import boto3
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 
+from videogen.sheets_batch import batch_get
+from videogen.warm_cache import SHEETS_SECRET_ID, default_cache
+
+def build_sheets_service(credentials_data):
+    credentials = Credentials.from_service_account_info(
+        credentials_data,
+        scopes=['https://www.googleapis.com/auth/spreadsheets']
+    )
+    return build('sheets', 'v4', credentials=credentials)
+
 def setup_test_spreadsheet():
     """Set up test data in the Google Spreadsheet"""
 
@@ -14,14 +22,11 @@ def setup_test_spreadsheet():
     print("Setting up test data in Google Spreadsheet")
     print("=" * 80)
 
-    # Get Google Sheets credentials from AWS Secrets Manager
-    secrets_client = boto3.client('secretsmanager', region_name='ap-northeast-1')
+    # Get Google Sheets credentials from AWS Secrets Manager, cached for the process
+    secrets = default_cache()
 
     try:
-        secret_response = secrets_client.get_secret_value(
-            SecretId='youtube-auto-video-generator/google-sheets-api'
-        )
-        credentials_data = json.loads(secret_response['SecretString'])
+        secrets.secret(SHEETS_SECRET_ID)
         print("✅ Retrieved Google Sheets credentials from AWS Secrets Manager")
     except Exception as e:
         print(f"❌ Failed to get credentials: {e}")
@@ -29,11 +34,7 @@ def setup_test_spreadsheet():
 
     # Initialize Google Sheets API
     try:
-        credentials = Credentials.from_service_account_info(
-            credentials_data,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        service = build('sheets', 'v4', credentials=credentials)
+        service = secrets.client('sheets', SHEETS_SECRET_ID, build_sheets_service)
         print("✅ Initialized Google Sheets API")
     except Exception as e:
         print(f"❌ Failed to initialize Google Sheets API: {e}")
@@ -53,13 +54,17 @@ def setup_test_spreadsheet():
     ]
 
     try:
-        # Clear existing data
+        # Clear existing data; a rejected credential is re-read once
         clear_range = 'Sheet1!A:Z'
-        service.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id,
-            range=clear_range,
-            body={}
-        ).execute()
+        secrets.call(
+            'sheets', SHEETS_SECRET_ID, build_sheets_service,
+            lambda service: service.spreadsheets().values().clear(
+                spreadsheetId=spreadsheet_id,
+                range=clear_range,
+                body={}
+            ).execute()
+        )
+        service = secrets.client('sheets', SHEETS_SECRET_ID, build_sheets_service)
         print("✅ Cleared existing data")
 
         # Write test data
@@ -78,13 +83,8 @@ def setup_test_spreadsheet():
         updated_cells = result.get('updatedCells', 0)
         print(f"✅ Updated {updated_cells} cells in spreadsheet")
 
-        # Verify the data was written
-        read_result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range='Sheet1!A1:H4'
-        ).execute()
-
-        values = read_result.get('values', [])
+        # Verify the data was written, reading back the same ranges in one call
+        values = batch_get(service, spreadsheet_id, [range_name])[0]
         print(f"✅ Verification: Found {len(values)} rows of data")
 
         # Print the data for confirmation
@@ -2,58 +2,58 @@
 """
 Simple Step Functions analysis - focus on each step's input and output
 """
-import json
 import boto3
 
+from videogen.claim_check import reference_resolver
+from videogen.history import ExecutionHistoryIndex
+from videogen.history_fetch import iter_execution_history
+
 def simple_analysis():
     client = boto3.client('stepfunctions', region_name='ap-northeast-1')
 
     execution_arn = 'arn:aws:states:ap-northeast-1:455931011903:execution:VideoGen-VideoGeneration-dev:test-execution-1749902824'
 
-    response = client.get_execution_history(executionArn=execution_arn)
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    s3 = boto3.client('s3', region_name='ap-northeast-1')
+    index = ExecutionHistoryIndex(iter_execution_history(client, execution_arn),
+                                  resolve=reference_resolver(s3))
 
     print("Step Functions Workflow Analysis")
     print("=" * 50)
 
-    step_count = 0
-    for event in response['events']:
-        if event['type'] == 'TaskStateEntered':
-            step_count += 1
-            step_name = event.get('stateEnteredEventDetails', {}).get('name', 'Unknown')
-            print(f"\n{step_count}. {step_name}")
-            print("-" * 30)
-
-            # Find the corresponding TaskSucceeded event
-            for next_event in response['events']:
-                if (next_event['type'] == 'TaskSucceeded' and
-                    next_event['id'] > event['id'] and
-                    next_event['id'] < event['id'] + 10):  # Should be close
-
-                    output_raw = next_event.get('taskSucceededEventDetails', {}).get('output')
-                    if output_raw:
-                        try:
-                            output = json.loads(output_raw)
-                            payload = output.get('Payload', {})
-                            status = payload.get('statusCode', 'Unknown')
-
-                            print(f"Status: {status}")
-
-                            if status == 200:
-                                # Show relevant data
-                                if 'videosToProcess' in payload:
-                                    print(f"Videos to process: {len(payload['videosToProcess'])}")
-                                elif 'processedVideos' in payload:
-                                    print(f"Processed videos: {len(payload['processedVideos'])}")
-                                elif 'composedVideos' in payload:
-                                    print(f"Composed videos: {len(payload['composedVideos'])}")
-                                elif 'uploadResults' in payload:
-                                    print(f"Upload results: {len(payload['uploadResults'])}")
-                            else:
-                                print(f"Error: {payload.get('error', 'Unknown error')}")
-
-                        except json.JSONDecodeError:
-                            print("Could not parse output")
-                    break
+    for step_count, visit in enumerate(index.task_visits(), 1):
+        item = f" (item {visit['iteration']})" if visit['iteration'] is not None else ''
+        print(f"\n{step_count}. {visit['name']}{item}")
+        print("-" * 30)
+
+        if visit['duration'] is not None:
+            print(f"Duration: {visit['duration']:.2f}s")
+
+        if visit['succeeded'] is None:
+            continue
+
+        output = index.output(visit)
+        if output is None:
+            print("Could not parse output")
+            continue
+
+        payload = output.get('Payload', {})
+        status = payload.get('statusCode', 'Unknown')
+
+        print(f"Status: {status}")
+
+        if status == 200:
+            # Show relevant data
+            if 'videosToProcess' in payload:
+                print(f"Videos to process: {len(payload['videosToProcess'])}")
+            elif 'processedVideos' in payload:
+                print(f"Processed videos: {len(payload['processedVideos'])}")
+            elif 'composedVideos' in payload:
+                print(f"Composed videos: {len(payload['composedVideos'])}")
+            elif 'uploadResults' in payload:
+                print(f"Upload results: {len(payload['uploadResults'])}")
+        else:
+            print(f"Error: {payload.get('error', 'Unknown error')}")
 
 if __name__ == "__main__":
     simple_analysis()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed asset cache offline against a stub S3 client
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from videogen.asset_cache import AssetCache
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine
+from videogen.openai_client import OpenAIClient
+from videogen.stubs import OpenAIStubServer, StubS3Client
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+
+def test_rerun_hits_cache():
+    s3 = StubS3Client()
+    rows = read_csv_rows()
+
+    first = AssetCache(s3, 'assets')
+    LocalStateMachine(stub_handlers(rows, LocalServices(cache=first))).run(WORKFLOW_INPUT)
+
+    # A fresh cache instance only sees the manifest stored in S3, like a new Lambda
+    second = AssetCache(s3, 'assets')
+    result = LocalStateMachine(stub_handlers(rows, LocalServices(cache=second))).run(WORKFLOW_INPUT)
+
+    success = result['status'] == 'SUCCEEDED' and second.stats['misses'] == 0
+    print(f"{'✅' if success else '❌'} Re-run: {second.stats['hits']} hit(s), "
+          f"{second.stats['misses']} miss(es) after {first.stats['misses']} generated asset(s)")
+    return success
+
+def test_script_inputs():
+    rows = read_csv_rows()
+    generate_script = stub_handlers(rows, LocalServices(cache=AssetCache(StubS3Client(), 'assets')))['GenerateScript']
+    generate_script({'videosToProcess': rows})
+
+    # Columns the prompt sends besides the title and theme
+    edited = [dict(rows[0], target_audience='小学生'), dict(rows[1], duration='10'), rows[2]]
+    scripts = generate_script({'videosToProcess': edited})['body']['videosWithScripts']
+    cached = [script['cached'] for script in scripts]
+    success = cached == [False, False, True]
+    print(f"{'✅' if success else '❌'} Editing target_audience or duration regenerates the script: cached={cached}")
+    return success
+
+def test_single_lookup():
+    rows = read_csv_rows()
+    cache = AssetCache(StubS3Client(), 'assets')
+    with OpenAIStubServer() as server:
+        openai = OpenAIClient('sk-test', base_url=server.base_url)
+        generate_script = stub_handlers(rows, LocalServices(cache=cache, openai=openai))['GenerateScript']
+        generate_script({'videosToProcess': rows})
+        lookups = []
+        lookup = cache.lookup
+        cache.lookup = lambda key: lookups.append(key) or lookup(key)
+        generate_script({'videosToProcess': rows})
+
+    # Hits and misses are counted from OpenAIClient.map worker threads too
+    counted = AssetCache(StubS3Client(), 'assets')
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: counted.get_or_create('images', {'n': n % 50}, lambda key: {'value': n}),
+                      range(2000)))
+    stats = counted.stats
+
+    success = True
+    if len(lookups) != len(rows):
+        print(f"❌ {len(lookups)} manifest lookups for {len(rows)} cached rows, expected one each")
+        success = False
+    if stats['hits'] + stats['misses'] != 2000:
+        print(f"❌ Concurrent calls counted {stats['hits']} hits and {stats['misses']} misses for 2000 calls")
+        success = False
+    if success:
+        print(f"✅ Each row is looked up once; {stats['hits']} hits and {stats['misses']} misses "
+              "counted across threads")
+    return success
+
+def test_eviction_policy():
+    s3 = StubS3Client()
+    now = [0]
+    cache = AssetCache(s3, 'assets', max_entries=3, max_bytes=250, max_age_seconds=100,
+                       clock=lambda: now[0])
+
+    for i in range(4):
+        now[0] += 1
+        s3_key = cache.object_key('images', f'key{i}', '.png')
+        s3.put_object(Bucket='assets', Key=s3_key, Body=b'x' * 100)
+        cache.store(f'key{i}', 'images', s3_key, 100)
+    kept_by_size = sorted(cache._load())
+
+    now[0] += 200
+    expired = cache.evict()
+    cache.flush()
+
+    success = True
+    if kept_by_size != ['key2', 'key3']:
+        print(f"❌ Size limit kept {kept_by_size}, expected the two most recent entries")
+        success = False
+    if sorted(expired) != ['key2', 'key3'] or len(s3.objects) != 1:
+        print(f"❌ Age limit evicted {expired}; {len(s3.objects)} object(s) left")
+        success = False
+    if success:
+        print("✅ Eviction keeps the bucket within the entry, size and age limits")
+    return success
+
+def test_concurrent_flush():
+    s3 = StubS3Client()
+    image, audio = AssetCache(s3, 'assets'), AssetCache(s3, 'assets')
+    image.store('image', 'images', value='png')
+    audio.store('audio', 'audio', value='mp3')
+    put_object = s3.put_object
+
+    def racing_put(**kwargs):
+        # The speech branch flushes between the image branch's read and its write
+        s3.put_object = put_object
+        audio.flush()
+        return put_object(**kwargs)
+
+    s3.put_object = racing_put
+    image.flush()
+    entries = AssetCache(s3, 'assets')._load()
+
+    success = sorted(entries) == ['audio', 'image']
+    print(f"{'✅' if success else '❌'} Concurrent flushes keep both branches' entries: {sorted(entries)}")
+    return success
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Asset Cache Offline Test")
+    print("=" * 80)
+    results = [test_rerun_hits_cache(), test_script_inputs(), test_single_lookup(),
+               test_eviction_policy(), test_concurrent_flush()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test MP3 duration probing from frame headers and the exact-length compose command
+"""
+import os
+import tempfile
+
+from videogen import mp3
+from videogen.asset_cache import AssetCache
+from videogen.compose import build_stream_command
+from videogen.fixtures import MP3_SAMPLE_RATE, MP3_SAMPLES_PER_FRAME, silent_mp3_bytes
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.stubs import StubS3Client
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def lame_tagged(seconds, delay, padding):
+    """A tagged fixture whose Info frame also carries a LAME tag with encoder delay and padding"""
+    data = bytearray(silent_mp3_bytes(seconds, tagged=True))
+    info = data.index(b'Info')
+    # Frames and bytes fields are present (flags 3), so the LAME tag follows 16 bytes in
+    lame = info + 16
+    data[lame:lame + 4] = b'LAME'
+    data[lame + 21:lame + 24] = ((delay << 12) | padding).to_bytes(3, 'big')
+    return bytes(data)
+
+def mpeg2_frames(count):
+    """MPEG-2 Layer III at 22050 Hz mono, 48 kbps, as Polly returns by default"""
+    frame = bytes([0xFF, 0xF3, 0x60, 0xC4])
+    return (frame + bytes(72 * 48000 // 22050 - 4)) * count
+
+def test_probe():
+    plain = silent_mp3_bytes(65)
+    tagged = silent_mp3_bytes(65, tagged=True)
+    frames = round(65 * MP3_SAMPLE_RATE / MP3_SAMPLES_PER_FRAME)
+    exact = frames * MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE
+    trimmed = mp3.probe(lame_tagged(65, 576, 1000))
+    return all([
+        check(mp3.probe(plain)['source'] == 'frames' and mp3.probe(plain)['duration'] == exact,
+              f"Frame headers give {exact:.3f}s without an Info header"),
+        check(mp3.probe(tagged[:4096])['duration'] == exact,
+              "An Info header gives the duration from the first frame alone"),
+        check(abs(trimmed['duration'] - (exact - 1576 / MP3_SAMPLE_RATE)) < 1e-9,
+              "LAME encoder delay and padding are not counted as audio"),
+        check(mp3.probe(mpeg2_frames(1000))['duration'] == 1000 * 576 / 22050,
+              "22.05 kHz MPEG-2 frames use 576 samples each"),
+    ])
+
+def test_probe_file():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'speech.mp3')
+        with open(path, 'wb') as f:
+            f.write(silent_mp3_bytes(600))
+        result = mp3.probe_file(path)
+    return check(abs(result['duration'] - 600) < 0.03,
+                 f"A 10-minute file is probed through mmap: {result['duration']:.3f}s")
+
+def test_compose_command():
+    sized = build_stream_command('speech.mp3', duration_seconds=612.345)
+    unknown = build_stream_command('speech.mp3')
+    return all([
+        check(sized[sized.index('-t') + 1] == '612.345' and '-shortest' not in sized,
+              "The encode is cut at the audio's exact length"),
+        check('-t' not in unknown and '-shortest' in unknown,
+              "Without a duration it stops with the audio, never at a fixed 120s"),
+    ])
+
+def test_pipeline():
+    s3 = StubS3Client()
+    rows = read_csv_rows()[:3]
+    result = LocalStateMachine(stub_handlers(rows, LocalServices(cache=AssetCache(s3, 'assets'))),
+                               build_definition()).run(WORKFLOW_INPUT)
+    history = ExecutionHistoryIndex(result['events'])
+    audio = history.outputs('SynthesizeSpeechTask')[0]['Payload']['videosWithAudio']
+    composed = history.outputs('ComposeVideoTask')[0]['Payload']['composedVideos']
+    probed = [round(mp3.probe(s3.objects[('assets', video['audioS3Key'])])['duration'], 3) for video in audio]
+    scripts = [video['script'] for video in
+               history.outputs('GenerateScriptTask')[0]['Payload']['body']['videosWithScripts']]
+    # What the 150 words-per-minute rule made of them
+    estimates = [max(1, round(len(script.split()) / 150 * 60)) for script in scripts]
+    return all([
+        check([video['durationSeconds'] for video in audio] == probed,
+              f"SynthesizeSpeech reports the stored MP3's duration: {probed}"),
+        check([video['durationSeconds'] for video in composed] == probed,
+              "ComposeVideo sizes each video to its audio"),
+        check(all(duration > 3 * estimate for duration, estimate in zip(probed, estimates)),
+              f"Japanese scripts get their real length, not the word-count estimate {estimates}"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Audio Duration Offline Test")
+    print("=" * 80)
+    results = [test_probe(), test_probe_file(), test_compose_command(), test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test claim-check offloading of large state payload fields against a stub S3 client
+"""
+from videogen.claim_check import MAX_STATE_PAYLOAD_BYTES, ClaimCheckStore, is_reference, payload_size
+from videogen.fixtures import japanese_script
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.stubs import FakeSheetsService, StubS3Client
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+# About 10 KB of UTF-8 per row: forty of them no longer fit in one state
+LONG_THEME = japanese_script(130)
+ROWS = 40
+# About 4 KB each: no single field reaches the threshold, but a row does
+MEDIUM_FIELD = japanese_script(55)
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def long_rows(count=ROWS):
+    sample = read_csv_rows()
+    return [dict(sample[i % len(sample)], rowIndex=i + 2, theme=f"{LONG_THEME}{i}") for i in range(count)]
+
+def wide_rows(count=ROWS):
+    sample = read_csv_rows()
+    return [dict(sample[i % len(sample)], rowIndex=i + 2, theme=f"{MEDIUM_FIELD}{i}",
+                 target_audience=MEDIUM_FIELD, keywords=MEDIUM_FIELD) for i in range(count)]
+
+def processed(count):
+    return {
+        'statusCode': 200,
+        'spreadsheetId': 'local-spreadsheet',
+        'processedVideos': [{'rowIndex': i + 2, 'title': f"動画{i}", 'script': LONG_THEME} for i in range(count)],
+    }
+
+def test_offload():
+    s3 = StubS3Client()
+    store = ClaimCheckStore(s3, 'assets')
+    small = {'statusCode': 200, 'videosWithAudio': [{'rowIndex': 2, 'durationSeconds': 6.3}]}
+    payload = store.offload(processed(30))
+    pinned = store.offload({'videosToProcess': [{'rowIndex': i, 'theme': LONG_THEME} for i in range(30)]})
+    return all([
+        check(store.offload(small) == small, "Small payloads pass through unchanged"),
+        check(isinstance(payload['processedVideos'], list)
+              and all(is_reference(video['script']) for video in payload['processedVideos']),
+              f"Each long script is replaced by a reference: {payload_size(processed(30))} -> "
+              f"{payload_size(payload)} bytes"),
+        check(store.stats['uploaded'] == 1,
+              f"Identical scripts are stored once ({store.stats['uploaded']} object for 30 rows)"),
+        check(isinstance(pinned['videosToProcess'], list) and is_reference(pinned['videosToProcess'][0]['theme']),
+              "Map items stay inline; only their large fields are offloaded"),
+    ])
+
+def test_lazy_resolution():
+    s3 = StubS3Client()
+    writer = ClaimCheckStore(s3, 'assets')
+    payload = writer.offload(processed(200))
+
+    # A separate Lambda: it only needs titles, so scripts are never fetched
+    reader = ClaimCheckStore(s3, 'assets')
+    titles = reader.wrap(lambda event: {'titles': [v['title'] for v in event['processedVideos']]})(payload)
+    restored = ClaimCheckStore(s3, 'assets').resolve_all(payload)
+    return all([
+        check(is_reference(payload['processedVideos']) and writer.stats['uploaded'] == 2,
+              "An array that is still too large after offloading its fields is offloaded as a whole"),
+        check(len(titles['titles']) == 200 and reader.stats['fetched'] == 1,
+              f"Reading titles fetches {reader.stats['fetched']} object, not the scripts"),
+        check(restored == processed(200), "resolve_all restores the original payload exactly"),
+    ])
+
+def test_pipeline():
+    rows = long_rows()
+    inline = LocalStateMachine(stub_handlers(rows), build_definition()).run(WORKFLOW_INPUT)
+
+    s3 = StubS3Client()
+    sheets = FakeSheetsService()
+    claims = ClaimCheckStore(s3, 'assets')
+    result = LocalStateMachine(stub_handlers(rows, LocalServices(sheets=sheets, claims=claims)),
+                               build_definition()).run(WORKFLOW_INPUT)
+    largest = max(len(event.get('stateExitedEventDetails', {}).get('output') or '')
+                  for event in result['events'])
+    history = ExecutionHistoryIndex(result['events'], resolve=ClaimCheckStore(s3, 'assets').resolve_all)
+    scripts = history.outputs('GenerateScriptTask')[0]['Payload']['body']['videosWithScripts']
+    uploads = history.outputs('UploadToYouTubeTask')[0]['Payload']['uploadResults']
+    return all([
+        check(inline['status'] == 'FAILED' and inline['error'] == 'States.DataLimitExceeded',
+              f"{ROWS} long scripts inline exceed the {MAX_STATE_PAYLOAD_BYTES >> 10} KiB state limit"),
+        check(result['status'] == 'SUCCEEDED' and len(uploads) == ROWS,
+              f"With claim checks all {len(uploads)} videos are uploaded"),
+        check(largest < 16 * 1024, f"Largest state data is {largest} characters"),
+        check(scripts[0]['script'].endswith(f"{LONG_THEME}0を解説します。"),
+              "History outputs show offloaded scripts in place"),
+        check(sheets.cells.get(('Sheet1', 2, 7), '').startswith('こんにちは'),
+              "WriteScript resolves the script it writes to the sheet"),
+    ])
+
+def test_wide_rows():
+    rows = wide_rows()
+    results = {}
+    for mode in ('batch', 'perVideo'):
+        s3 = StubS3Client()
+        sheets = FakeSheetsService()
+        claims = ClaimCheckStore(s3, 'assets')
+        result = LocalStateMachine(stub_handlers(rows, LocalServices(sheets=sheets, claims=claims)),
+                                   build_definition(mode)).run(WORKFLOW_INPUT)
+        history = ExecutionHistoryIndex(result['events'], resolve=ClaimCheckStore(s3, 'assets').resolve_all)
+        uploads = [output['Payload']['uploadResults'] for output in history.outputs('UploadToYouTubeTask')]
+        results[mode] = (result, [upload for batch in uploads for upload in batch], sheets)
+    return all([
+        check(payload_size(rows[0]) > 12 * 1000, f"Each row is {payload_size(rows[0])} bytes of medium fields"),
+        *[check(result['status'] == 'SUCCEEDED' and len(uploads) == ROWS
+                and sorted(u['rowIndex'] for u in uploads) == [row['rowIndex'] for row in rows],
+                f"{mode}: rows offloaded as a whole are resolved before handlers read them "
+                f"({result.get('error') or len(uploads)})")
+          for mode, (result, uploads, sheets) in results.items()],
+        check(results['batch'][2].cells.get(('Sheet1', 2, 7), '').startswith('こんにちは'),
+              "WriteScript writes scripts of rows that were references"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Claim Check Offline Test")
+    print("=" * 80)
+    results = [test_offload(), test_lazy_resolution(), test_pipeline(), test_wide_rows()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test forced cold-start measurement and deployment sizes against an in-memory Lambda stub
+"""
+import base64
+
+from videogen.lambda_metrics import force_cold_start, invoke_timed, measure_cold_starts, parse_report
+from videogen.stubs import StubLambdaClient
+
+FUNCTION = 'videogen-readspreadsheet-dev'
+PAYLOAD = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def function(code_bytes, layer_bytes):
+    return {
+        'CodeSize': code_bytes,
+        'Layers': [{'Arn': f'arn:aws:lambda:ap-northeast-1:123456789012:layer:layer-{n}:1', 'CodeSize': size}
+                   for n, size in enumerate(layer_bytes)],
+        'Environment': {'Variables': {'STAGE': 'dev'}},
+    }
+
+def test_parse_report():
+    cold = parse_report(base64.b64encode(b'REPORT RequestId: 1\tDuration: 120.50 ms\tBilled Duration: 121 ms\t'
+                                         b'Memory Size: 512 MB\tMax Memory Used: 90 MB\tInit Duration: 812.33 ms'))
+    warm = parse_report(base64.b64encode(b'REPORT RequestId: 2\tDuration: 15.00 ms\tBilled Duration: 15 ms'))
+    return all([
+        check(cold['cold_start'] and cold['init_duration_ms'] == 812.33 and cold['duration_ms'] == 120.5,
+              "A REPORT line with Init Duration is a cold start"),
+        check(not warm['cold_start'] and warm['init_duration_ms'] is None, "Without it the environment was warm"),
+    ])
+
+def test_force_cold_start():
+    client = StubLambdaClient({FUNCTION: function(2_000_000, [40_000_000])})
+    first = invoke_timed(client, FUNCTION, PAYLOAD)
+    warm = invoke_timed(client, FUNCTION, PAYLOAD)
+    force_cold_start(client, FUNCTION)
+    forced = invoke_timed(client, FUNCTION, PAYLOAD)
+    variables = client.get_function_configuration(FunctionName=FUNCTION)['Environment']['Variables']
+    return all([
+        check(first['cold_start'] and not warm['cold_start'], "Only the first invocation is cold"),
+        check(forced['cold_start'], "A configuration change forces the next invocation cold"),
+        check(variables['STAGE'] == 'dev' and 'COLD_START_NONCE' in variables,
+              "Existing environment variables are kept"),
+    ])
+
+def test_measure():
+    client = StubLambdaClient({FUNCTION: function(1_500_000, [4_000_000, 6_000_000])})
+    result = measure_cold_starts(client, FUNCTION, PAYLOAD, samples=3)
+    variables = client.get_function_configuration(FunctionName=FUNCTION)['Environment']['Variables']
+    return all([
+        check({key: result[key] for key in ('code_bytes', 'layer_bytes', 'total_bytes', 'layers')}
+              == {'code_bytes': 1_500_000, 'layer_bytes': 10_000_000, 'total_bytes': 11_500_000, 'layers': 2},
+              "Deployment size adds up the code and every attached layer"),
+        check(result['cold_starts'] == 3 and 'init_ms_median' in result and 'duration_ms_median' in result,
+              "Every sample is a forced cold start"),
+        check(variables == {'STAGE': 'dev'} and client.updates.count(FUNCTION) == 4,
+              "The original environment is restored after the samples"),
+    ])
+
+def test_restore_on_failure():
+    client = StubLambdaClient({FUNCTION: function(2_000_000, [])})
+    client.functions[FUNCTION]['Environment']['Variables']['COLD_START_NONCE'] = 'left-by-an-interrupted-run'
+    invoke = client.invoke
+    client.invoke = lambda **kwargs: (_ for _ in ()).throw(TimeoutError('read timeout'))
+    try:
+        measure_cold_starts(client, FUNCTION, PAYLOAD, samples=3)
+        failed = False
+    except TimeoutError:
+        failed = True
+    client.invoke = invoke
+    variables = client.get_function_configuration(FunctionName=FUNCTION)['Environment']['Variables']
+    return check(failed and variables == {'STAGE': 'dev'},
+                 "A failed invocation still restores the environment, without a stale nonce")
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Cold Start Offline Test")
+    print("=" * 80)
+    results = [test_parse_report(), test_force_cold_start(), test_measure(), test_restore_on_failure()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test streaming composition locally with the ffmpeg binary and a filesystem-backed S3
+"""
+import re
+import shutil
+import subprocess
+import tempfile
+
+from videogen.compose import FFMPEG_PATH, compose_streaming
+from videogen.mp3 import probe
+from videogen.s3_transfer import MIN_PART_SIZE, download_file, upload_file
+from videogen.stubs import LocalS3Client
+
+ASSETS_BUCKET = 'videogen-assets-local'
+VIDEOS_BUCKET = 'videogen-videos-local'
+
+# Both streams must end within about two AAC frames of the audio length
+DURATION_TOLERANCE_SECONDS = 0.05
+
+def generate_inputs(s3, seconds):
+    """Render a test image and a tone MP3 with ffmpeg and store them in the local S3"""
+    workdir = tempfile.mkdtemp()
+    try:
+        subprocess.run([FFMPEG_PATH, '-loglevel', 'error', '-y', '-f', 'lavfi',
+                        '-i', 'testsrc=size=1792x1024', '-frames:v', '1', f'{workdir}/image.png'],
+                       check=True)
+        subprocess.run([FFMPEG_PATH, '-loglevel', 'error', '-y', '-f', 'lavfi',
+                        '-i', f'sine=frequency=440:duration={seconds}', '-c:a', 'libmp3lame',
+                        '-b:a', '128k', f'{workdir}/speech.mp3'], check=True)
+        for name, key in (('image.png', 'images/2_1.png'), ('speech.mp3', 'audio/2_speech.mp3')):
+            upload_file(s3, f'{workdir}/{name}', ASSETS_BUCKET, key)
+    finally:
+        shutil.rmtree(workdir)
+
+def stream_timings(path):
+    """Start, end and largest gap between packets, in seconds, per media type.
+
+    Read from ffmpeg's framecrc packet listing, so no ffprobe is needed.
+    """
+    output = subprocess.run([FFMPEG_PATH, '-v', 'error', '-i', path, '-map', '0', '-c', 'copy',
+                             '-f', 'framecrc', '-'], check=True, capture_output=True, text=True).stdout
+    time_bases, media_types, packets = {}, {}, {}
+    for line in output.splitlines():
+        header = re.match(r'#(tb|media_type) (\d+): (\S+)', line)
+        if header:
+            kind, stream, value = header.groups()
+            if kind == 'tb':
+                numerator, denominator = value.split('/')
+                time_bases[stream] = int(numerator) / int(denominator)
+            else:
+                media_types[stream] = value
+        elif not line.startswith('#'):
+            stream, _, pts, duration = [field.strip() for field in line.split(',')[:4]]
+            packets.setdefault(stream, []).append((int(pts) * time_bases[stream],
+                                                   int(duration) * time_bases[stream]))
+    timings = {}
+    for stream, times in packets.items():
+        times.sort()
+        timings[media_types[stream]] = {
+            'start': times[0][0],
+            'end': times[-1][0] + times[-1][1],
+            'gap': max((b[0] - a[0] - a[1] for a, b in zip(times, times[1:])), default=0),
+        }
+    return timings
+
+def test_compose_streaming(seconds=20):
+    root = tempfile.mkdtemp()
+    try:
+        s3 = LocalS3Client(root)
+        generate_inputs(s3, seconds)
+        audio = probe(s3.get_object(Bucket=ASSETS_BUCKET, Key='audio/2_speech.mp3')['Body'].read())
+        result = compose_streaming(s3, ASSETS_BUCKET, 'images/2_1.png', 'audio/2_speech.mp3',
+                                   VIDEOS_BUCKET, 'videos/composed_2.mp4', part_size=MIN_PART_SIZE,
+                                   duration_seconds=audio['duration'])
+        local_path = f"{root}/composed_2.mp4"
+        download_file(s3, VIDEOS_BUCKET, 'videos/composed_2.mp4', local_path, part_size=MIN_PART_SIZE)
+        timings = stream_timings(local_path)
+        sized = all(abs(stream['end'] - audio['duration']) < DURATION_TOLERANCE_SECONDS
+                    for stream in timings.values())
+        in_sync = (abs(timings['video']['start'] - timings['audio']['start']) < 0.001
+                   and timings['audio']['gap'] < 0.001)
+        success = sized and in_sync
+        print(f"{'✅' if sized else '❌'} Composed {result['size']} bytes in {result['parts']} part(s): "
+              f"video {timings['video']['end']:.3f}s, audio {timings['audio']['end']:.3f}s "
+              f"for {audio['duration']:.2f}s of audio (from its {audio['source']})")
+        print(f"{'✅' if in_sync else '❌'} Video starts at {timings['video']['start']:.3f}s, "
+              f"audio at {timings['audio']['start']:.3f}s with a {timings['audio']['gap']:.3f}s largest gap")
+        return success
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Streaming Composition Test")
+    print("=" * 80)
+    if shutil.which(FFMPEG_PATH) is None:
+        print(f"⚠️  {FFMPEG_PATH} not found; set FFMPEG_PATH to run this test")
+        result = 'SKIPPED'
+    else:
+        result = 'PASSED' if all([test_compose_streaming(20), test_compose_streaming(150)]) else 'FAILED'
+    print("=" * 80)
+    print(f"Test Result: {result}")
+    print("=" * 80)
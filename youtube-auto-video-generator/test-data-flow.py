@@ -5,10 +5,14 @@ Test data flow between Lambda functions to understand format issues
 import json
 import boto3
 
+from videogen.claim_check import reference_resolver
+
 def test_lambda_chain():
     """Test the chain of Lambda functions to understand data flow"""
 
     lambda_client = boto3.client('lambda', region_name='ap-northeast-1')
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    resolve_references = reference_resolver(boto3.client('s3', region_name='ap-northeast-1'))
 
     print("=" * 80)
     print("Testing Lambda Function Chain Data Flow")
@@ -56,7 +60,7 @@ def test_lambda_chain():
         return
 
     # Show what data is actually output
-    processed_videos = script_result.get('processedVideos', [])
+    processed_videos = resolve_references(script_result.get('processedVideos', []))
     if processed_videos:
         print(f"   📊 Processed {len(processed_videos)} videos")
         print(f"   🔑 First video keys: {list(processed_videos[0].keys())}")
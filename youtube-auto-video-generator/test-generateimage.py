@@ -2,8 +2,12 @@
 import boto3
 import json
 
+from videogen.claim_check import reference_resolver
+
 # Lambda client
 lambda_client = boto3.client('lambda', region_name='ap-northeast-1')
+# Fields offloaded to S3 in claim-check mode are fetched and shown in place
+resolve_references = reference_resolver(boto3.client('s3', region_name='ap-northeast-1'))
 
 # Test payload for GenerateImage
 test_payload = {
@@ -35,7 +39,7 @@ try:
     response_payload = json.loads(response['Payload'].read())
 
     print("\nResponse Status Code:", response['StatusCode'])
-    print("Response:", json.dumps(response_payload, indent=2, ensure_ascii=False))
+    print("Response:", json.dumps(resolve_references(response_payload), indent=2, ensure_ascii=False))
 
 except Exception as e:
     print(f"Error: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test execution history fetching, caching and batch analytics offline against a stub client
+"""
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from videogen.analytics import fetch_indexes, iter_executions, summarize
+from videogen.history import ExecutionHistoryIndex
+from videogen.history_fetch import iter_execution_history
+from videogen.stubs import StubStepFunctionsClient, linear_history
+
+TASKS = [
+    'ReadSpreadsheetTask',
+    'GenerateScriptTask',
+    'WriteScriptTask',
+    'ComposeVideoTask',
+    'UploadToYouTubeTask',
+]
+
+def test_history_pagination_and_cache():
+    execution_arn = 'arn:aws:states:ap-northeast-1:000000000000:execution:VideoGen-VideoGeneration-dev:offline'
+    events = linear_history(TASKS, retries={'ComposeVideoTask': 2})
+    client = StubStepFunctionsClient({execution_arn: events}, page_size=4)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fetched = list(iter_execution_history(client, execution_arn, cache_dir=cache_dir))
+        first_calls = len(client.calls)
+
+        if len(fetched) != len(events):
+            print(f"❌ Pagination: fetched {len(fetched)} of {len(events)} events")
+            return False
+        print(f"✅ Pagination: {len(fetched)} events over {first_calls} pages")
+
+        cached = list(iter_execution_history(client, execution_arn, cache_dir=cache_dir))
+        if len(client.calls) != first_calls:
+            print(f"❌ Cache: expected no API calls, got {len(client.calls) - first_calls}")
+            return False
+        if cached != fetched:
+            print("❌ Cache: cached events differ from fetched events")
+            return False
+        print("✅ Cache: second read served from disk with 0 API calls")
+
+    index = ExecutionHistoryIndex(fetched)
+    attempts = index.visits_by_state['ComposeVideoTask'][0]['attempts']
+    if attempts != 3:
+        print(f"❌ Index: expected 3 ComposeVideoTask attempts, got {attempts}")
+        return False
+    print(f"✅ Index: {len(index.task_visits())} task visits, status {index.execution['status']}")
+    return True
+
+def test_batch_analytics():
+    state_machine_arn = 'arn:aws:states:ap-northeast-1:000000000000:stateMachine:VideoGen-VideoGeneration-dev'
+    start = datetime(2025, 6, 14, tzinfo=timezone.utc)
+    executions = {}
+    for i in range(20):
+        execution_arn = f"{state_machine_arn.replace(':stateMachine:', ':execution:')}:run-{i}"
+        executions[execution_arn] = linear_history(
+            TASKS,
+            start=start + timedelta(hours=i),
+            step_seconds=1.0 + i,
+            retries={'GenerateScriptTask': 1} if i % 5 == 0 else None,
+            failed_state='UploadToYouTubeTask' if i % 4 == 0 else None,
+        )
+    client = StubStepFunctionsClient(executions, page_size=7)
+
+    listed = list(iter_executions(client, state_machine_arn))
+    if len(listed) != 20:
+        print(f"❌ list_executions pagination: got {len(listed)} of 20 executions")
+        return False
+    print(f"✅ list_executions pagination: {len(listed)} executions")
+
+    indexes = fetch_indexes(client, [e['executionArn'] for e in listed], max_workers=4, cache_dir=None)
+    summary = {row['state']: row for row in summarize(indexes)}
+
+    compose = summary['ComposeVideoTask']
+    upload = summary['UploadToYouTubeTask']
+    script = summary['GenerateScriptTask']
+    checks = [
+        (compose['p50_seconds'] == 10.5, f"ComposeVideoTask p50 {compose['p50_seconds']}"),
+        (upload['failure_rate'] == 0.25, f"UploadToYouTubeTask failure rate {upload['failure_rate']}"),
+        (script['retries'] == 4, f"GenerateScriptTask retries {script['retries']}"),
+    ]
+    for ok, label in checks:
+        print(f"{'✅' if ok else '❌'} {label}")
+    return all(ok for ok, _ in checks)
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Execution History Offline Test")
+    print("=" * 80)
+    success = test_history_pagination_and_cache()
+    success = test_batch_analytics() and success
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -1,34 +1,47 @@
 #!/usr/bin/env python3
 """
-Complete Integration Test Suite for Yo        'ComposeVideo': {
-            "videosWithImages": [{
-                "title": "AI基礎入門",
-                "imageS3Key": "images/test-image.jpg",
-                "rowIndex": 2
-            }],
-            "videosWithAudio": [{
-                "title": "AI基礎入門",
-                "audioS3Key": "audio/test-audio.mp3",
-                "rowIndex": 2
-            }]
-        },
-        'UploadToYouTube': {
-            "composedVideos": [{
-                "title": "AI基礎入門",
-                "description": "AI基礎入門の動画です。",
-                "videoS3Key": "videos/test-video.mp4",
-                "rowIndex": 2
-            }]
-        } Generator
+Complete Integration Test Suite for YouTube Auto Video Generator
 """
-import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
-import time
+from botocore.config import Config
 
-def test_all_lambda_functions():
+from videogen.lambda_metrics import invoke_timed
+
+# Functions sharing the spreadsheet run in order; every other function is
+# independent and is invoked concurrently alongside this chain.
+SPREADSHEET_CHAIN = ['ReadSpreadsheet', 'GenerateScript', 'WriteScript']
+
+def _run_function(lambda_client, lambda_name, payload, repeat):
+    """Invoke one function ``repeat`` times and classify the result"""
+    invocations = []
+    for _ in range(repeat):
+        try:
+            invocations.append(invoke_timed(lambda_client, lambda_name, payload))
+        except Exception as e:
+            return {'status': 'ERROR', 'error': str(e), 'invocations': invocations}
+
+    for invocation in invocations:
+        if invocation['status_code'] != 200:
+            return {'status': 'FAILED', 'error': f"HTTP {invocation['status_code']}", 'invocations': invocations}
+        response_payload = invocation['payload'] or {}
+        if response_payload.get('statusCode') != 200:
+            return {'status': 'FAILED', 'error': response_payload.get('error', 'Unknown error'), 'invocations': invocations}
+    return {'status': 'SUCCESS', 'invocations': invocations}
+
+def test_all_lambda_functions(repeat=1):
     """Test all Lambda functions with updated function names"""
 
-    lambda_client = boto3.client('lambda', region_name='ap-northeast-1')
+    # One client shared by every worker; its connection pool is sized so the
+    # concurrent invocations never wait on each other for a connection.
+    # Standard retries absorb throttling; function errors are not retried.
+    lambda_client = boto3.client(
+        'lambda',
+        region_name='ap-northeast-1',
+        config=Config(max_pool_connections=16, read_timeout=900, retries={'mode': 'standard'}),
+    )
 
     # Function names (updated)
     functions = {
@@ -111,38 +124,46 @@ def test_all_lambda_functions():
     print("Complete Lambda Functions Integration Test")
     print("=" * 80)
 
-    results = {}
-
-    for func_name, lambda_name in functions.items():
-        print(f"\n🧪 Testing {func_name} ({lambda_name})...")
-
-        try:
-            payload = test_data[func_name]
-
-            response = lambda_client.invoke(
-                FunctionName=lambda_name,
-                InvocationType='RequestResponse',
-                Payload=json.dumps(payload)
+    def run_chain(names):
+        outcomes = {}
+        for func_name in names:
+            print(f"\n🧪 Testing {func_name} ({functions[func_name]})...")
+            outcomes[func_name] = _run_function(
+                lambda_client, functions[func_name], test_data[func_name], repeat
             )
+        return outcomes
 
-            if response['StatusCode'] == 200:
-                response_payload = json.loads(response['Payload'].read())
-
-                if response_payload.get('statusCode') == 200:
-                    print(f"   ✅ {func_name}: SUCCESS")
-                    results[func_name] = 'SUCCESS'
-                else:
-                    print(f"   ❌ {func_name}: FAILED - {response_payload.get('error', 'Unknown error')}")
-                    results[func_name] = 'FAILED'
-            else:
-                print(f"   ❌ {func_name}: FAILED - HTTP {response['StatusCode']}")
-                results[func_name] = 'FAILED'
-
-        except Exception as e:
-            print(f"   ❌ {func_name}: ERROR - {str(e)}")
-            results[func_name] = 'ERROR'
+    independent = [name for name in functions if name not in SPREADSHEET_CHAIN]
+    with ThreadPoolExecutor(max_workers=len(independent) + 1) as pool:
+        chain_future = pool.submit(run_chain, SPREADSHEET_CHAIN)
+        futures = {name: pool.submit(run_chain, [name]) for name in independent}
+        outcomes = chain_future.result()
+        for future in futures.values():
+            outcomes.update(future.result())
 
-        time.sleep(1)  # Brief pause between tests
+    results = {}
+    for func_name in functions:
+        outcome = outcomes[func_name]
+        results[func_name] = outcome['status']
+        if outcome['status'] == 'SUCCESS':
+            print(f"   ✅ {func_name}: SUCCESS")
+        else:
+            print(f"   ❌ {func_name}: {outcome['status']} - {outcome['error']}")
+
+    # Latency
+    print("\n" + "=" * 80)
+    print("LATENCY (ms)")
+    print("=" * 80)
+    print(f"{'Function':<18}{'Cold start':>11}{'Init':>9}{'First':>10}{'Warm avg':>10}")
+    for func_name in functions:
+        invocations = outcomes[func_name]['invocations']
+        if not invocations:
+            continue
+        first, warm = invocations[0], invocations[1:]
+        init = f"{first['init_duration_ms']:.0f}" if first['cold_start'] else '-'
+        warm_avg = f"{sum(i['latency_ms'] for i in warm) / len(warm):.0f}" if warm else '-'
+        print(f"{func_name:<18}{'yes' if first['cold_start'] else 'no':>11}{init:>9}"
+              f"{first['latency_ms']:>10.0f}{warm_avg:>10}")
 
     # Summary
     print("\n" + "=" * 80)
@@ -166,4 +187,9 @@ def test_all_lambda_functions():
         return False
 
 if __name__ == "__main__":
-    test_all_lambda_functions()
+    parser = argparse.ArgumentParser(description='Invoke every Lambda function once, concurrently')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='invocations per function; repeats after the first measure warm latency')
+    args = parser.parse_args()
+
+    test_all_lambda_functions(repeat=args.repeat)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test the asyncio execution monitor offline against a stub client
+"""
+import asyncio
+
+from videogen.monitor import ExecutionMonitor
+from videogen.stubs import StubStepFunctionsClient, linear_history
+
+TASKS = [
+    'ReadSpreadsheetTask',
+    'GenerateScriptTask',
+    'WriteScriptTask',
+    'ComposeVideoTask',
+    'UploadToYouTubeTask',
+]
+
+def test_monitor_many_executions():
+    prefix = 'arn:aws:states:ap-northeast-1:000000000000:execution:VideoGen-VideoGeneration-dev'
+    executions = {
+        f"{prefix}:run-{i}": linear_history(TASKS, failed_state='ComposeVideoTask' if i == 2 else None)
+        for i in range(5)
+    }
+    client = StubStepFunctionsClient(executions, page_size=3, reveal_per_call=4)
+
+    seen = {arn: [] for arn in executions}
+    monitor = ExecutionMonitor(
+        client,
+        on_event=lambda arn, event: seen[arn].append(event['id']),
+        min_interval=0.001,
+        max_interval=0.01,
+    )
+    results = asyncio.run(monitor.watch_all(list(executions)))
+
+    success = True
+    for (arn, events), result in zip(executions.items(), results):
+        expected_status = 'FAILED' if arn.endswith('run-2') else 'SUCCEEDED'
+        if result['status'] != expected_status:
+            print(f"❌ {arn}: status {result['status']}, expected {expected_status}")
+            success = False
+        if seen[arn] != [event['id'] for event in events]:
+            print(f"❌ {arn}: transitions reported out of order or missing")
+            success = False
+
+    total_events = sum(len(events) for events in executions.values())
+    print(f"{'✅' if success else '❌'} Tracked {len(executions)} executions, "
+          f"{total_events} events in {len(client.calls)} API calls")
+    return success
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Execution Monitor Offline Test")
+    print("=" * 80)
+    success = test_monitor_many_executions()
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
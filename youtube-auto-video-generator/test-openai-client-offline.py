@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test the concurrent, rate-limited OpenAI client against a local HTTP stub that emulates rate limits
+"""
+import time
+from datetime import datetime, timezone
+
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.openai_client import OpenAIClient, OpenAIError, summarize_metrics
+from videogen.rate_limit import RateLimiter, TokenBucket, retry_after_seconds
+from videogen.stubs import OpenAIStubServer
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+MESSAGES = [{'role': 'user', 'content': 'Python入門\nテーマ: 変数とデータ型'}]
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.take(60)
+    empty = bucket.delay(1)
+    clock.now += 30
+    refilled = bucket.delay(31)
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+    limiter.acquire(800)
+    waited = limiter.acquire(800)
+    limiter.settle(800, 200)
+    return all([
+        check(abs(empty - 1.0) < 1e-9, "An empty 60/min bucket has the next unit in 1s"),
+        check(abs(refilled - 1.0) < 1e-9, "It refills continuously: 30 units after 30s"),
+        check(abs(waited - 36.0) < 1e-6, f"A call over the TPM budget waits {waited:.0f}s for tokens"),
+        check(limiter.tokens.level == 600, "Unused estimated tokens are given back after the call"),
+    ])
+
+def test_retry_after():
+    now = datetime(2026, 1, 15, 12, 0, 0, tzinfo=timezone.utc)
+    return all([
+        check(retry_after_seconds({'retry-after': '7'}) == 7, "Retry-After in seconds"),
+        check(retry_after_seconds({'retry-after': 'Thu, 15 Jan 2026 12:00:20 GMT'}, now=now) == 20,
+              "Retry-After as an HTTP date"),
+        check(retry_after_seconds({'retry-after': '1', 'retry-after-ms': '250'}) == 0.25,
+              "retry-after-ms is more precise and wins"),
+        check(retry_after_seconds({}) is None, "No header, no hint"),
+    ])
+
+def test_concurrency():
+    timings = {}
+    with OpenAIStubServer(latency=0.05) as server:
+        for concurrency in (1, 8):
+            client = OpenAIClient('sk-test', base_url=server.base_url, concurrency=concurrency)
+            started = time.perf_counter()
+            results = client.map(lambda n: client.chat(MESSAGES, max_tokens=200), range(16))
+            timings[concurrency] = time.perf_counter() - started
+    return all([
+        check(len(results) == 16 and server.max_in_flight == 8, f"At most {server.max_in_flight} requests in flight"),
+        check(timings[1] / timings[8] > 4,
+              f"{timings[1]:.2f}s sequential vs {timings[8]:.2f}s with 8 concurrent requests"),
+    ])
+
+def test_rate_limits():
+    # 10 requests per half second: a 20/s rate with bursts of 10
+    # The client is tuned a little under the server's limit, as in production
+    limits = dict(requests_per_minute=10, period=0.5)
+    with OpenAIStubServer(**limits) as server:
+        client = OpenAIClient('sk-test', base_url=server.base_url, requests_per_minute=9,
+                              tokens_per_minute=None, period=0.5)
+        started = time.perf_counter()
+        client.map(lambda n: client.chat(MESSAGES, max_tokens=100), range(40))
+        elapsed = time.perf_counter() - started
+        limited = server.throttled
+    with OpenAIStubServer(**limits) as server:
+        client = OpenAIClient('sk-test', base_url=server.base_url, requests_per_minute=None,
+                              tokens_per_minute=None, max_retries=30, base_delay=0.1, period=0.5)
+        results = client.map(lambda n: client.chat(MESSAGES, max_tokens=100), range(40))
+        unlimited = server.throttled
+    summary = summarize_metrics(client.metrics)
+    return all([
+        check(limited == 0 and 1.3 < elapsed < 3,
+              f"Tuned just under the server's limit: no 429s, 40 requests paced over {elapsed:.2f}s"),
+        check(unlimited > 0 and len(results) == 40 and summary['throttled'] == unlimited,
+              f"Without a limiter the server sends {unlimited} 429s, all retried to success"),
+    ])
+
+def test_retry_after_honoured():
+    clock = FakeClock()
+    with OpenAIStubServer(throttle=2, throttle_seconds=3) as server:
+        client = OpenAIClient('sk-test', base_url=server.base_url, base_delay=0, clock=clock,
+                              sleep=clock.sleep)
+        result = client.chat(MESSAGES)
+        # A budget that does not refill during the test: what is left is what was charged
+        budgeted = OpenAIClient('sk-test', base_url=server.base_url, tokens_per_minute=100000,
+                                period=1e9, base_delay=0, clock=clock, sleep=clock.sleep)
+        server.throttle, server.requests = 2, []
+        charged = budgeted.chat(MESSAGES)['usage']['total_tokens']
+        remaining = budgeted.chat_limiter.tokens.level
+        refusing = OpenAIClient('sk-test', base_url=server.base_url, max_retries=1, base_delay=0,
+                                clock=clock, sleep=clock.sleep)
+        server.throttle, server.requests = 5, []
+        try:
+            refusing.chat(MESSAGES)
+            gave_up = False
+        except OpenAIError as e:
+            gave_up = e.status == 429
+    metrics = result['metrics']
+    return all([
+        check(metrics['attempts'] == 3 and metrics['throttled'] == 2, "Two 429s, then success"),
+        check(clock.sleeps[:2] == [3.0, 3.0] and metrics['waited'] == 6.0,
+              f"Each retry waits the {clock.sleeps[0]:.0f}s Retry-After the server asked for"),
+        check(abs(100000 - remaining - charged) < 1e-3,
+              f"Two 429s and a success charge the token budget once: {100000 - remaining:.0f} tokens"),
+        check(gave_up, "Throttling past max_retries raises OpenAIError"),
+    ])
+
+def test_metrics():
+    with OpenAIStubServer(latency=0.01) as server:
+        client = OpenAIClient('sk-test', base_url=server.base_url)
+        chat = client.chat(MESSAGES, max_tokens=300)
+        image = client.generate_image('thumbnail: Python入門')
+    summary = summarize_metrics(client.metrics)
+    return all([
+        check(chat['metrics']['totalTokens'] == chat['usage']['total_tokens'] > 0
+              and chat['metrics']['latency'] >= 0.01,
+              f"Chat call: {chat['metrics']['latency'] * 1000:.0f} ms, {chat['metrics']['totalTokens']} tokens"),
+        check(image['data'].startswith(b'\x89PNG') and image['metrics']['endpoint'] == '/images/generations',
+              "Image call returns the decoded PNG"),
+        check(summary['calls'] == 2 and summary['totalTokens'] == chat['usage']['total_tokens'],
+              f"Summary: {summary['calls']} calls, p95 {summary['latencyP95'] * 1000:.0f} ms"),
+    ])
+
+def test_pipeline():
+    sample = read_csv_rows()
+    rows = [dict(sample[i % len(sample)], rowIndex=i + 2, title=f"{sample[i % len(sample)]['title']} {i}")
+            for i in range(30)]
+    timings = {}
+    with OpenAIStubServer(requests_per_minute=3500, images_per_minute=500, latency=0.02) as server:
+        for concurrency in (1, 8):
+            client = OpenAIClient('sk-test', base_url=server.base_url, concurrency=concurrency,
+                                  images_per_minute=500)
+            machine = LocalStateMachine(stub_handlers(rows, LocalServices(openai=client)), build_definition())
+            result = machine.run(WORKFLOW_INPUT)
+            # Only the states that call the API; the local speech stub takes as long either way
+            timings[concurrency] = sum(visit['duration'] for visit in ExecutionHistoryIndex(result['events']).visits
+                                       if visit['name'] in ('GenerateScriptTask', 'GenerateImageTask'))
+    history = ExecutionHistoryIndex(result['events'])
+    script_metrics = history.outputs('GenerateScriptTask')[0]['Payload']['openaiMetrics']
+    image_output = history.outputs('GenerateImageTask')[0]['Payload']
+    scripts = history.outputs('GenerateScriptTask')[0]['Payload']['body']['videosWithScripts']
+    return all([
+        check(result['status'] == 'SUCCEEDED' and script_metrics['calls'] == 30
+              and image_output['openaiMetrics']['calls'] == 90,
+              "30 scripts and 90 images are generated through the client"),
+        check(all(video['script'].startswith('こんにちは！' + video['title']) for video in scripts),
+              "Scripts come back from the API in row order"),
+        check([image['kind'] for image in image_output['videosWithImages'][0]['images']]
+              == ['thumbnail', 'explanation', 'background'], "Images keep their row and kind"),
+        check(server.throttled == 0 and timings[1] / timings[8] > 3,
+              f"30-row generation: {timings[1]:.2f}s sequential vs {timings[8]:.2f}s concurrent"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("OpenAI Client Offline Test")
+    print("=" * 80)
+    results = [test_token_bucket(), test_retry_after(), test_concurrency(), test_rate_limits(),
+               test_retry_after_honoured(), test_metrics(), test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
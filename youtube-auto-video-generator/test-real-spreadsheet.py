@@ -6,11 +6,15 @@ import json
 import boto3
 import os
 
+from videogen.claim_check import reference_resolver
+
 def test_read_real_spreadsheet():
     """Test ReadSpreadsheet Lambda function with real spreadsheet ID"""
 
     # Initialize Lambda client
     lambda_client = boto3.client('lambda', region_name='ap-northeast-1')
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    resolve_references = reference_resolver(boto3.client('s3', region_name='ap-northeast-1'))
 
     # Function name
     function_name = 'videogen-readspreadsheet-dev'
@@ -38,7 +42,7 @@ def test_read_real_spreadsheet():
 
         # Read response payload
         response_payload = json.loads(response['Payload'].read())
-        print(f"Response: {json.dumps(response_payload, indent=2, ensure_ascii=False)}")
+        print(f"Response: {json.dumps(resolve_references(response_payload), indent=2, ensure_ascii=False)}")
 
         # Check if successful
         if response['StatusCode'] == 200:
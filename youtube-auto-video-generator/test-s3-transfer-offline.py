@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test concurrent multipart upload, ranged download and resume against a filesystem-backed S3
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from videogen.s3_transfer import MIN_PART_SIZE, download_file, upload_file
+from videogen.stubs import LocalS3Client
+
+BUCKET = 'videogen-videos-local'
+KEY = 'videos/composed_2_1700000000.mp4'
+SIZE = 4 * MIN_PART_SIZE + 12345
+
+class FlakyS3:
+    """Wraps an S3 client: fails the n-th call of an operation, optionally adds latency"""
+
+    def __init__(self, s3, fail=None, latency=0):
+        self.s3 = s3
+        self.fail = dict(fail or {})
+        self.latency = latency
+        self.counts = {}
+
+    def __getattr__(self, name):
+        method = getattr(self.s3, name)
+
+        def call(**kwargs):
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if self.fail.get(name) == self.counts[name]:
+                raise ConnectionError(f"injected {name} failure")
+            if self.latency and name in ('upload_part', 'get_object'):
+                time.sleep(self.latency)
+            return method(**kwargs)
+        return call
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def write_file(path, seed, size=SIZE):
+    data = random.Random(seed).randbytes(size)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return data
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_upload_resume(root):
+    s3 = LocalS3Client(root)
+    source = os.path.join(root, 'source.mp4')
+    data = write_file(source, seed=1)
+
+    flaky = FlakyS3(s3, fail={'upload_part': 4})
+    try:
+        upload_file(flaky, source, BUCKET, KEY, part_size=MIN_PART_SIZE, concurrency=1)
+        failed = False
+    except ConnectionError:
+        failed = True
+
+    retry = FlakyS3(s3)
+    result = upload_file(retry, source, BUCKET, KEY, part_size=MIN_PART_SIZE, concurrency=1)
+    stored = read_file(s3._path(BUCKET, KEY))
+    return all([
+        check(failed, "First attempt fails on part 4"),
+        check(result['resumed'] >= 3
+              and result['resumed'] + retry.counts.get('upload_part') == result['parts'],
+              f"Retry keeps {result['resumed']} part(s) and sends {retry.counts.get('upload_part')}"),
+        check(stored == data, f"Uploaded object matches the file ({result['parts']} parts)"),
+        check(not s3.list_multipart_uploads(Bucket=BUCKET, Prefix=KEY)['Uploads'],
+              "No multipart upload is left open"),
+    ])
+
+def test_download_resume(root):
+    s3 = LocalS3Client(root)
+    data = random.Random(2).randbytes(SIZE)
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=data)
+    target = os.path.join(root, 'download', 'video.mp4')
+
+    flaky = FlakyS3(s3, fail={'get_object': 3})
+    try:
+        download_file(flaky, BUCKET, KEY, target, part_size=MIN_PART_SIZE, concurrency=1)
+        failed = False
+    except ConnectionError:
+        failed = True
+
+    retry = FlakyS3(s3)
+    result = download_file(retry, BUCKET, KEY, target, part_size=MIN_PART_SIZE, concurrency=1)
+    resumed_ok = (result['resumed'] >= 2
+                  and result['resumed'] + retry.counts.get('get_object') == result['parts']
+                  and read_file(target) == data)
+
+    # A replaced object invalidates progress recorded for the old one
+    os.remove(target)
+    try:
+        download_file(FlakyS3(s3, fail={'get_object': 3}), BUCKET, KEY, target,
+                      part_size=MIN_PART_SIZE, concurrency=1)
+    except ConnectionError:
+        pass
+    replacement = random.Random(3).randbytes(SIZE)
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=replacement)
+    fresh = download_file(s3, BUCKET, KEY, target, part_size=MIN_PART_SIZE)
+
+    return all([
+        check(failed, "First attempt fails on range 3"),
+        check(resumed_ok, f"Retry keeps {result['resumed']} range(s) and fetches "
+                          f"{retry.counts.get('get_object')}, file matches the object"),
+        check(fresh['resumed'] == 0 and read_file(target) == replacement,
+              "Progress for a replaced object is discarded"),
+        check(not os.path.exists(f"{target}.part.json"), "Progress file is removed when done"),
+    ])
+
+def test_concurrency_hides_latency(root, latency=0.05):
+    s3 = LocalS3Client(root)
+    source = os.path.join(root, 'latency.mp4')
+    write_file(source, seed=4, size=8 * MIN_PART_SIZE)
+    timings = {}
+    for concurrency in (1, 8):
+        started = time.perf_counter()
+        upload_file(FlakyS3(s3, latency=latency), source, BUCKET, f'videos/latency_{concurrency}.mp4',
+                    part_size=MIN_PART_SIZE, concurrency=concurrency)
+        download_file(FlakyS3(s3, latency=latency), BUCKET, f'videos/latency_{concurrency}.mp4',
+                      os.path.join(root, f'latency_{concurrency}.mp4'), part_size=MIN_PART_SIZE,
+                      concurrency=concurrency)
+        timings[concurrency] = time.perf_counter() - started
+    return check(timings[1] / timings[8] > 2,
+                 f"{latency * 1000:.0f} ms per request: {timings[1]:.2f}s sequential vs "
+                 f"{timings[8]:.2f}s with 8 parts in flight")
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("S3 Transfer Offline Test")
+    print("=" * 80)
+    root = tempfile.mkdtemp()
+    try:
+        results = [test_upload_resume(root), test_download_resume(root), test_concurrency_hides_latency(root)]
+    finally:
+        shutil.rmtree(root)
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
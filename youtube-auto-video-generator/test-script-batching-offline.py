@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test multi-row batched script generation with per-row fallback against the local OpenAI stub
+"""
+import json
+
+from videogen.asset_cache import AssetCache
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.openai_client import OpenAIClient
+from videogen.script_generation import (MAX_COMPLETION_TOKENS, SCRIPT_SYSTEM_PROMPT, ScriptGenerator, batch_messages,
+                                        parse_batch)
+from videogen.stubs import OpenAIStubServer, StubS3Client
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def sample_rows():
+    return [(video, video['theme']) for video in read_csv_rows()]
+
+def test_parse_batch():
+    answer = {'2': {'script': '台本2', 'description': '説明2'}, '3': {'script': '  '}, '9': {'script': '余分'}}
+    scripts, failed = parse_batch(json.dumps(answer, ensure_ascii=False), [2, 3, 4])
+    fenced, _ = parse_batch('```json\n{"2": {"script": "台本"}}\n```', [2])
+    truncated = parse_batch('{"2": {"script": "台本2"}, "3": {"scr', [2, 3])
+    return all([
+        check(scripts == {2: {'script': '台本2', 'description': '説明2'}} and failed == [3, 4],
+              "Empty and missing rows fail; rows not asked for are ignored"),
+        check(fenced == {2: {'script': '台本', 'description': None}}, "A Markdown code fence is tolerated"),
+        check(truncated == ({}, [2, 3]), "A cut-off answer fails every row of the batch"),
+        check(parse_batch('["台本"]', [2]) == ({}, [2]), "Anything but a JSON object fails"),
+    ])
+
+def test_batch_prompt():
+    messages = batch_messages(sample_rows())
+    rows = json.loads(messages[-1]['content'].split('\n', 1)[1])
+    return all([
+        check(sum(message['content'].count(SCRIPT_SYSTEM_PROMPT) for message in messages) == 1,
+              "The system prompt is sent once for the whole batch"),
+        check([row['rowIndex'] for row in rows] == [2, 3, 4] and rows[0]['theme'] == '人工知能の基本概念',
+              "Each row travels as JSON with its rowIndex"),
+    ])
+
+def generate(server, batch_size, rows=None, **kwargs):
+    client = OpenAIClient('sk-test', base_url=server.base_url)
+    return ScriptGenerator(client, batch_size=batch_size, **kwargs).generate(rows or sample_rows())
+
+def test_batched_generation():
+    with OpenAIStubServer() as server:
+        per_row = generate(server, 1)
+        batched = generate(server, 3)
+    tokens = {name: sum(m['promptTokens'] for m in result['metrics'])
+              for name, result in (('per_row', per_row), ('batched', batched))}
+    return all([
+        check(per_row['requests'] == 3 and batched['requests'] == 2 and batched['batches'] == 1
+              and batched['truncated'] == 0 and batched['fallbacks'] == 0,
+              "The 3-5 minute sample rows fit two to a batch: two requests instead of three"),
+        check(tokens['batched'] < tokens['per_row'],
+              f"Prompt tokens: {tokens['per_row']} per row vs {tokens['batched']} batched"),
+        check(all(batched['scripts'][i]['script'] == per_row['scripts'][i]['script'] for i in (2, 3, 4)),
+              "Each row gets its own script back"),
+        check(len(per_row['scripts'][2]['script']) > 800,
+              f"A 3-minute script runs to {len(per_row['scripts'][2]['script'])} characters"),
+        check(batched['scripts'][2]['description'] == 'AI基礎入門を解説する動画です。',
+              "Batched answers carry a generated description"),
+    ])
+
+def test_batch_budget():
+    video, theme = sample_rows()[1]
+    rows = [(dict(video, rowIndex=i + 2, duration='5分'), theme) for i in range(6)]
+    with OpenAIStubServer() as server:
+        sized = generate(server, 6, rows)
+        # A flat per-row budget packs three 5-minute rows into 4096 tokens
+        flat = generate(server, 3, rows, max_tokens=MAX_COMPLETION_TOKENS // 3)
+    return all([
+        check(sized['batches'] == 3 and sized['truncated'] == 0 and sized['fallbacks'] == 0,
+              f"Six 5-minute rows go two per batch, none cut off ({sized['requests']} requests)"),
+        check(flat['truncated'] == 2 and flat['fallbacks'] == 6 and flat['requests'] == 8,
+              f"Without duration sizing every batch is cut off and retried per row ({flat['requests']} requests)"),
+    ])
+
+def test_fallback():
+    with OpenAIStubServer(garbled_rows={3}) as server:
+        garbled = generate(server, 3)
+        requests = [path for path, _ in server.requests]
+    with OpenAIStubServer() as server:
+        # Room for 40 tokens per row: the JSON answer is cut off mid-object
+        truncated = generate(server, 3, max_tokens=40)
+    return all([
+        check(garbled['fallbacks'] == 1 and len(requests) == 3 and garbled['requests'] == 3,
+              "A garbled row is retried on its own; the rest of the batch is kept"),
+        check(garbled['scripts'][3]['script'].startswith('こんにちは！プログラミング入門')
+              and garbled['scripts'][3]['description'] == 'プログラミング入門の動画です。',
+              "The fallback row gets a per-row script"),
+        check(truncated['fallbacks'] == 3 and sorted(truncated['scripts']) == [2, 3, 4],
+              "A batch cut off at max_tokens falls back for every row"),
+    ])
+
+def test_pipeline():
+    cache = AssetCache(StubS3Client(), 'assets')
+    with OpenAIStubServer() as server:
+        client = OpenAIClient('sk-test', base_url=server.base_url)
+        runs = []
+        for _ in range(2):
+            result = LocalStateMachine(stub_handlers(read_csv_rows(), LocalServices(
+                cache=cache, openai=client, script_batch_size=3)),
+                                       build_definition()).run(WORKFLOW_INPUT)
+            runs.append(ExecutionHistoryIndex(result['events']).outputs('GenerateScriptTask')[0]['Payload'])
+    first, second = runs
+    return all([
+        check(result['status'] == 'SUCCEEDED' and first['openaiMetrics']['batches'] == 1
+              and first['openaiMetrics']['calls'] == 2 and first['openaiMetrics']['truncated'] == 0,
+              "GenerateScript batches the sample rows as their durations allow"),
+        check([video['rowIndex'] for video in first['body']['videosWithScripts']] == [2, 3, 4],
+              "Scripts come back in row order"),
+        check(second['openaiMetrics']['calls'] == 0
+              and all(video['cached'] for video in second['body']['videosWithScripts']),
+              "Cached rows are not sent again"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Script Batching Offline Test")
+    print("=" * 80)
+    results = [test_parse_batch(), test_batch_prompt(), test_batched_generation(), test_batch_budget(), test_fallback(),
+               test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test segment planning and the segment/concat FFmpeg commands offline
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from fractions import Fraction
+
+from videogen.compose import FFMPEG_PATH
+from videogen.encoding import get_profile
+from videogen.segmented import (
+    AAC_FRAME_SAMPLES,
+    AAC_SAMPLE_RATE,
+    concat_command,
+    default_segment_count,
+    plan_segments,
+    segment_command,
+)
+from videogen.slideshow import slide_timings
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def test_plan():
+    duration, fps = 605.37, 10
+    plan = plan_segments(duration, 8, fps)
+    aac_frame = Fraction(AAC_FRAME_SAMPLES, AAC_SAMPLE_RATE)
+    starts = [Fraction(s['start']).limit_denominator(1000) for s in plan]
+    return all([
+        check(len(plan) == 8, f"Timeline split into {len(plan)} segments"),
+        check(all((start / aac_frame).denominator == 1 for start in starts),
+              "Every boundary falls on a whole AAC frame"),
+        check(all((start * fps).denominator == 1 for start in starts),
+              "Every boundary falls on a whole video frame"),
+        check(sum(s['frames'] for s in plan) == round(duration * fps),
+              f"Segments hold {sum(s['frames'] for s in plan)} frames, same as a single encode"),
+        check([s['index'] for s in plan] == list(range(8)), "Segments are numbered in order"),
+        check(len(plan_segments(2, 8, fps)) < 8, "Short clips never produce empty segments"),
+        check(default_segment_count(60, 8) == 2 and default_segment_count(20, 8) == 1,
+              "Segments are not made shorter than the minimum length"),
+    ])
+
+def test_commands():
+    profile = get_profile('draft')
+    timings = slide_timings(3, 120)
+    plan = plan_segments(120, 3, profile['fps'])
+    command = segment_command(['a.png', 'b.png', 'c.png'], timings, plan[1], 'seg1.mp4', profile, 1.0,
+                              threads=2)
+    graph = command[command.index('-filter_complex') + 1]
+    inputs = [command[i + 1] for i, arg in enumerate(command) if arg == '-i']
+    last = segment_command(['a.png', 'b.png', 'c.png'], timings, plan[2], 'seg2.mp4', profile, 1.0)
+    last_inputs = [last[i + 1] for i, arg in enumerate(last) if arg == '-i']
+    concat = concat_command('segments.txt', 'speech.mp3', 'out.mp4', 120, profile)
+    return all([
+        check(inputs == ['a.png', 'b.png'] and 'offset=0.000' in graph
+              and f"trim=start_frame=0:end_frame={plan[1]['frames']}" in graph,
+              "A segment starting in a crossfade reads only the two slides blending there"),
+        check(last_inputs == ['b.png', 'c.png'], "Later segments never read the slides before them"),
+        check('-an' in command and command[command.index('-frames:v') + 1] == str(plan[1]['frames']),
+              "Segments are video only with an exact frame count"),
+        check(command[command.index('-threads') + 1] == '2', "Encoder threads are capped per segment"),
+        check(concat[concat.index('-c:v') + 1] == 'copy' and concat[concat.index('-f') + 1] == 'concat',
+              "Segments are joined with the concat demuxer without re-encoding video"),
+        check(concat[concat.index('-c:a') + 1] == 'aac', "Audio is encoded once over the whole timeline"),
+    ])
+
+def frame_hashes(command, workdir, name):
+    """Encode losslessly with ``command`` and hash every decoded frame"""
+    path = os.path.join(workdir, f"{name}.mp4")
+    subprocess.run(command[:-1] + [path], check=True)
+    output = subprocess.run([FFMPEG_PATH, '-v', 'error', '-i', path, '-f', 'framemd5', '-'],
+                            check=True, capture_output=True, text=True).stdout
+    return [line.split(',')[-1].strip() for line in output.splitlines() if not line.startswith('#')]
+
+def test_frames_match_single_pass():
+    # CRF 0 is lossless, so decoded frames are exactly what the filter graph produced
+    profile = dict(get_profile('draft'), crf=0)
+    marks = [{'time': t, 'type': 'sentence'} for t in (0, 9600, 18750)]
+    timings = slide_timings(3, 40, marks)
+    workdir = tempfile.mkdtemp()
+    try:
+        stills = []
+        for i, color in enumerate(('red', 'green', 'blue')):
+            stills.append(os.path.join(workdir, f"still_{i}.png"))
+            subprocess.run([FFMPEG_PATH, '-v', 'error', '-f', 'lavfi', '-i', f'color=c={color}:s=64x36',
+                            '-frames:v', '1', stills[-1]], check=True)
+        single = frame_hashes(segment_command(stills, timings, plan_segments(40, 1, profile['fps'])[0],
+                                              'out', profile, 1.0), workdir, 'single')
+        # Boundaries at 9.6 s and 19.2 s both fall inside a crossfade; the one at 18.75 s is off the frame grid
+        plan = plan_segments(40, 4, profile['fps'])
+        segmented = []
+        for segment in plan:
+            segmented += frame_hashes(segment_command(stills, timings, segment, 'out', profile, 1.0),
+                                      workdir, f"segment_{segment['index']}")
+    finally:
+        shutil.rmtree(workdir)
+    return check(len(single) == 200 and segmented == single,
+                 f"{len(plan)} segments decode to the same {len(segmented)} frames as a single pass "
+                 f"(boundaries at {[s['start'] for s in plan[1:]]}, slides at {[t['start'] for t in timings]})")
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Segmented Encoding Offline Test")
+    print("=" * 80)
+    results = [test_plan(), test_commands()]
+    if shutil.which(FFMPEG_PATH) is None:
+        print(f"⚠️  {FFMPEG_PATH} not found; set FFMPEG_PATH to compare segment frames with a single pass")
+    else:
+        results.append(test_frames_match_single_pass())
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
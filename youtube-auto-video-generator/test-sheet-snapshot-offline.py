@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test incremental spreadsheet reads and row claims offline against a stub S3 client
+"""
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.sheet_snapshot import IncrementalSheetReader, row_hash
+from videogen.stubs import FakeSheetsService, StubS3Client
+
+SPREADSHEET_ID = 'local-spreadsheet'
+SHEET_NAME = 'Sheet1'
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def test_incremental_selection():
+    now = [1000.0]
+    clock = lambda: now[0]
+    s3 = StubS3Client(clock=clock)
+    reader = IncrementalSheetReader(s3, 'assets', lease_seconds=600, clock=clock)
+    rows = read_csv_rows()
+
+    results = []
+    selected, _ = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-a')
+    results.append(check(len(selected) == len(rows), f"First run claims all {len(rows)} pending rows"))
+
+    # An overlapping run sees the same pending rows but cannot claim them
+    selected, stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-b')
+    results.append(check(
+        not selected and stats['claimed_elsewhere'] == len(rows),
+        f"Overlapping run selects {len(selected)} row(s), {stats['claimed_elsewhere']} claimed elsewhere",
+    ))
+
+    # run-a finishes every row; then one row's title is edited
+    rows = [dict(row, status='completed') for row in rows]
+    reader.complete(SPREADSHEET_ID, SHEET_NAME, [row['rowIndex'] for row in rows])
+    rows[1]['title'] = rows[1]['title'] + ' 改訂版'
+    selected, stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-c')
+    results.append(check(
+        [row['rowIndex'] for row in selected] == [rows[1]['rowIndex']],
+        f"Only the edited row is selected ({stats['changed']} changed, {stats['unchanged']} unchanged)",
+    ))
+
+    # run-c dies with the row marked processing; after the lease it is picked up again
+    rows[1]['status'] = 'processing'
+    selected, _ = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-d')
+    results.append(check(not selected, "A processing row under a live claim is skipped"))
+    now[0] += 601
+    selected, stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-e')
+    results.append(check(
+        len(selected) == 1 and stats['stale'] == 1,
+        "A processing row under an expired claim is reclaimed",
+    ))
+
+    # A row left processing whose claim is gone is not stuck either
+    rows[2]['status'] = 'processing'
+    selected, stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-f')
+    results.append(check(
+        [row['rowIndex'] for row in selected] == [rows[2]['rowIndex']] and stats['stale'] == 1,
+        "A processing row without a claim is reclaimed",
+    ))
+    return all(results)
+
+def test_run_dies_after_selection():
+    now = [1000.0]
+    clock = lambda: now[0]
+    s3 = StubS3Client(clock=clock)
+    reader = IncrementalSheetReader(s3, 'assets', lease_seconds=600, clock=clock)
+    rows = [dict(row, status='completed') for row in read_csv_rows()]
+    reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'baseline')
+
+    # run-a selects an edited completed row, then dies before marking it processing
+    rows[0]['theme'] = rows[0]['theme'] + '（最新版）'
+    selected, _ = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-a')
+    during, during_stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-b')
+    now[0] += 601
+    after, after_stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-c')
+
+    # run-c marks it done; the edit is then recorded and the claim cleared
+    recorded = reader.complete(SPREADSHEET_ID, SHEET_NAME, [rows[0]['rowIndex']])
+    final, final_stats = reader.select(SPREADSHEET_ID, SHEET_NAME, rows, 'run-d')
+    claims = s3.list_objects_v2(Bucket='assets', Prefix=f"sheet-state/{SPREADSHEET_ID}/{SHEET_NAME}/claims/")
+    return all([
+        check([row['rowIndex'] for row in selected] == [rows[0]['rowIndex']], "The edited row is selected"),
+        check(not during and during_stats['claimed_elsewhere'] == 1 and during_stats['unchanged'] == len(rows) - 1,
+              "While the claim is live the edit is neither redone nor counted as unchanged"),
+        check([row['rowIndex'] for row in after] == [rows[0]['rowIndex']] and after_stats['changed'] == 1,
+              "After the dead run's lease the edit is selected again"),
+        check(recorded and not final and final_stats['unchanged'] == len(rows) and not claims.get('Contents'),
+              "Completing the row advances its snapshot hash and clears the claim"),
+    ])
+
+def test_pipeline():
+    s3 = StubS3Client()
+    sheets = FakeSheetsService()
+    reader = IncrementalSheetReader(s3, 'assets')
+    rows = read_csv_rows()
+    workflow_input = {"spreadsheetId": SPREADSHEET_ID, "sheetName": SHEET_NAME}
+    first = LocalStateMachine(stub_handlers(rows, LocalServices(reader=reader, sheets=sheets)),
+                              build_definition()).run(workflow_input)
+    recorded = reader.load_snapshot(SPREADSHEET_ID, SHEET_NAME)
+    claims = s3.list_objects_v2(Bucket='assets', Prefix=f"sheet-state/{SPREADSHEET_ID}/{SHEET_NAME}/claims/")
+
+    # The next run reads back the statuses the first one wrote
+    rows = [dict(row, status=sheets.cells.get((SHEET_NAME, row['rowIndex'], 6))) for row in rows]
+    second = LocalStateMachine(stub_handlers(rows, LocalServices(reader=reader, sheets=sheets)),
+                               build_definition()).run(workflow_input)
+    selection = ExecutionHistoryIndex(second['events']).outputs('ReadSpreadsheetTask')[0]['Payload']['selection']
+    return all([
+        check(first['status'] == 'SUCCEEDED' and recorded == {str(row['rowIndex']): row_hash(row) for row in rows}
+              and not claims.get('Contents'),
+              "UploadToYouTube completes the rows it marks done: hashes recorded, claims cleared"),
+        check(second['status'] == 'SUCCEEDED' and selection['unchanged'] == len(rows),
+              "The next run skips them"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Incremental Spreadsheet Read Offline Test")
+    print("=" * 80)
+    results = [test_incremental_selection(), test_run_dies_after_selection(), test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test batched Google Sheets write-back offline against a fake Sheets service
+"""
+from videogen.sheets_batch import SheetWriteBatch, batch_get
+from videogen.stubs import FakeSheetsService
+
+SPREADSHEET_ID = 'local-spreadsheet'
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def test_single_batch_update():
+    service = FakeSheetsService()
+    batch = SheetWriteBatch(service, SPREADSHEET_ID)
+    for row_index in range(2, 202):
+        batch.update_row(row_index, status='completed', script=f'script {row_index}',
+                         description=f'description {row_index}', processed_at='2025-06-14T00:00:00Z')
+    written = batch.flush()
+    write_calls = list(service.calls)
+
+    values = batch_get(service, SPREADSHEET_ID, ['Sheet1!F2:I2', 'Sheet1!F201:I201'])
+    return all([
+        check(write_calls == ['batchUpdate'],
+              f"200 rows written with {len(write_calls)} API call(s), {written} cells"),
+        check(values == [[['completed', 'script 2', 'description 2', '2025-06-14T00:00:00Z']],
+                         [['completed', 'script 201', 'description 201', '2025-06-14T00:00:00Z']]],
+              "batchGet reads back the written ranges"),
+    ])
+
+def test_chunking_and_backoff():
+    service = FakeSheetsService(rate_limit_failures=2)
+    delays = []
+    batch = SheetWriteBatch(service, SPREADSHEET_ID, max_ranges=50, sleep=delays.append)
+    for row_index in range(2, 122):
+        # status and processed_at are not adjacent, so each row is two ranges
+        batch.update_row(row_index, status='processing', processed_at='now')
+    batch.flush()
+
+    return all([
+        check(batch.stats['ranges'] == 240 and batch.stats['requests'] == 5,
+              f"{batch.stats['ranges']} ranges split into {batch.stats['requests']} requests"),
+        check(len(delays) == 2 and len(service.calls) == 7,
+              f"Retried {len(delays)} rate-limited request(s) with backoff"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Sheets Batch Write Offline Test")
+    print("=" * 80)
+    results = [test_single_batch_update(), test_chunking_and_backoff()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test slideshow timing and the crossfade filter graph offline
+"""
+from videogen.encoding import DEFAULT_PROFILE, get_profile, resolve_profile
+from videogen.slideshow import build_slideshow_command, slide_timings
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def test_timings():
+    marks = [{'time': t, 'type': 'sentence'} for t in (0, 9000, 21000, 33000, 47000, 58000)]
+    marks.append({'time': 1200, 'type': 'word'})
+    by_marks = slide_timings(3, 65, marks)
+    even = slide_timings(3, 60)
+    return all([
+        check([t['start'] for t in by_marks] == [0.0, 21.0, 47.0],
+              f"Slides change on sentence boundaries: {[t['start'] for t in by_marks]}"),
+        check([t['duration'] for t in even] == [20.0, 20.0, 20.0],
+              "Without speech marks the duration is split evenly"),
+        check(sum(t['duration'] for t in by_marks) == 65, "Slides cover the whole audio track"),
+    ])
+
+def test_filter_graph():
+    timings = slide_timings(3, 60)
+    command = build_slideshow_command(['a.png', 'b.png', 'c.png'], timings, 'speech.mp3', 'out.mp4',
+                                      profile=get_profile('draft'), crossfade=1.0)
+    graph = command[command.index('-filter_complex') + 1]
+    lengths = [float(command[i + 1]) for i, arg in enumerate(command) if arg == '-t']
+    video_length = sum(lengths) - 2 * 1.0
+    return all([
+        check('offset=20.000' in graph and 'offset=40.000' in graph,
+              "Each crossfade starts at the next slide's start time"),
+        check(abs(video_length - 60) < 1e-6, f"Video length {video_length:.1f}s matches the audio"),
+        check(command[command.index('-r') + 1] == '5', "Stills are encoded at the low frame rate"),
+    ])
+
+def test_profile_fallback():
+    row = {'rowIndex': 3, 'encoding_profile': 'Draft '}
+    return all([
+        check(resolve_profile(row, {'encodingProfile': 'archival'})['name'] == 'draft',
+              "The sheet column wins over the execution input"),
+        check(resolve_profile({'rowIndex': 4, 'encoding_profile': 'ultra'})['name'] == DEFAULT_PROFILE,
+              "An unknown profile falls back to the default instead of failing the run"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Slideshow Offline Test")
+    print("=" * 80)
+    results = [test_timings(), test_filter_graph(), test_profile_fallback()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test chunked, concurrent Polly synthesis and MP3 concatenation against a fake Polly client
+"""
+import time
+
+from videogen import mp3
+from videogen.fixtures import japanese_script
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.speech import SpeechSynthesizer, chunk_script, split_sentences
+from videogen.stubs import FakePollyClient
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+SECONDS_PER_CHARACTER = 0.15
+# A 10-minute narration at the fake's speaking rate
+SCRIPT = japanese_script(165)
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def synthesizer(polly, **kwargs):
+    return SpeechSynthesizer(polly, sleep=lambda seconds: None, **kwargs)
+
+def test_chunking():
+    chunks = chunk_script(SCRIPT, 500)
+    long_sentence = '、'.join(['とても長い説明が続きます'] * 60) + '。'
+    pieces = chunk_script(long_sentence, 200)
+    return all([
+        check(''.join(chunks) == SCRIPT, f"{len(SCRIPT)} characters split into {len(chunks)} chunks, none lost"),
+        check(all(len(chunk) <= 500 for chunk in chunks), "No chunk exceeds the limit"),
+        check(all(chunk[-1] in '。！？' for chunk in chunks), "Chunks end on sentence boundaries"),
+        check(split_sentences('「はい。」そうです！本当？') == ['「はい。」', 'そうです！', '本当？'],
+              "Closing brackets stay with their sentence"),
+        check(''.join(pieces) == long_sentence and all(p[-1] in '、。' for p in pieces),
+              "An over-long sentence is split at clause boundaries"),
+    ])
+
+def test_single_request_limit():
+    polly = FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER)
+    try:
+        polly.synthesize_speech(Text=SCRIPT, OutputFormat='mp3', VoiceId='Takumi')
+        rejected = False
+    except Exception as e:
+        rejected = e.response['Error']['Code'] == 'TextLengthExceededException'
+    result = synthesizer(polly).synthesize(SCRIPT)
+    return all([
+        check(rejected, f"One request for {len(SCRIPT)} characters is rejected"),
+        check(result['chunks'] > 1 and abs(result['duration'] - len(SCRIPT) * SECONDS_PER_CHARACTER) < 1,
+              f"Chunked synthesis produces {result['duration']:.1f}s of audio in {result['chunks']} chunks"),
+    ])
+
+def test_concatenation():
+    polly = FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER)
+    speech = synthesizer(polly, chunk_characters=800)
+    chunks = chunk_script(SCRIPT, 800)
+    parts = [mp3.read_frames(polly.synthesize_speech(Text=chunk, OutputFormat='mp3', VoiceId='Takumi')
+                             ['AudioStream'].read()) for chunk in chunks]
+    result = speech.synthesize(SCRIPT)
+    joined = mp3.read_frames(result['audio'])
+    return all([
+        check(joined['frames'] == sum(part['frames'] for part in parts),
+              f"Joined MP3 has exactly the chunks' {joined['frames']} audio frames"),
+        check(len(result['audio']) == len(joined['data']),
+              "No ID3 tag or Info frame is left between chunks"),
+        check(abs(joined['duration'] - result['duration']) < 1e-9,
+              f"Reported duration matches the frames: {result['duration']:.3f}s"),
+    ])
+
+def test_speech_marks():
+    speech = synthesizer(FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER), chunk_characters=800)
+    result = speech.synthesize(SCRIPT)
+    sentences = [mark for mark in result['speech_marks'] if mark['type'] == 'sentence']
+    words = [mark for mark in result['speech_marks'] if mark['type'] == 'word']
+    script_bytes = SCRIPT.encode('utf-8')
+    # One frame (26 ms) of rounding per chunk boundary at most
+    tolerance = result['chunks'] * 27
+    drift = max(abs(mark['time'] - len(script_bytes[:mark['start']].decode('utf-8'))
+                    * SECONDS_PER_CHARACTER * 1000) for mark in sentences)
+    return all([
+        check(len(sentences) == len(split_sentences(SCRIPT)) and words,
+              f"{len(sentences)} sentence and {len(words)} word marks across {result['chunks']} chunks"),
+        check(all(script_bytes[m['start']:m['end']].decode('utf-8') == m['value']
+                  for m in result['speech_marks']), "Byte offsets point into the whole script"),
+        check(all(a['time'] <= b['time'] for a, b in zip(sentences, sentences[1:]))
+              and sentences[-1]['time'] < result['duration'] * 1000,
+              "Mark times increase and stay within the audio"),
+        check(drift <= tolerance, f"Marks are at most {drift:.0f} ms off the spoken position"),
+    ])
+
+def test_concurrency():
+    timings = {}
+    peaks = {}
+    for concurrency in (1, 4):
+        polly = FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER, latency=0.05)
+        started = time.perf_counter()
+        synthesizer(polly, chunk_characters=400, concurrency=concurrency).synthesize(SCRIPT)
+        timings[concurrency] = time.perf_counter() - started
+        peaks[concurrency] = polly.max_in_flight
+    return all([
+        check(peaks[4] == 4, f"At most {peaks[4]} requests in flight"),
+        check(timings[1] / timings[4] > 2,
+              f"{timings[1]:.2f}s sequential vs {timings[4]:.2f}s with 4 concurrent requests"),
+    ])
+
+def test_throttling():
+    speech = synthesizer(FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER, throttle=3))
+    result = speech.synthesize(SCRIPT)
+    return check(result['chunks'] > 1 and speech.stats['retries'] == 3,
+                 f"Throttled requests are retried ({speech.stats['retries']} retries)")
+
+def test_pipeline():
+    speech = synthesizer(FakePollyClient(seconds_per_character=SECONDS_PER_CHARACTER))
+    rows = read_csv_rows()[:2]
+    machine = LocalStateMachine(stub_handlers(rows, LocalServices(speech=speech)), build_definition())
+    result = machine.run(WORKFLOW_INPUT)
+    history = ExecutionHistoryIndex(result['events'])
+    audio = history.outputs('SynthesizeSpeechTask')[0]['Payload']['videosWithAudio'][0]
+    slides = history.outputs('ComposeVideoTask')[0]['Payload']['composedVideos'][0]['slides']
+    sentence_times = {mark['time'] / 1000 for mark in audio['speechMarks']}
+    return all([
+        check(result['status'] == 'SUCCEEDED' and audio['durationSeconds'] > 0,
+              f"SynthesizeSpeech reports {audio['durationSeconds']}s measured from the MP3"),
+        check(abs(sum(slide['duration'] for slide in slides) - audio['durationSeconds']) < 0.01,
+              "Slides span the measured audio"),
+        check(all(slide['start'] in sentence_times for slide in slides),
+              "Slides change on sentence speech marks"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Speech Synthesis Offline Test")
+    print("=" * 80)
+    results = [test_chunking(), test_single_request_limit(), test_concatenation(), test_speech_marks(),
+               test_concurrency(), test_throttling(), test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -2,16 +2,21 @@
 """
 Test Step Functions Workflow - YouTube Auto Video Generation
 """
+import asyncio
 import json
 import boto3
-import time
 from datetime import datetime
 
+from videogen.claim_check import reference_resolver
+from videogen.monitor import ExecutionMonitor, describe_transition
+
 def test_step_functions_workflow():
     """Test the complete video generation workflow"""
 
     # Initialize Step Functions client
     stepfunctions_client = boto3.client('stepfunctions', region_name='ap-northeast-1')
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    resolve_references = reference_resolver(boto3.client('s3', region_name='ap-northeast-1'))
 
     # State Machine ARN
     state_machine_arn = 'arn:aws:states:ap-northeast-1:455931011903:stateMachine:VideoGen-VideoGeneration-dev'
@@ -48,33 +53,27 @@ def test_step_functions_workflow():
         print("\n📊 Monitoring execution status...")
         print("Press Ctrl+C to stop monitoring (execution will continue)")
 
+        def report(_, event):
+            transition = describe_transition(event)
+            if transition:
+                print(f"[{event['timestamp'].strftime('%H:%M:%S')}] {transition}")
+
         try:
-            while True:
-                execution_response = stepfunctions_client.describe_execution(
-                    executionArn=execution_arn
-                )
-
-                status = execution_response['status']
-                print(f"\rStatus: {status} | Time: {datetime.now().strftime('%H:%M:%S')}", end='', flush=True)
-
-                if status in ['SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED']:
-                    print(f"\n\n🏁 Execution completed with status: {status}")
-
-                    if status == 'SUCCEEDED':
-                        print("✅ Workflow completed successfully!")
-                        if 'output' in execution_response:
-                            output = json.loads(execution_response['output'])
-                            print(f"Output: {json.dumps(output, indent=2, ensure_ascii=False)}")
-                    else:
-                        print("❌ Workflow failed or was terminated")
-                        if 'error' in execution_response:
-                            print(f"Error: {execution_response['error']}")
-                        if 'cause' in execution_response:
-                            print(f"Cause: {execution_response['cause']}")
-
-                    break
-
-                time.sleep(5)  # Wait 5 seconds before checking again
+            monitor = ExecutionMonitor(stepfunctions_client, on_event=report)
+            result = asyncio.run(monitor.watch(execution_arn))
+            status = result['status']
+            print(f"\n🏁 Execution completed with status: {status}")
+
+            if status == 'SUCCEEDED':
+                print("✅ Workflow completed successfully!")
+                if 'output' in result:
+                    print(f"Output: {json.dumps(resolve_references(result['output']), indent=2, ensure_ascii=False)}")
+            else:
+                print("❌ Workflow failed or was terminated")
+                if 'error' in result:
+                    print(f"Error: {result['error']}")
+                if 'cause' in result:
+                    print(f"Cause: {result['cause']}")
 
         except KeyboardInterrupt:
             print(f"\n\n⏸️  Monitoring stopped. Execution continues in background.")
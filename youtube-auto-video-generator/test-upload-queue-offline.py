@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test the quota-aware YouTube upload queue offline against a stub S3 client
+"""
+import threading
+from datetime import datetime, timezone
+
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.stubs import FakeSheetsService, StubS3Client
+from videogen.upload_queue import UNITS_PER_UPLOAD, UploadQueue, quota_day, upload_queued
+from videogen.youtube_upload import UploadError
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+QUOTA_ERROR_BODY = '{"error": {"code": 403, "errors": [{"reason": "quotaExceeded"}]}}'
+DAY = 24 * 60 * 60
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+def composed(row_index, priority=''):
+    return {'rowIndex': row_index, 'title': f"動画{row_index}", 'priority': priority,
+            'videoS3Key': f"videos/composed_{row_index}_0.mp4"}
+
+def recorder(fail=None):
+    """An upload function recording row indexes; ``fail(video)`` may return an error to raise"""
+    uploaded = []
+
+    def upload(video):
+        error = fail and fail(video)
+        if error:
+            raise error
+        uploaded.append(video['rowIndex'])
+        return {'rowIndex': video['rowIndex'], 'uploaded': True}
+
+    return uploaded, upload
+
+def test_quota_day():
+    return all([
+        check(quota_day(utc(2026, 1, 15, 7, 59)) == '2026-01-14' and
+              quota_day(utc(2026, 1, 15, 8, 0)) == '2026-01-15',
+              "Quota day turns over at midnight Pacific Standard Time"),
+        check(quota_day(utc(2026, 7, 15, 6, 59)) == '2026-07-14' and
+              quota_day(utc(2026, 7, 15, 7, 0)) == '2026-07-15',
+              "Quota day follows daylight saving time"),
+    ])
+
+def test_priority_and_deferral():
+    now = [utc(2026, 1, 15, 0, 0)]
+    queue = UploadQueue(StubS3Client(), 'assets', clock=lambda: now[0])
+    videos = [composed(i, p) for i, p in zip(range(2, 10), ['', '2', '1', '', '3', '1', 'x', ''])]
+    order, upload = recorder()
+    _, deferred = upload_queued(queue, videos, upload)
+    units_used = queue.state()['unitsUsed']
+    same_day, upload = recorder()
+    upload_queued(queue, videos, upload)
+
+    now[0] += DAY
+    next_day, upload = recorder()
+    upload_queued(queue, [], upload)
+    return all([
+        check(order == [4, 7, 3, 6, 2, 5], f"Today's 6 uploads go in priority order: {order}"),
+        check([video['rowIndex'] for video in deferred] == [8, 9],
+              "Overflow videos are deferred instead of failing"),
+        check(units_used == 6 * UNITS_PER_UPLOAD, f"{queue.daily_quota - units_used} units left"),
+        check(not same_day, "A second run on the same quota day uploads nothing, not even the same videos again"),
+        check(next_day == [8, 9] and not queue.state()['pending'],
+              "Deferred videos are uploaded on the next quota day"),
+    ])
+
+def test_quota_error():
+    queue = UploadQueue(StubS3Client(), 'assets')
+    uploaded, upload = recorder(lambda video: len(uploaded) == 2 and UploadError(403, QUOTA_ERROR_BODY))
+    results, deferred = upload_queued(queue, [composed(i) for i in range(2, 6)], upload)
+    state = queue.state()
+    return all([
+        check(len(results) == 2 and [video['rowIndex'] for video in deferred] == [4, 5],
+              "A quotaExceeded answer requeues the remaining videos"),
+        check(state['unitsUsed'] >= queue.daily_quota, "The rest of the quota day is closed"),
+    ])
+
+def test_failed_upload():
+    now = [utc(2026, 1, 15, 0, 0)]
+    queue = UploadQueue(StubS3Client(), 'assets', clock=lambda: now[0])
+    videos = [composed(i) for i in range(2, 5)]
+    uploaded, upload = recorder(lambda video: video['rowIndex'] == 3 and ConnectionError('reset by peer'))
+    try:
+        upload_queued(queue, videos, upload)
+        raised = False
+    except ConnectionError:
+        raised = True
+    after_failure = queue.state()
+
+    retried, upload = recorder()
+    upload_queued(queue, videos, upload)
+    after_retry = queue.state()
+
+    # An attempt that died mid-upload (a Lambda timeout) leaves its reservation behind
+    queue.enqueue([composed(5)])
+    queue.reserve(composed(5))
+    held, upload = recorder()
+    upload_queued(queue, [composed(5)], upload)
+    now[0] += queue.lease_seconds
+    taken_over, upload = recorder()
+    upload_queued(queue, [composed(5)], upload)
+    return all([
+        check(raised and uploaded == [2], "A non-quota error still fails the upload"),
+        check([v['rowIndex'] for v in after_failure['pending']] == [3, 4]
+              and after_failure['unitsUsed'] == UNITS_PER_UPLOAD,
+              "The failed and the untried videos stay queued and only the uploaded one is charged"),
+        check(retried == [3, 4] and after_retry['unitsUsed'] == 3 * UNITS_PER_UPLOAD,
+              "A retry uploads each remaining video once and charges it once"),
+        check(not held and taken_over == [5] and queue.state()['unitsUsed'] == 4 * UNITS_PER_UPLOAD,
+              "A reservation is left alone while its attempt may be alive, then taken over without a new charge"),
+    ])
+
+def test_concurrent_reservations():
+    queue = UploadQueue(StubS3Client(), 'assets', max_conflicts=1000)
+    uploaded, upload = recorder()
+    threads = [threading.Thread(target=lambda i=i: upload_queued(queue, [composed(i)], upload))
+               for i in range(2, 12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return check(len(uploaded) == 6 and len(set(uploaded)) == 6 and len(queue.state()['pending']) == 4,
+                 f"10 concurrent Map iterations upload {len(uploaded)} distinct videos, never more than the quota")
+
+def test_pipeline():
+    now = [utc(2026, 1, 15, 0, 0)]
+    s3 = StubS3Client()
+    sheets = FakeSheetsService()
+    sample = read_csv_rows()
+    rows = [dict(sample[i % len(sample)], rowIndex=i + 2, priority=str(8 - i)) for i in range(8)]
+    queue = UploadQueue(s3, 'assets', clock=lambda: now[0])
+
+    definition = build_definition(drain_upload_queue=True)
+    first = LocalStateMachine(stub_handlers(rows, LocalServices(sheets=sheets, queue=queue)),
+                              definition).run(WORKFLOW_INPUT)
+    statuses = {row: sheets.cells.get(('Sheet1', row, 6)) for row in range(2, 10)}
+
+    # Tomorrow's scheduled run has no new rows but drains the queue first
+    now[0] += DAY
+    done = [dict(row, status=statuses[row['rowIndex']]) for row in rows]
+    second = LocalStateMachine(stub_handlers(done, LocalServices(sheets=sheets, queue=queue)),
+                               definition).run(WORKFLOW_INPUT)
+    drain = ExecutionHistoryIndex(second['events']).outputs('DrainUploadQueueTask')[0]
+    drained = drain['Payload']['uploadResults']
+    return all([
+        check(first['status'] == 'SUCCEEDED', "Running out of quota no longer fails the execution"),
+        check([row for row, status in statuses.items() if status == 'queued'] == [2, 3],
+              "Lowest-priority rows are marked queued in the sheet"),
+        check(second['status'] == 'SUCCEEDED' and sorted(r['rowIndex'] for r in drained) == [2, 3],
+              "The next day's run uploads the deferred videos before anything else"),
+        check(sheets.cells.get(('Sheet1', 2, 6)) == 'completed', "Drained rows are marked completed"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Upload Queue Offline Test")
+    print("=" * 80)
+    results = [test_quota_day(), test_priority_and_deferral(), test_quota_error(), test_failed_upload(),
+               test_concurrent_reservations(), test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
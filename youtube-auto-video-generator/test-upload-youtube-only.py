@@ -5,8 +5,12 @@ Test UploadToYouTube function specifically
 import json
 import boto3
 
+from videogen.claim_check import reference_resolver
+
 def test_upload_youtube():
     lambda_client = boto3.client('lambda', region_name='ap-northeast-1')
+    # Fields offloaded to S3 in claim-check mode are fetched and shown in place
+    resolve_references = reference_resolver(boto3.client('s3', region_name='ap-northeast-1'))
 
     # Test payload for UploadToYouTube
     payload = {
@@ -33,7 +37,7 @@ def test_upload_youtube():
 
         if response['StatusCode'] == 200:
             response_payload = json.loads(response['Payload'].read())
-            print(f"Response: {json.dumps(response_payload, indent=2, ensure_ascii=False)}")
+            print(f"Response: {json.dumps(resolve_references(response_payload), indent=2, ensure_ascii=False)}")
 
             if response_payload.get('statusCode') == 200:
                 print("✅ UploadToYouTube test SUCCESS")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test the module-scope secret and client cache that lets warm invocations skip Secrets Manager
+"""
+import threading
+
+from videogen.history import ExecutionHistoryIndex
+from videogen.local_handlers import LocalServices, read_csv_rows, stub_handlers
+from videogen.local_runner import LocalStateMachine, build_definition
+from videogen.openai_client import OpenAIError
+from videogen.stubs import FakeHttpError, FakeSecretsManagerClient
+from videogen.warm_cache import (OPENAI_SECRET_ID, SHEETS_SECRET_ID, YOUTUBE_SECRET_ID, SecretCache,
+                                 WarmCache, is_auth_failure)
+
+WORKFLOW_INPUT = {"spreadsheetId": "local-spreadsheet", "sheetName": "Sheet1"}
+SECRETS = {
+    OPENAI_SECRET_ID: {'apiKey': 'sk-first'},
+    SHEETS_SECRET_ID: {'type': 'service_account', 'client_email': 'sheets@example.iam.gserviceaccount.com'},
+    YOUTUBE_SECRET_ID: {'client_id': 'youtube-client', 'refresh_token': 'first'},
+}
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def secret_cache(secrets_client, clock, ttl_seconds=60, refresh_ahead_seconds=10):
+    cache = WarmCache(ttl_seconds=ttl_seconds, refresh_ahead_seconds=refresh_ahead_seconds, clock=clock)
+    return SecretCache(secrets_client, cache=cache)
+
+def test_ttl():
+    clock = FakeClock()
+    client = FakeSecretsManagerClient(SECRETS)
+    cache = secret_cache(client, clock)
+    first = cache.secret(OPENAI_SECRET_ID)
+    clock.now = 45
+    warm = [cache.secret(OPENAI_SECRET_ID) for _ in range(10)]
+    clock.now = 60
+    cache.secret(OPENAI_SECRET_ID)
+    try:
+        cache.secret('youtube-auto-video-generator/missing')
+        missing = None
+    except Exception as e:
+        missing = e.response['Error']['Code']
+    return all([
+        check(first == {'apiKey': 'sk-first'} and all(value == first for value in warm),
+              "The secret is decoded once and reused"),
+        check(client.calls.count(OPENAI_SECRET_ID) == 2, "Only an expired entry is read again"),
+        check(missing == 'ResourceNotFoundException', "A missing secret raises and is not cached"),
+    ])
+
+def test_background_refresh():
+    clock = FakeClock()
+    client = FakeSecretsManagerClient(SECRETS)
+    cache = secret_cache(client, clock)
+    cache.secret(OPENAI_SECRET_ID)
+    client.rotate(OPENAI_SECRET_ID, {'apiKey': 'sk-rotated'})
+    clock.now = 55
+    stale = cache.secret(OPENAI_SECRET_ID)
+    cache.cache.wait()
+    refreshed = cache.secret(OPENAI_SECRET_ID)
+    clock.now = 100
+    later = cache.secret(OPENAI_SECRET_ID)
+    return all([
+        check(stale == {'apiKey': 'sk-first'}, "Near expiry the cached value is served while it refreshes"),
+        check(refreshed == {'apiKey': 'sk-rotated'} and cache.cache.stats['refreshes'] == 1,
+              "The background refresh picks up the rotated secret"),
+        check(later == refreshed and client.calls.count(OPENAI_SECRET_ID) == 2,
+              "A refreshed entry starts a new TTL, so no call blocks on Secrets Manager"),
+    ])
+
+def test_single_flight():
+    client = FakeSecretsManagerClient(SECRETS, latency=0.05)
+    cache = SecretCache(client)
+    barrier = threading.Barrier(16)
+    values = []
+
+    def read():
+        barrier.wait()
+        values.append(cache.secret(SHEETS_SECRET_ID))
+
+    threads = [threading.Thread(target=read) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return check(len(values) == 16 and len(client.calls) == 1,
+                 f"16 concurrent cold reads make {len(client.calls)} GetSecretValue call")
+
+def test_clients():
+    clock = FakeClock()
+    client = FakeSecretsManagerClient(SECRETS)
+    cache = secret_cache(client, clock)
+
+    def factory(secret):
+        return {'key': secret['apiKey']}
+
+    first = cache.client('openai', OPENAI_SECRET_ID, factory)
+    same = cache.client('openai', OPENAI_SECRET_ID, factory)
+    clock.now = 61
+    unchanged = cache.client('openai', OPENAI_SECRET_ID, factory)
+    client.rotate(OPENAI_SECRET_ID, {'apiKey': 'sk-rotated'})
+    clock.now = 122
+    rotated = cache.client('openai', OPENAI_SECRET_ID, factory)
+    return all([
+        check(first is same is unchanged, "The client is built once and survives a re-read of the same secret"),
+        check(rotated == {'key': 'sk-rotated'} and cache.stats['clients_built'] == 2,
+              "A rotated secret rebuilds the client"),
+    ])
+
+def test_auth_failure():
+    client = FakeSecretsManagerClient(SECRETS)
+    cache = SecretCache(client)
+    cache.secret(OPENAI_SECRET_ID)
+    client.rotate(OPENAI_SECRET_ID, {'apiKey': 'sk-rotated'})
+    used = []
+
+    def operation(api_key):
+        used.append(api_key)
+        if api_key != 'sk-rotated':
+            raise OpenAIError(401, 'Incorrect API key provided')
+        return 'ok'
+
+    result = cache.call('openai', OPENAI_SECRET_ID, lambda secret: secret['apiKey'], operation)
+    try:
+        cache.call('openai', OPENAI_SECRET_ID, lambda secret: secret['apiKey'],
+                   lambda api_key: (_ for _ in ()).throw(OpenAIError(500, 'server error')))
+        other = None
+    except OpenAIError as e:
+        other = e.status
+    return all([
+        check(result == 'ok' and used == ['sk-first', 'sk-rotated'],
+              "A 401 invalidates the cached secret and retries once with the rotated one"),
+        check(other == 500 and client.calls.count(OPENAI_SECRET_ID) == 2,
+              "Other failures propagate without a re-read"),
+        check(is_auth_failure(FakeHttpError(401)) and not is_auth_failure(FakeHttpError(429)),
+              "A googleapiclient 401 counts as an authentication failure, a 429 does not"),
+    ])
+
+def test_pipeline():
+    rows = read_csv_rows()
+    calls = {}
+    for ttl_seconds in (0, 3600):
+        client = FakeSecretsManagerClient(SECRETS)
+        # Kept across runs, as module scope is across warm invocations
+        secrets = SecretCache(client, cache=WarmCache(ttl_seconds=ttl_seconds))
+        per_run = []
+        for _ in range(3):
+            before = len(client.calls)
+            machine = LocalStateMachine(stub_handlers(rows, LocalServices(secrets=secrets)), build_definition())
+            result = machine.run(WORKFLOW_INPUT)
+            per_run.append(len(client.calls) - before)
+        calls[ttl_seconds] = per_run
+    uploads = ExecutionHistoryIndex(result['events']).outputs('UploadToYouTubeTask')[0]['Payload']
+    return all([
+        check(result['status'] == 'SUCCEEDED' and len(uploads['uploadResults']) == 3,
+              "The pipeline runs with secrets read through the cache"),
+        check(calls[0][0] > 3 and len(set(calls[0])) == 1,
+              f"Without caching every invocation reads its secrets: {calls[0]} calls"),
+        check(calls[3600] == [3, 0, 0], f"With module-scope caching: {calls[3600]} calls; warm runs make none"),
+    ])
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Warm Cache Offline Test")
+    print("=" * 80)
+    results = [test_ttl(), test_background_refresh(), test_single_flight(), test_clients(), test_auth_failure(),
+               test_pipeline()]
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test the resumable YouTube upload against a local HTTP server emulating 308 Resume Incomplete
+"""
+import os
+import random
+import shutil
+import tempfile
+
+from videogen.stubs import LocalS3Client, ResumableUploadServer, StubS3Client
+from videogen.youtube_upload import (
+    CHUNK_ALIGNMENT,
+    ResumableUploader,
+    UploadError,
+    UploadInterrupted,
+    UploadSessionStore,
+    upload_composed_video,
+    video_metadata,
+)
+
+CHUNK_SIZE = CHUNK_ALIGNMENT
+VIDEO = {
+    'rowIndex': 2,
+    'title': 'AI基礎入門',
+    'description': 'AI基礎入門の動画です。',
+    'keywords': 'AI, 機械学習',
+    'videoS3Key': 'videos/composed_2_1700000000.mp4',
+}
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    return condition
+
+def uploader(server, store, max_retries=5):
+    return ResumableUploader('local-access', store, chunk_size=CHUNK_SIZE, upload_url=server.upload_url,
+                             max_retries=max_retries, sleep=lambda seconds: None)
+
+def write_video(workdir, size=5 * CHUNK_SIZE + 1000):
+    data = random.Random(size).randbytes(size)
+    path = os.path.join(workdir, 'composed.mp4')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path, data
+
+def test_chunked_upload(workdir):
+    path, data = write_video(workdir)
+    store = UploadSessionStore(StubS3Client(), 'assets')
+    with ResumableUploadServer() as server:
+        client = uploader(server, store)
+        video = client.upload(path, video_metadata(VIDEO), session_key=VIDEO['videoS3Key'])
+        stored = server.videos[video['id']]
+    return all([
+        check(stored['data'] == data, f"Video arrives intact in {client.stats['chunks']} chunk(s)"),
+        check(client.stats['chunks'] == 6, "Chunks are the configured size"),
+        check(stored['metadata']['snippet']['tags'] == ['AI', '機械学習'], "Metadata travels with the session"),
+        check(video_metadata(dict(VIDEO, keywords='AI 機械学習  基礎'))['snippet']['tags'] == ['AI', '機械学習', '基礎'],
+              "Space-separated keywords from the sheet become separate tags"),
+        check(store.load(VIDEO['videoS3Key']) is None, "Session record is removed once finished"),
+    ])
+
+def test_transient_failures(workdir):
+    path, data = write_video(workdir)
+    store = UploadSessionStore(StubS3Client(), 'assets')
+    with ResumableUploadServer(faults={2: 'drop', 4: 503, 5: 'partial'}) as server:
+        client = uploader(server, store)
+        video = client.upload(path, video_metadata(VIDEO), session_key=VIDEO['videoS3Key'])
+        stored = server.videos[video['id']]['data']
+    return all([
+        check(stored == data, "Dropped connection, 503 and partial commit are all recovered"),
+        check(client.stats['sessions'] == 1 and client.stats['retries'] == 2,
+              f"One session, {client.stats['retries']} retries"),
+        check(server.bytes_received < 2 * len(data),
+              f"{server.bytes_received} bytes sent for a {len(data)}-byte file"),
+    ])
+
+def test_resume_next_attempt(workdir):
+    path, data = write_video(workdir)
+    store = UploadSessionStore(StubS3Client(), 'assets')
+    with ResumableUploadServer(faults={4: 503}) as server:
+        try:
+            uploader(server, store, max_retries=0).upload(path, video_metadata(VIDEO),
+                                                          session_key=VIDEO['videoS3Key'])
+            failed = False
+        except UploadInterrupted:
+            failed = True
+        saved = store.load(VIDEO['videoS3Key'])
+
+        # A new Lambda invocation only has the session record in S3
+        sent_before = server.bytes_received
+        retry = uploader(server, UploadSessionStore(store.s3, 'assets'))
+        video = retry.upload(path, video_metadata(VIDEO), session_key=VIDEO['videoS3Key'])
+        sent_on_retry = server.bytes_received - sent_before
+        stored = server.videos[video['id']]['data']
+    return all([
+        check(failed and saved and saved['offset'] == 3 * CHUNK_SIZE,
+              f"Failed attempt leaves the session at byte {saved and saved['offset']}"),
+        check(retry.stats['sessions'] == 0 and retry.stats['resumed_from'] == 3 * CHUNK_SIZE,
+              f"Next attempt resumes the same session from byte {retry.stats['resumed_from']}"),
+        check(sent_on_retry == len(data) - 3 * CHUNK_SIZE and stored == data,
+              f"Only the remaining {sent_on_retry} bytes are sent"),
+    ])
+
+def test_expired_session(workdir):
+    path, data = write_video(workdir)
+    store = UploadSessionStore(StubS3Client(), 'assets')
+    with ResumableUploadServer(faults={2: 503}) as server:
+        try:
+            uploader(server, store, max_retries=0).upload(path, video_metadata(VIDEO),
+                                                          session_key=VIDEO['videoS3Key'])
+        except UploadInterrupted:
+            pass
+        server.expire_sessions()
+        retry = uploader(server, store)
+        video = retry.upload(path, video_metadata(VIDEO), session_key=VIDEO['videoS3Key'])
+        stored = server.videos[video['id']]['data']
+    with ResumableUploadServer(faults={n: 410 for n in range(1, 10)}) as server:
+        client = uploader(server, UploadSessionStore(StubS3Client(), 'assets'))
+        try:
+            client.upload(path, video_metadata(VIDEO), session_key=VIDEO['videoS3Key'])
+            status = None
+        except UploadError as e:
+            status = e.status
+    return all([
+        check(retry.stats['sessions'] == 1 and stored == data, "An expired session is replaced by a new one"),
+        check(status == 410 and client.stats['sessions'] == 3,
+              f"Sessions that keep expiring stop after {client.stats['sessions']} instead of looping"),
+    ])
+
+def test_from_s3(workdir):
+    s3 = LocalS3Client(workdir)
+    path, data = write_video(workdir)
+    with open(path, 'rb') as f:
+        s3.put_object(Bucket='videos', Key=VIDEO['videoS3Key'], Body=f)
+    scratch = os.path.join(workdir, 'tmp')
+    os.makedirs(scratch)
+    with ResumableUploadServer() as server:
+        video = upload_composed_video(s3, 'videos', VIDEO,
+                                      uploader(server, UploadSessionStore(s3, 'assets')), scratch)
+        stored = server.videos[video['id']]['data']
+    return check(stored == data and not os.listdir(scratch),
+                 "Composed video is fetched from S3, uploaded and the local copy removed")
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("Resumable YouTube Upload Offline Test")
+    print("=" * 80)
+    workdir = tempfile.mkdtemp()
+    try:
+        results = [test_chunked_upload(workdir), test_transient_failures(workdir),
+                   test_resume_next_attempt(workdir), test_expired_session(workdir), test_from_s3(workdir)]
+    finally:
+        shutil.rmtree(workdir)
+    success = all(results)
+    print("=" * 80)
+    print(f"Test Result: {'PASSED' if success else 'FAILED'}")
+    print("=" * 80)
@@ -0,0 +1,3 @@
+"""
+Shared helpers for the YouTube Auto Video Generator tooling scripts
+"""
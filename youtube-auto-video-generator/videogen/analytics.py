@@ -0,0 +1,121 @@
+"""
+Per-state latency, retry and failure statistics across many executions
+"""
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from videogen.history import ExecutionHistoryIndex
+from videogen.history_fetch import DEFAULT_CACHE_DIR, iter_execution_history
+
+PIPELINE_STATES = [
+    'ReadSpreadsheetTask',
+    'GenerateScriptTask',
+    'WriteScriptTask',
+    'GenerateResourcesParallel',
+    'GenerateImageTask',
+    'SynthesizeSpeechTask',
+    'ComposeVideoTask',
+    'UploadToYouTubeTask',
+]
+
+CSV_FIELDS = [
+    'collected_at',
+    'state',
+    'visits',
+    'p50_seconds',
+    'p95_seconds',
+    'p99_seconds',
+    'mean_seconds',
+    'max_seconds',
+    'retries',
+    'failures',
+    'failure_rate',
+]
+
+
+def iter_executions(client, state_machine_arn, status_filter=None, max_executions=None):
+    """Yield executions of a state machine, newest first, following nextToken"""
+    kwargs = {'stateMachineArn': state_machine_arn, 'maxResults': 1000}
+    if status_filter:
+        kwargs['statusFilter'] = status_filter
+    count = 0
+    while True:
+        response = client.list_executions(**kwargs)
+        for execution in response['executions']:
+            yield execution
+            count += 1
+            if max_executions and count >= max_executions:
+                return
+        if not response.get('nextToken'):
+            return
+        kwargs['nextToken'] = response['nextToken']
+
+
+def fetch_indexes(client, execution_arns, max_workers=8, cache_dir=DEFAULT_CACHE_DIR):
+    """Build a history index per execution using a bounded thread pool"""
+    def build(execution_arn):
+        return ExecutionHistoryIndex(iter_execution_history(client, execution_arn, cache_dir=cache_dir))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(build, execution_arns))
+
+
+def percentile(values, pct):
+    """Linearly interpolated percentile of a sorted list"""
+    if not values:
+        return None
+    rank = (len(values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(indexes):
+    """Aggregate per-state statistics across execution indexes"""
+    durations = {}
+    counters = {}
+    for index in indexes:
+        for visit in index.visits:
+            name = visit['name']
+            stats = counters.setdefault(name, {'visits': 0, 'retries': 0, 'failures': 0})
+            stats['visits'] += 1
+            stats['retries'] += max(visit['attempts'] - 1, 0)
+            if visit['succeeded'] is None and visit['failed'] is not None:
+                stats['failures'] += 1
+            if visit['duration'] is not None:
+                durations.setdefault(name, []).append(visit['duration'])
+
+    ordered = [name for name in PIPELINE_STATES if name in counters]
+    ordered += sorted(name for name in counters if name not in PIPELINE_STATES)
+
+    summary = []
+    for name in ordered:
+        values = sorted(durations.get(name, []))
+        stats = counters[name]
+        summary.append({
+            'state': name,
+            'visits': stats['visits'],
+            'p50_seconds': percentile(values, 50),
+            'p95_seconds': percentile(values, 95),
+            'p99_seconds': percentile(values, 99),
+            'mean_seconds': sum(values) / len(values) if values else None,
+            'max_seconds': values[-1] if values else None,
+            'retries': stats['retries'],
+            'failures': stats['failures'],
+            'failure_rate': stats['failures'] / stats['visits'],
+        })
+    return summary
+
+
+def append_csv(summary, path, collected_at=None):
+    """Append summary rows to a CSV file, writing the header for new files"""
+    collected_at = collected_at or datetime.now(timezone.utc).isoformat(timespec='seconds')
+    new_file = not os.path.exists(path)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for row in summary:
+            writer.writerow({'collected_at': collected_at, **row})
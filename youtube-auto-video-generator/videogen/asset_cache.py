@@ -0,0 +1,217 @@
+"""
+Content-addressed cache for generated scripts, images and audio
+"""
+import hashlib
+import json
+import threading
+import time
+
+from videogen.aws_errors import NOT_FOUND_CODES, PRECONDITION_FAILED_CODES, error_code
+
+DEFAULT_PREFIX = 'cache/'
+
+# The assets bucket expires objects after 7 days, so entries are evicted
+# a day earlier to keep the manifest from pointing at deleted objects
+DEFAULT_MAX_AGE_SECONDS = 6 * 24 * 60 * 60
+
+DELETE_BATCH_SIZE = 1000
+
+
+def cache_key(kind, inputs):
+    """Hash of everything that determines a generated asset.
+
+    ``inputs`` holds the prompt, model, voice and any other generation
+    parameter; it is serialised canonically so key order does not matter.
+    """
+    canonical = json.dumps({'kind': kind, 'inputs': inputs}, sort_keys=True,
+                           separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ManifestConflict(Exception):
+    """The manifest kept changing underneath a flush; too many concurrent writers"""
+
+
+class AssetCache:
+    """Manifest of generated assets stored in S3, keyed by ``cache_key``.
+
+    Assets are stored once under ``{prefix}{kind}/{key}{extension}`` and
+    reused by every row whose inputs hash to the same key. Small results
+    such as scripts are kept inline in the manifest instead. The manifest
+    lives at ``{prefix}manifest.json`` and is bounded by ``max_entries``,
+    ``max_bytes`` (least recently used first) and ``max_age_seconds``
+    (oldest first); evicted objects are deleted from the bucket. The
+    manifest is written with a conditional put on the ETag it was merged
+    from, retried up to ``max_conflicts`` times.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=DEFAULT_PREFIX, max_entries=None,
+                 max_bytes=None, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, clock=time.time, max_conflicts=10):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.max_conflicts = max_conflicts
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = None
+        self._removed = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def manifest_key(self):
+        return f"{self.prefix}manifest.json"
+
+    def object_key(self, kind, key, extension=''):
+        """Where the asset for ``key`` is stored"""
+        return f"{self.prefix}{kind}/{key}{extension}"
+
+    def _fetch_manifest(self):
+        """``(entries, etag)``; a missing manifest is empty with no ETag"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.manifest_key)
+        except Exception as e:
+            if error_code(e) not in NOT_FOUND_CODES:
+                raise
+            return {}, None
+        return json.loads(response['Body'].read())['entries'], response.get('ETag')
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._fetch_manifest()[0]
+        return self._entries
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._removed.add(key)
+        self._dirty = True
+
+    def _exists(self, s3_key):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=s3_key)
+            return True
+        except Exception as e:
+            if error_code(e) in NOT_FOUND_CODES:
+                return False
+            raise
+
+    def lookup(self, key):
+        """Manifest entry for ``key`` if its asset is still available"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None or self._expired(entry):
+                return None
+            if entry.get('s3Key') and not self._exists(entry['s3Key']):
+                # Removed behind our back, e.g. by the bucket lifecycle rule
+                self._remove(key)
+                return None
+            entry['lastUsed'] = self.clock()
+            self._dirty = True
+            return entry
+
+    def store(self, key, kind, s3_key=None, size=0, value=None):
+        """Record a freshly generated asset and apply the eviction policy"""
+        now = self.clock()
+        entry = {'kind': kind, 'size': size, 'created': now, 'lastUsed': now}
+        if s3_key:
+            entry['s3Key'] = s3_key
+        if value is not None:
+            entry['value'] = value
+        with self._lock:
+            self._load()[key] = entry
+            self._removed.discard(key)
+            self._dirty = True
+            self.evict()
+        return entry
+
+    def find(self, kind, inputs):
+        """``(key, entry)`` for ``inputs``, counted as a hit or a miss; entry is None on a miss"""
+        key = cache_key(kind, inputs)
+        entry = self.lookup(key)
+        with self._lock:
+            self.stats['hits' if entry is not None else 'misses'] += 1
+        return key, entry
+
+    def get_or_create(self, kind, inputs, create, found=None):
+        """Return ``(entry, hit)``, calling ``create(key)`` only on a miss.
+
+        ``create`` generates the asset and returns a dict with any of
+        ``s3Key``, ``size`` and ``value`` to record in the manifest.
+        ``found`` is the result of an earlier ``find`` for the same
+        inputs, which is then not looked up again.
+        """
+        key, entry = found or self.find(kind, inputs)
+        if entry is not None:
+            return entry, True
+        created = create(key)
+        return self.store(key, kind, created.get('s3Key'), created.get('size', 0),
+                          created.get('value')), False
+
+    def _expired(self, entry):
+        return (self.max_age_seconds is not None
+                and self.clock() - entry['created'] > self.max_age_seconds)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over the limits"""
+        with self._lock:
+            entries = self._load()
+            victims = [key for key, entry in entries.items() if self._expired(entry)]
+            remaining = sorted(
+                (item for item in entries.items() if item[0] not in victims),
+                key=lambda item: item[1]['lastUsed'],
+            )
+            total_bytes = sum(entry['size'] for _, entry in remaining)
+            while remaining and (
+                (self.max_entries is not None and len(remaining) > self.max_entries)
+                or (self.max_bytes is not None and total_bytes > self.max_bytes)
+            ):
+                key, entry = remaining.pop(0)
+                total_bytes -= entry['size']
+                victims.append(key)
+
+            s3_keys = [entries[key]['s3Key'] for key in victims if entries[key].get('s3Key')]
+            for start in range(0, len(s3_keys), DELETE_BATCH_SIZE):
+                self.s3.delete_objects(Bucket=self.bucket, Delete={
+                    'Objects': [{'Key': k} for k in s3_keys[start:start + DELETE_BATCH_SIZE]],
+                    'Quiet': True,
+                })
+            for key in victims:
+                self._remove(key)
+            self.stats['evictions'] += len(victims)
+            return victims
+
+    def flush(self):
+        """Write the manifest back to S3 if it changed.
+
+        The stored manifest is re-read and merged first, so entries added
+        by functions running concurrently (e.g. the image and speech
+        branches) are kept. The put only succeeds if the manifest is still
+        the one merged; otherwise it is re-read and merged again.
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            for _ in range(self.max_conflicts):
+                merged, etag = self._fetch_manifest()
+                for key in self._removed:
+                    merged.pop(key, None)
+                merged.update(self._entries)
+                body = json.dumps({'entries': merged}, ensure_ascii=False)
+                condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+                try:
+                    self.s3.put_object(Bucket=self.bucket, Key=self.manifest_key, Body=body.encode('utf-8'),
+                                       ContentType='application/json', **condition)
+                except Exception as e:
+                    if error_code(e) not in PRECONDITION_FAILED_CODES:
+                        raise
+                    continue
+                self._entries = merged
+                self._removed.clear()
+                self._dirty = False
+                return True
+            raise ManifestConflict(f"s3://{self.bucket}/{self.manifest_key} changed "
+                                   f"{self.max_conflicts} times in a row")
+
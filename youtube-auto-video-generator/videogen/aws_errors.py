@@ -0,0 +1,12 @@
+"""
+Error-code helpers for botocore ClientErrors
+"""
+
+NOT_FOUND_CODES = ('NoSuchKey', '404', 'NotFound')
+
+PRECONDITION_FAILED_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '412')
+
+
+def error_code(error):
+    """Error code of a botocore ClientError, or None for anything else"""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
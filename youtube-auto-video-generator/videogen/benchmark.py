@@ -0,0 +1,101 @@
+"""
+Minimal benchmark runner with JSON results and baseline comparison
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+
+class Skip(Exception):
+    """Raised by a benchmark (or its setup) that cannot run in this environment"""
+
+
+class BenchmarkSuite:
+    """Register benchmarks with ``@suite.benchmark(name)`` and time them.
+
+    A benchmark function may take a ``setup`` result: with
+    ``setup=callable`` the callable runs once, untimed, and its return
+    value is passed in. Each benchmark is called ``number`` times per
+    sample and ``repeat`` samples are taken; results are per call.
+    """
+
+    def __init__(self):
+        self.benchmarks = []
+
+    def benchmark(self, name, setup=None, number=1, repeat=5):
+        def register(func):
+            self.benchmarks.append({'name': name, 'func': func, 'setup': setup,
+                                    'number': number, 'repeat': repeat})
+            return func
+        return register
+
+    def run(self, selected=None, on_result=None):
+        results = {}
+        for bench in self.benchmarks:
+            if selected and not any(pattern in bench['name'] for pattern in selected):
+                continue
+            try:
+                args = (bench['setup'](),) if bench['setup'] else ()
+                samples = []
+                for _ in range(bench['repeat']):
+                    started = time.perf_counter()
+                    for _ in range(bench['number']):
+                        bench['func'](*args)
+                    samples.append((time.perf_counter() - started) / bench['number'])
+                result = {
+                    'min': min(samples),
+                    'median': statistics.median(samples),
+                    'mean': statistics.fmean(samples),
+                    'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                    'repeat': bench['repeat'],
+                    'number': bench['number'],
+                }
+            except Skip as e:
+                result = {'skipped': str(e)}
+            results[bench['name']] = result
+            if on_result:
+                on_result(bench['name'], result)
+        return results
+
+
+def environment():
+    """Where the numbers came from, stored next to them"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'collected_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """Benchmarks whose median slowed down by more than ``threshold`` vs the baseline"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or 'median' not in previous or 'median' not in result:
+            continue
+        ratio = result['median'] / previous['median'] if previous['median'] else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append({'name': name, 'baseline': previous['median'],
+                                'current': result['median'], 'ratio': ratio})
+    return regressions
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
@@ -0,0 +1,152 @@
+"""
+Claim-check offloading of large state payload fields to S3
+"""
+import hashlib
+import json
+import threading
+
+from videogen.aws_errors import NOT_FOUND_CODES, error_code
+
+# Step Functions fails a state whose input or output exceeds 256 KiB
+MAX_STATE_PAYLOAD_BYTES = 256 * 1024
+
+DEFAULT_PREFIX = 'payloads/'
+# Fields at least this large (serialized, UTF-8) travel as references
+DEFAULT_THRESHOLD_BYTES = 8 * 1024
+
+REFERENCE_KEY = 'claimCheck'
+
+# Fields the state machine reads itself, e.g. a Map's ItemsPath, must stay
+# inline; their elements can still be offloaded
+PINNED_FIELDS = ('videosToProcess', 'statusCode', 'spreadsheetId', 'sheetName')
+
+
+def payload_size(value):
+    """Bytes ``value`` takes as state data"""
+    return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+
+def is_reference(value):
+    return isinstance(value, dict) and REFERENCE_KEY in value and set(value) <= {REFERENCE_KEY, 'bytes'}
+
+
+class ClaimCheckStore:
+    """Store large payload fields in S3 and pass ``{'claimCheck': 's3://...'}`` instead.
+
+    ``offload`` works bottom-up: any string, list or object whose
+    serialized size reaches ``threshold_bytes`` is written once under a
+    content hash and replaced by a reference, so a script that flows
+    through several states is uploaded once and only fetched by the
+    states that read it. ``resolve`` follows one reference (lazily, per
+    field) and ``resolve_all`` expands a whole payload for display.
+    Fetched objects are memoised, since a key's content never changes.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=DEFAULT_PREFIX, threshold_bytes=DEFAULT_THRESHOLD_BYTES,
+                 pinned=PINNED_FIELDS):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.threshold_bytes = threshold_bytes
+        self.pinned = set(pinned)
+        self.stats = {'offloaded': 0, 'uploaded': 0, 'fetched': 0}
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def _put(self, body):
+        key = f"{self.prefix}{hashlib.sha256(body).hexdigest()}.json"
+        uri = f"s3://{self.bucket}/{key}"
+        with self._lock:
+            self.stats['offloaded'] += 1
+            if uri in self._known:
+                return uri
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType='application/json')
+        with self._lock:
+            self._known[uri] = json.loads(body)
+            self.stats['uploaded'] += 1
+        return uri
+
+    def _offload(self, value, pinned=False):
+        if is_reference(value):
+            return value
+        if isinstance(value, dict):
+            value = {k: self._offload(v, k in self.pinned) for k, v in value.items()}
+        elif isinstance(value, list):
+            value = [self._offload(item) for item in value]
+        elif not isinstance(value, str):
+            return value
+        body = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        if pinned or len(body) < self.threshold_bytes:
+            return value
+        return {REFERENCE_KEY: self._put(body), 'bytes': len(body)}
+
+    def offload(self, payload):
+        """``payload`` with every field over the threshold replaced by a reference.
+
+        The payload itself stays an object, since states select from it
+        with JSONPath.
+        """
+        return self._offload(payload, pinned=True)
+
+    def resolve(self, value):
+        """The content behind a reference; anything else is returned as is.
+
+        Only this one level is fetched: nested references inside the
+        content stay references until something resolves them.
+        """
+        if not is_reference(value):
+            return value
+        uri = value[REFERENCE_KEY]
+        with self._lock:
+            if uri in self._known:
+                return self._known[uri]
+        bucket, key = uri[len('s3://'):].split('/', 1)
+        try:
+            body = self.s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        except Exception as e:
+            if error_code(e) in NOT_FOUND_CODES:
+                raise LookupError(f"Offloaded payload {uri} no longer exists") from e
+            raise
+        content = json.loads(body)
+        with self._lock:
+            self._known[uri] = content
+            self.stats['fetched'] += 1
+        return content
+
+    def resolve_all(self, value):
+        """``value`` with every reference, at any depth, replaced by its content"""
+        value = self.resolve(value)
+        if isinstance(value, dict):
+            return {k: self.resolve_all(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.resolve_all(item) for item in value]
+        return value
+
+    def resolve_elements(self, value):
+        """``value`` with every list element that is a reference replaced by its content.
+
+        Rows travel as list elements and handlers index into them, so a
+        row offloaded as a whole must be fetched; references in field
+        position stay lazy.
+        """
+        if isinstance(value, list):
+            return [self.resolve_elements(self.resolve(item)) for item in value]
+        if isinstance(value, dict) and not is_reference(value):
+            return {k: self.resolve_elements(v) for k, v in value.items()}
+        return value
+
+    def wrap(self, handler):
+        """A Lambda handler that resolves top-level event fields and list elements, then offloads its result.
+
+        Per-row fields (scripts, descriptions, speech marks) stay
+        references; the handler resolves the ones it actually reads.
+        """
+        def wrapped(event):
+            if isinstance(event, dict):
+                event = {key: self.resolve_elements(self.resolve(value)) for key, value in event.items()}
+            return self.offload(handler(event))
+        return wrapped
+
+def reference_resolver(s3_client):
+    """``resolve_all`` for tools that only read references, such as history analysis"""
+    return ClaimCheckStore(s3_client, bucket=None).resolve_all
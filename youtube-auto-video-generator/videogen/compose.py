@@ -0,0 +1,149 @@
+"""
+Streaming video composition: S3 -> FFmpeg -> S3 without temporary files
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from videogen.encoding import DEFAULT_PROFILE, encode_args, get_profile
+from videogen.s3_transfer import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, MultipartUploader
+
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+WIDTH, HEIGHT = 1280, 720
+
+# Fragmented MP4 needs no seek back to write the moov atom, so it can be
+# written to a pipe and uploaded while FFmpeg is still encoding
+FRAGMENTED_MP4_FLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+# An empty moov has no edit list to absorb the B-frame reorder delay, so
+# the muxer shifted the whole timeline by it (0.2 s at 10 fps), leaving a
+# leading audio gap; a looped still gains nothing from B-frames anyway
+NO_B_FRAMES = ['-bf', '0']
+
+
+def video_filter(width=WIDTH, height=HEIGHT):
+    """Letterbox any input image into the output frame"""
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+    )
+
+
+def build_stream_command(audio_path, ffmpeg_path=FFMPEG_PATH, duration_seconds=None, profile=None):
+    """FFmpeg arguments reading the image on stdin and the MP3 from ``audio_path``.
+
+    A piped image cannot be re-read by ``-loop 1``, so the single decoded
+    frame is repeated with the ``loop`` filter instead. ``profile`` is an
+    encoding profile from ``videogen.encoding`` (standard by default).
+    ``duration_seconds`` is the audio's exact length (see
+    ``videogen.mp3.probe``); the output is cut there instead of relying
+    on ``-shortest``, which keeps encoding the looped image until the
+    muxer notices the audio has ended.
+    """
+    command = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'image2pipe', '-i', 'pipe:0',
+        '-f', 'mp3', '-i', audio_path,
+        '-filter_complex', f"[0:v]loop=loop=-1:size=1:start=0,{video_filter()}[v]",
+        '-map', '[v]', '-map', '1:a',
+        *encode_args(profile or get_profile(DEFAULT_PROFILE)), *NO_B_FRAMES,
+    ]
+    if duration_seconds:
+        command += ['-t', f"{duration_seconds:.3f}"]
+    else:
+        command += ['-shortest']
+    return command + ['-movflags', FRAGMENTED_MP4_FLAGS, '-f', 'mp4', 'pipe:1']
+
+
+def _copy_body(body, sink):
+    """Copy a GetObject body into a writable file object, then close it"""
+    try:
+        while True:
+            chunk = body.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+    except BrokenPipeError:
+        # FFmpeg stops reading once -shortest or -t ends the output
+        pass
+    finally:
+        try:
+            sink.close()
+        except BrokenPipeError:
+            pass
+
+
+def _release_fifo(path):
+    """Unblock a writer still waiting to open ``path`` after FFmpeg has gone"""
+    try:
+        os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+    except OSError:
+        pass
+
+
+def compose_streaming(s3_client, assets_bucket, image_key, audio_key, video_bucket, video_key,
+                      ffmpeg_path=FFMPEG_PATH, part_size=DEFAULT_PART_SIZE, duration_seconds=None,
+                      profile=None, concurrency=DEFAULT_CONCURRENCY):
+    """Compose an image and an MP3 from S3 into an MP4 in S3, streaming end to end.
+
+    The image body is piped into FFmpeg's stdin and the MP3 body into a
+    named pipe; the fragmented MP4 FFmpeg writes to stdout is uploaded
+    part by part, several parts in flight at once. Nothing touches disk
+    except the FIFO itself, so the output size is not limited by Lambda
+    ephemeral storage. ``duration_seconds`` (from SynthesizeSpeech) sizes
+    the encode to the audio exactly.
+    """
+    image = s3_client.get_object(Bucket=assets_bucket, Key=image_key)['Body']
+    audio = s3_client.get_object(Bucket=assets_bucket, Key=audio_key)['Body']
+
+    fifo_dir = tempfile.mkdtemp(prefix='compose-')
+    audio_fifo = os.path.join(fifo_dir, 'audio.mp3')
+    os.mkfifo(audio_fifo)
+    uploader = MultipartUploader(s3_client, video_bucket, video_key, part_size,
+                                 concurrency=concurrency)
+    process = None
+    try:
+        process = subprocess.Popen(
+            build_stream_command(audio_fifo, ffmpeg_path, duration_seconds, profile),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        feeders = [
+            threading.Thread(target=_copy_body, args=(image, process.stdin), daemon=True),
+            # Opening a FIFO for writing blocks until FFmpeg opens it, so do it in the thread
+            threading.Thread(target=lambda: _copy_body(audio, open(audio_fifo, 'wb')), daemon=True),
+        ]
+        stderr = []
+        drain = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        for thread in feeders + [drain]:
+            thread.start()
+
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            uploader.write(chunk)
+
+        returncode = process.wait()
+        drain.join()
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with {returncode}: {b''.join(stderr).decode('utf-8', 'replace')}"
+            )
+        for thread in feeders:
+            thread.join(timeout=5)
+        result = uploader.complete()
+    except BaseException:
+        if process and process.poll() is None:
+            process.kill()
+        _release_fifo(audio_fifo)
+        uploader.abort()
+        raise
+    finally:
+        shutil.rmtree(fifo_dir, ignore_errors=True)
+
+    return {'videoS3Key': video_key, 'size': result['size'], 'parts': result['parts']}
@@ -0,0 +1,86 @@
+"""
+Named encoding profiles for ComposeVideo
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every profile targets still-image content: a low frame rate and a long
+# GOP cost almost nothing in quality because consecutive frames are equal
+PROFILES = {
+    'draft': {
+        'preset': 'ultrafast',
+        'crf': 30,
+        'fps': 5,
+        'gop_seconds': 10,
+        'audio_bitrate': '96k',
+    },
+    'standard': {
+        'preset': 'veryfast',
+        'crf': 23,
+        'fps': 10,
+        'gop_seconds': 10,
+        'audio_bitrate': '128k',
+    },
+    'archival': {
+        'preset': 'slow',
+        'crf': 18,
+        'fps': 30,
+        'gop_seconds': 2,
+        'audio_bitrate': '192k',
+    },
+}
+
+DEFAULT_PROFILE = 'standard'
+
+# Spreadsheet column and execution input field that select a profile
+SHEET_COLUMN = 'encoding_profile'
+EXECUTION_INPUT_FIELD = 'encodingProfile'
+
+
+def get_profile(name):
+    """Settings of a named profile; ValueError for unknown names"""
+    try:
+        return dict(PROFILES[name], name=name)
+    except KeyError:
+        raise ValueError(
+            f"Unknown encoding profile {name!r}; expected one of {', '.join(PROFILES)}"
+        ) from None
+
+
+def resolve_profile(row=None, execution_input=None, default=DEFAULT_PROFILE):
+    """Pick the profile for a video: the sheet row wins over the run's input.
+
+    An unknown name falls back to ``default`` with a warning, so one
+    mistyped cell does not fail ReadSpreadsheet for every row.
+    """
+    for source, field in ((row, SHEET_COLUMN), (execution_input, EXECUTION_INPUT_FIELD)):
+        name = (source or {}).get(field)
+        if name and str(name).strip():
+            try:
+                return get_profile(str(name).strip().lower())
+            except ValueError as e:
+                logger.warning("%s; using %s for row %s", e, default, (row or {}).get('rowIndex'))
+                return get_profile(default)
+    return get_profile(default)
+
+
+def video_args(profile):
+    """FFmpeg video output arguments for a profile (frame rate included)"""
+    gop = profile['fps'] * profile['gop_seconds']
+    return [
+        '-r', str(profile['fps']),
+        '-c:v', 'libx264', '-preset', profile['preset'], '-tune', 'stillimage',
+        '-crf', str(profile['crf']), '-g', str(gop), '-keyint_min', str(gop),
+        '-pix_fmt', 'yuv420p',
+    ]
+
+
+def audio_args(profile):
+    """FFmpeg audio output arguments for a profile"""
+    return ['-c:a', 'aac', '-b:a', profile['audio_bitrate']]
+
+
+def encode_args(profile):
+    """FFmpeg output arguments for a profile"""
+    return video_args(profile) + audio_args(profile)
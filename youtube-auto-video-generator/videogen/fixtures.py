@@ -0,0 +1,72 @@
+"""
+Deterministic media fixtures generated without FFmpeg or an encoder
+"""
+import struct
+import zlib
+
+MP3_SAMPLE_RATE = 44100
+MP3_SAMPLES_PER_FRAME = 1152
+
+# MPEG-1 Layer III, 32 kbps, 44.1 kHz, mono, no CRC
+_SILENT_FRAME_HEADER = bytes([0xFF, 0xFB, 0x10, 0xC4])
+_SILENT_FRAME_LENGTH = 144 * 32000 // MP3_SAMPLE_RATE
+
+
+def png_bytes(width=1792, height=1024, seed=0):
+    """An RGB PNG of coloured panels over a vertical gradient, like a rendered slide"""
+    panel = max(1, width // 4)
+    rows = []
+    for y in range(height):
+        shade = y * 255 // height
+        row = bytearray([0])  # filter type: None
+        for x in range(width):
+            if x % 128 < 4 or y % 128 < 4:
+                row += b'\xff\xff\xff'
+            else:
+                tint = (x // panel * 61 + seed) % 256
+                row += bytes([tint, shade, 255 - shade])
+        rows.append(bytes(row))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 9))
+            + chunk(b'IEND', b''))
+
+
+def silent_mp3_bytes(seconds, tagged=False):
+    """A constant-bitrate MP3 of digital silence lasting ``seconds``.
+
+    Every frame has zeroed side information, which decoders play as
+    silence, so the file is valid without an MP3 encoder. ``tagged``
+    prepends an ID3v2 tag and a LAME-style Info frame, as encoders do.
+    """
+    frames = round(seconds * MP3_SAMPLE_RATE / MP3_SAMPLES_PER_FRAME)
+    frame = _SILENT_FRAME_HEADER + bytes(_SILENT_FRAME_LENGTH - len(_SILENT_FRAME_HEADER))
+    if not tagged:
+        return frame * frames
+    # Info header after the mono MPEG-1 side information: frame and byte counts
+    info = b'Info' + struct.pack('>III', 3, frames, _SILENT_FRAME_LENGTH * (frames + 1))
+    info_frame = frame[:21] + info + frame[21 + len(info):]
+    id3 = b'ID3\x04\x00\x00' + bytes([0, 0, 0, 19]) + b'TSSE\x00\x00\x00\x09\x00\x00\x00videogen'
+    return id3 + info_frame + frame * frames
+
+
+_SCRIPT_SUBJECTS = ['機械学習', 'データ分析', 'クラウド', 'ニューラルネットワーク', '自然言語処理', '画像認識']
+_SCRIPT_CLAUSES = ['基本的な考え方を整理します', '実際の例を見ていきましょう', 'よくある誤解を解いておきます',
+                   '仕組みを順番に説明します', '身近な応用を紹介します', '注意すべき点を確認しましょう']
+_SCRIPT_ENDINGS = ['。', '！', '？', '。']
+
+
+def japanese_script(sentences, seed=0):
+    """A narration script of ``sentences`` Japanese sentences ending in 。！？"""
+    lines = []
+    for i in range(sentences):
+        n = i + seed
+        subject = _SCRIPT_SUBJECTS[n % len(_SCRIPT_SUBJECTS)]
+        clause = _SCRIPT_CLAUSES[n * 7 % len(_SCRIPT_CLAUSES)]
+        lines.append(f"{subject}について、{clause}{_SCRIPT_ENDINGS[n % len(_SCRIPT_ENDINGS)]}")
+    return ''.join(lines)
@@ -0,0 +1,176 @@
+"""
+Single-pass index over Step Functions execution history events
+"""
+import json
+
+SUCCEEDED_EVENT_TYPES = (
+    'TaskSucceeded',
+    'LambdaFunctionSucceeded',
+    'ParallelStateSucceeded',
+    'MapStateSucceeded',
+)
+
+FAILED_EVENT_TYPES = (
+    'TaskFailed',
+    'TaskTimedOut',
+    'LambdaFunctionFailed',
+    'LambdaFunctionTimedOut',
+    'ParallelStateFailed',
+    'MapStateFailed',
+)
+
+SCHEDULED_EVENT_TYPES = ('TaskScheduled', 'LambdaFunctionScheduled')
+
+EXECUTION_STATUS_BY_EVENT_TYPE = {
+    'ExecutionSucceeded': 'SUCCEEDED',
+    'ExecutionFailed': 'FAILED',
+    'ExecutionTimedOut': 'TIMED_OUT',
+    'ExecutionAborted': 'ABORTED',
+}
+
+
+def _seconds_between(start, end):
+    """Seconds between two event timestamps"""
+    return (end - start).total_seconds()
+
+
+class ExecutionHistoryIndex:
+    """Index of execution history events built in one pass.
+
+    Every event is mapped to the state visit that owns it by following its
+    ``previousEventId`` chain, so events from parallel branches are never
+    matched to the wrong state. Visits inside a Map state record the
+    ``iteration`` (item index) they ran in; other visits have ``None``.
+    ``resolve`` is applied to every parsed output, e.g. a claim-check
+    store's ``resolve_all`` to show offloaded fields in place.
+    """
+
+    def __init__(self, events, resolve=None):
+        self.resolve = resolve
+        self.events_by_id = {}
+        self.visits = []
+        self.visits_by_state = {}
+        self.execution = {'started': None, 'finished': None, 'status': None}
+        self._owner = {}
+        self._iteration = {}
+        for event in events:
+            self._add(event)
+
+    def _open_ancestor(self, visit):
+        while visit is not None and visit['exited'] is not None:
+            visit = visit['parent']
+        return visit
+
+    def _add(self, event):
+        event_id = event['id']
+        event_type = event['type']
+        self.events_by_id[event_id] = event
+        previous_id = event.get('previousEventId')
+        owner = self._owner.get(previous_id)
+
+        if event_type == 'ExecutionStarted':
+            self.execution['started'] = event
+            return
+        if event_type in EXECUTION_STATUS_BY_EVENT_TYPE:
+            self.execution['finished'] = event
+            self.execution['status'] = EXECUTION_STATUS_BY_EVENT_TYPE[event_type]
+            return
+
+        if event_type.endswith('StateEntered'):
+            details = event.get('stateEnteredEventDetails', {})
+            visit = {
+                'name': details.get('name', 'Unknown'),
+                'type': event_type[:-len('StateEntered')],
+                'parent': self._open_ancestor(owner),
+                'iteration': self._iteration.get(previous_id),
+                'entered': event,
+                'exited': None,
+                'succeeded': None,
+                'failed': None,
+                'attempts': 0,
+                'duration': None,
+            }
+            self.visits.append(visit)
+            self.visits_by_state.setdefault(visit['name'], []).append(visit)
+            self._owner[event_id] = visit
+            self._iteration[event_id] = visit['iteration']
+            return
+
+        if event_type.endswith('StateExited'):
+            name = event.get('stateExitedEventDetails', {}).get('name')
+            visit = owner
+            while visit is not None and visit['name'] != name:
+                visit = visit['parent']
+            if visit is None:
+                return
+            visit['exited'] = event
+            visit['duration'] = _seconds_between(
+                visit['entered']['timestamp'], event['timestamp']
+            )
+            self._owner[event_id] = visit
+            self._iteration[event_id] = visit['iteration']
+            return
+
+        visit = self._open_ancestor(owner)
+        if visit is None:
+            return
+        self._owner[event_id] = visit
+        if event_type == 'MapIterationStarted':
+            self._iteration[event_id] = event['mapIterationStartedEventDetails'].get('index')
+            return
+        self._iteration[event_id] = visit['iteration']
+        if event_type in SCHEDULED_EVENT_TYPES:
+            visit['attempts'] += 1
+        elif event_type in SUCCEEDED_EVENT_TYPES:
+            visit['succeeded'] = event
+        elif event_type in FAILED_EVENT_TYPES:
+            visit['failed'] = event
+
+    def get(self, event_id):
+        """Look up an event by id"""
+        return self.events_by_id.get(event_id)
+
+    def task_visits(self):
+        """Task state visits in the order they were entered"""
+        return [visit for visit in self.visits if visit['type'] == 'Task']
+
+    def durations(self):
+        """Map of state name to the durations (seconds) of its visits"""
+        return {
+            name: [v['duration'] for v in visits if v['duration'] is not None]
+            for name, visits in self.visits_by_state.items()
+        }
+
+    def output(self, visit):
+        """Parsed output of a visit's success event, or None"""
+        succeeded = visit['succeeded']
+        if succeeded is None:
+            return None
+        details = next(
+            (value for key, value in succeeded.items() if key.endswith('EventDetails')),
+            {},
+        )
+        output_raw = details.get('output')
+        if not output_raw:
+            return None
+        try:
+            output = json.loads(output_raw)
+        except json.JSONDecodeError:
+            return None
+        return self.resolve(output) if self.resolve else output
+
+    def outputs(self, state_name):
+        """Outputs of every successful visit of a state, e.g. one per Map item"""
+        return [
+            output for output in map(self.output, self.visits_by_state.get(state_name, []))
+            if output is not None
+        ]
+
+    def last_outputs(self):
+        """Map of task state name to the output of its latest successful visit"""
+        outputs = {}
+        for visit in self.task_visits():
+            output = self.output(visit)
+            if output is not None:
+                outputs[visit['name']] = output
+        return outputs
@@ -0,0 +1,89 @@
+"""
+Paginated, streaming execution history fetcher with an on-disk cache
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from videogen.history import EXECUTION_STATUS_BY_EVENT_TYPE
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('VIDEOGEN_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'videogen')),
+    'execution-history',
+)
+
+PAGE_SIZE = 1000
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def cache_path(execution_arn, cache_dir=DEFAULT_CACHE_DIR):
+    """Cache file used for an execution's history"""
+    digest = hashlib.sha256(execution_arn.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{digest}.jsonl")
+
+
+def iter_execution_history(client, execution_arn, cache_dir=DEFAULT_CACHE_DIR,
+                           include_execution_data=True):
+    """Yield every history event of an execution, following nextToken.
+
+    Finished executions are immutable, so once a terminal Execution* event
+    has been seen the full history is written to ``cache_dir`` and later
+    calls for the same ARN are served from disk without any API calls.
+    Pass ``cache_dir=None`` to disable the cache.
+    """
+    path = cache_path(execution_arn, cache_dir) if cache_dir else None
+
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line, object_hook=_decode)
+        return
+
+    spool = None
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        spool = open(f"{path}.{os.getpid()}.tmp", 'w', encoding='utf-8')
+
+    finished = False
+    complete = False
+    try:
+        kwargs = {
+            'executionArn': execution_arn,
+            'maxResults': PAGE_SIZE,
+            'includeExecutionData': include_execution_data,
+        }
+        while True:
+            response = client.get_execution_history(**kwargs)
+            for event in response['events']:
+                if event['type'] in EXECUTION_STATUS_BY_EVENT_TYPE:
+                    finished = True
+                if spool:
+                    spool.write(json.dumps(event, default=_encode, ensure_ascii=False) + '\n')
+                yield event
+
+            next_token = response.get('nextToken')
+            if not next_token:
+                complete = True
+                break
+            kwargs['nextToken'] = next_token
+    finally:
+        if spool:
+            spool.close()
+            # Only a complete history of a finished execution is cacheable;
+            # an abandoned generator or a running execution leaves no file.
+            if finished and complete:
+                os.replace(spool.name, path)
+            else:
+                os.remove(spool.name)
@@ -0,0 +1,129 @@
+"""
+Timed Lambda invocations with cold-start detection from the REPORT log line
+"""
+import base64
+import json
+import re
+import statistics
+import time
+import uuid
+
+_REPORT_FIELDS = {
+    'duration_ms': r'\tDuration: ([\d.]+) ms',
+    'billed_duration_ms': r'Billed Duration: ([\d.]+) ms',
+    'init_duration_ms': r'Init Duration: ([\d.]+) ms',
+    'max_memory_mb': r'Max Memory Used: ([\d.]+) MB',
+}
+
+
+def parse_report(log_tail):
+    """Extract REPORT metrics from the base64 log tail of an invocation"""
+    text = base64.b64decode(log_tail).decode('utf-8', errors='replace') if log_tail else ''
+    report = {}
+    for key, pattern in _REPORT_FIELDS.items():
+        match = re.search(pattern, text)
+        report[key] = float(match.group(1)) if match else None
+    report['cold_start'] = report['init_duration_ms'] is not None
+    return report
+
+
+def invoke_timed(client, function_name, payload):
+    """Invoke a function synchronously and measure it.
+
+    Returns the decoded response payload alongside the client-observed
+    round-trip latency and the metrics Lambda reports for the invocation.
+    """
+    started = time.perf_counter()
+    response = client.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        LogType='Tail',
+        Payload=json.dumps(payload),
+    )
+    body = response['Payload'].read()
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        'status_code': response['StatusCode'],
+        'function_error': response.get('FunctionError'),
+        'payload': json.loads(body) if body else None,
+        'latency_ms': latency_ms,
+        **parse_report(response.get('LogResult')),
+    }
+
+
+def deployment_size(client, function_name):
+    """Deployed package and attached layer sizes in bytes, as Lambda reports them"""
+    config = client.get_function_configuration(FunctionName=function_name)
+    layer_bytes = sum(layer.get('CodeSize', 0) for layer in config.get('Layers', []))
+    return {
+        'code_bytes': config['CodeSize'],
+        'layer_bytes': layer_bytes,
+        'total_bytes': config['CodeSize'] + layer_bytes,
+        'layers': len(config.get('Layers', [])),
+    }
+
+
+NONCE_VARIABLE = 'COLD_START_NONCE'
+
+
+def _set_environment(client, function_name, variables):
+    client.update_function_configuration(FunctionName=function_name, Environment={'Variables': variables})
+    client.get_waiter('function_updated').wait(FunctionName=function_name)
+
+
+def function_environment(client, function_name):
+    """The function's environment variables, without a nonce a past run left behind"""
+    config = client.get_function_configuration(FunctionName=function_name)
+    variables = config.get('Environment', {}).get('Variables', {})
+    return {key: value for key, value in variables.items() if key != NONCE_VARIABLE}
+
+
+def force_cold_start(client, function_name):
+    """Make the next invocation start a fresh execution environment.
+
+    Lambda retires every environment of a function whose configuration
+    changes, so a throwaway ``COLD_START_NONCE`` variable is set and the
+    call waits for the update to finish. Put the variables back with
+    ``restore_environment`` afterwards.
+    """
+    variables = dict(function_environment(client, function_name), **{NONCE_VARIABLE: uuid.uuid4().hex})
+    _set_environment(client, function_name, variables)
+
+
+def restore_environment(client, function_name, variables):
+    """Set the environment variables ``function_environment`` returned before the measurement"""
+    _set_environment(client, function_name, variables)
+
+
+def measure_cold_starts(client, function_name, payload, samples=5):
+    """Init duration over ``samples`` forced cold starts, with the deployment size.
+
+    The handler duration of the cold invocation is kept too: modules a
+    handler loads lazily move out of Init Duration and into it.
+    Invocations that Lambda did not report as cold (another caller got
+    the fresh environment first) are not counted. The function's
+    environment is restored afterwards, even if an invocation fails.
+    """
+    original = function_environment(client, function_name)
+    cold = []
+    try:
+        for _ in range(samples):
+            force_cold_start(client, function_name)
+            invocation = invoke_timed(client, function_name, payload)
+            if invocation['cold_start']:
+                cold.append(invocation)
+    finally:
+        restore_environment(client, function_name, original)
+    result = deployment_size(client, function_name)
+    result['cold_starts'] = len(cold)
+    if cold:
+        init_ms = [invocation['init_duration_ms'] for invocation in cold]
+        result.update(
+            init_ms_median=statistics.median(init_ms),
+            init_ms_min=min(init_ms),
+            init_ms_max=max(init_ms),
+            duration_ms_median=statistics.median(invocation['duration_ms'] for invocation in cold),
+            latency_ms_median=statistics.median(invocation['latency_ms'] for invocation in cold),
+        )
+    return result
@@ -0,0 +1,419 @@
+"""
+Deterministic local stand-ins for the pipeline's Lambda handlers
+"""
+import csv
+import uuid
+from datetime import datetime, timezone
+
+from videogen import mp3
+from videogen.encoding import DEFAULT_PROFILE, get_profile, resolve_profile
+from videogen.fixtures import silent_mp3_bytes
+from videogen.openai_client import summarize_metrics
+from videogen.script_generation import ScriptGenerator, row_messages
+from videogen.sheets_batch import SheetWriteBatch
+from videogen.slideshow import slide_timings
+from videogen.upload_queue import PRIORITY_COLUMN, priority, upload_queued
+from videogen.warm_cache import OPENAI_SECRET_ID, SHEETS_SECRET_ID, YOUTUBE_SECRET_ID
+
+DEFAULT_CSV_PATH = 'test-data/sample-spreadsheet.csv'
+
+IMAGE_KINDS = ['thumbnail', 'explanation', 'background']
+
+# Generation settings that feed the asset cache key alongside the prompt
+SCRIPT_MODEL = 'gpt-3.5-turbo'
+IMAGE_MODEL = 'dall-e-3'
+IMAGE_SIZE = '1792x1024'
+SPEECH_VOICE = 'Takumi'
+SPEECH_ENGINE = 'standard'
+# Narration pace of the stand-in audio when no synthesizer is given
+SPEECH_SECONDS_PER_CHARACTER = 0.15
+
+
+def read_csv_rows(path=DEFAULT_CSV_PATH):
+    """Rows of a sheet export as dicts with 1-based sheet row indexes"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            dict(row, rowIndex=row_index)
+            for row_index, row in enumerate(csv.DictReader(f), 2)
+        ]
+
+
+class LocalServices:
+    """Optional collaborators the stub handlers use in place of their defaults.
+
+    With an ``AssetCache`` (``cache``), scripts, images and audio are
+    looked up by the hash of their generation inputs and only generated on
+    a miss; results carry a ``cached`` flag. With an
+    ``IncrementalSheetReader`` (``reader``), ReadSpreadsheet only returns
+    the rows it selects and claims for this run, and UploadToYouTube
+    completes the rows it marks done. With a Sheets service
+    (``sheets``), WriteScript and UploadToYouTube write their columns back
+    with one batched update per invocation. With an ``UploadQueue``
+    (``queue``), UploadToYouTube only uploads what the day's quota allows,
+    defers the rest, and ``{'drainUploadQueue': true}`` uploads deferred
+    videos. With a ``SpeechSynthesizer`` (``speech``), SynthesizeSpeech
+    produces real chunked audio and reports its exact duration and
+    sentence speech marks. With a ``ClaimCheckStore`` (``claims``), large
+    fields of every result are offloaded to S3 and each handler only
+    fetches the references it reads. With an ``OpenAIClient``
+    (``openai``), GenerateScript and GenerateImage call the API
+    concurrently for all rows and images and report ``openaiMetrics``; a
+    ``script_batch_size`` above 1 packs that many rows into each script
+    request. With a ``SecretCache`` (``secrets``), each handler reads the
+    secrets its Lambda needs through it on every invocation.
+    """
+
+    def __init__(self, cache=None, reader=None, sheets=None, queue=None, speech=None, claims=None,
+                 openai=None, script_batch_size=1, secrets=None):
+        self.cache = cache
+        self.reader = reader
+        self.sheets = sheets
+        self.queue = queue
+        self.speech = speech
+        self.claims = claims
+        self.openai = openai
+        self.script_batch_size = script_batch_size
+        self.secrets = secrets
+
+    def resolve(self, value):
+        """``value`` with any claim-check reference fetched"""
+        return self.claims.resolve(value) if self.claims else value
+
+    def credentials(self, *secret_ids):
+        if self.secrets is not None:
+            for secret_id in secret_ids:
+                self.secrets.secret(secret_id)
+
+    def cached(self, kind, inputs, generate, extension='', found=None):
+        """Return ``(result, hit)`` where result has ``s3Key`` and/or ``value``"""
+        cache = self.cache
+        if cache is None:
+            return generate(None), False
+
+        def create(key):
+            result = generate(cache.object_key(kind, key, extension))
+            if 'data' in result:
+                cache.s3.put_object(Bucket=cache.bucket, Key=result['s3Key'], Body=result['data'])
+                result['size'] = len(result['data'])
+            return result
+
+        return cache.get_or_create(kind, inputs, create, found)
+
+    def flush(self):
+        if self.cache is not None:
+            self.cache.flush()
+
+
+def read_spreadsheet_handler(rows, services):
+    """ReadSpreadsheet over ``rows``, the spreadsheet rows as dicts"""
+
+    def read_spreadsheet(event):
+        services.credentials(SHEETS_SECRET_ID)
+        sheet_name = event.get('sheetName', 'Sheet1')
+        if services.reader is None:
+            selected = [row for row in rows if row.get('status', 'pending') == 'pending']
+            selection = None
+        else:
+            selected, selection = services.reader.select(
+                event.get('spreadsheetId'), sheet_name, rows, event.get('runId') or uuid.uuid4().hex
+            )
+        response = {
+            'statusCode': 200,
+            'spreadsheetId': event.get('spreadsheetId'),
+            'sheetName': sheet_name,
+            'totalVideos': len(rows),
+            'videosToProcess': [
+                dict(
+                    {key: value for key, value in row.items() if value != ''},
+                    encodingProfile=resolve_profile(row, event)['name'],
+                )
+                # Highest priority first, so those videos reach the upload quota first
+                for row in sorted(selected, key=priority)
+            ],
+        }
+        if selection is not None:
+            response['selection'] = selection
+        return response
+
+    return read_spreadsheet
+
+
+def generate_script_handler(services):
+    cache = services.cache
+    generator = (ScriptGenerator(services.openai, batch_size=services.script_batch_size, model=SCRIPT_MODEL)
+                 if services.openai else None)
+
+    def generate_script(event):
+        services.credentials(OPENAI_SECRET_ID)
+        videos = event.get('videosToProcess', [])
+        themes = [services.resolve(video.get('theme', '')) for video in videos]
+        # The rendered prompt covers every column the model sees and the system prompt;
+        # a batch asks for the same script per row, so batched rows share the key
+        inputs = [{
+            'model': SCRIPT_MODEL,
+            'messages': row_messages(video, theme),
+        } for video, theme in zip(videos, themes)]
+
+        # Looked up once: the same results pick the rows to generate and answer the hits
+        found = [cache.find('scripts', key) if cache else None for key in inputs]
+
+        generated = None
+        if generator is not None:
+            # Only rows the cache cannot answer are sent, batched together
+            generated = generator.generate([
+                (video, theme) for video, theme, lookup in zip(videos, themes, found)
+                if lookup is None or lookup[1] is None
+            ])
+
+        def generate(video, theme):
+            if generated is not None:
+                return generated['scripts'][video['rowIndex']]
+            return {
+                'script': f"こんにちは！今日は{video['title']}について学びましょう。{theme}を解説します。",
+                'description': f"{video['title']}の動画です。",
+            }
+
+        results = []
+        for video, theme, key, lookup in zip(videos, themes, inputs, found):
+            result, hit = services.cached('scripts', key, lambda _: {'value': generate(video, theme)},
+                                          found=lookup)
+            results.append(dict(video, **result['value'], scriptGenerated=True, status='success', cached=hit))
+        services.flush()
+        response = {
+            'statusCode': 200,
+            'spreadsheetId': event.get('spreadsheetId'),
+            'sheetName': event.get('sheetName'),
+            'body': {'videosWithScripts': results},
+        }
+        if generated is not None:
+            response['openaiMetrics'] = dict(summarize_metrics(generated['metrics']),
+                                             batches=generated['batches'], truncated=generated['truncated'],
+                                             fallbacks=generated['fallbacks'])
+        return response
+
+    return generate_script
+
+
+def write_script_handler(services, sheet_target):
+    """WriteScript; records the sheet it wrote to in ``sheet_target``"""
+
+    def write_script(event):
+        services.credentials(SHEETS_SECRET_ID)
+        videos = event.get('videosWithScripts', [])
+        sheet_target.update(spreadsheetId=event.get('spreadsheetId'), sheetName=event.get('sheetName') or 'Sheet1')
+        if services.sheets is not None:
+            batch = SheetWriteBatch(services.sheets, sheet_target['spreadsheetId'], sheet_target['sheetName'])
+            for video in videos:
+                batch.update_row(video['rowIndex'], status='processing',
+                                 script=services.resolve(video.get('script', '')),
+                                 description=services.resolve(video.get('description', '')))
+            batch.flush()
+        return {
+            'statusCode': 200,
+            'spreadsheetId': event.get('spreadsheetId'),
+            'processedVideos': [dict(video, scriptWritten=True) for video in videos],
+        }
+
+    return write_script
+
+
+def generate_image_handler(services):
+    openai = services.openai
+
+    def draw(prompt, metrics):
+        if openai is None:
+            return b'\x89PNG\r\n\x1a\n'
+        result = openai.generate_image(prompt, model=IMAGE_MODEL, size=IMAGE_SIZE)
+        metrics.append(result['metrics'])
+        return result['data']
+
+    def generate_image(event):
+        services.credentials(OPENAI_SECRET_ID)
+        metrics = []
+
+        def generate(task):
+            video, n, kind = task
+            inputs = {
+                'model': IMAGE_MODEL,
+                'size': IMAGE_SIZE,
+                'prompt': f"{kind}: {video['title']} {services.resolve(video.get('theme', ''))}",
+            }
+            result, hit = services.cached('images', inputs, lambda key: {
+                's3Key': key or f"images/{video['rowIndex']}_{n}.png",
+                'data': draw(inputs['prompt'], metrics),
+            }, '.png')
+            return {'index': n, 'kind': kind, 's3Key': result['s3Key']}, hit
+
+        # Every image of every row is one task, so they can all run at once
+        tasks = [(video, n, kind) for video in event.get('processedVideos', [])
+                 for n, kind in enumerate(IMAGE_KINDS, 1)]
+        generated = iter(openai.map(generate, tasks) if openai else [generate(task) for task in tasks])
+        videos = []
+        for video in event.get('processedVideos', []):
+            images = []
+            hits = 0
+            for _ in IMAGE_KINDS:
+                image, hit = next(generated)
+                hits += hit
+                images.append(image)
+            videos.append({
+                'rowIndex': video['rowIndex'],
+                'title': video['title'],
+                'imageGenerated': True,
+                'images': images,
+                'imageS3Key': images[0]['s3Key'],
+                'encodingProfile': video.get('encodingProfile', DEFAULT_PROFILE),
+                PRIORITY_COLUMN: video.get(PRIORITY_COLUMN, ''),
+                'cached': hits == len(images),
+            })
+        services.flush()
+        response = {'statusCode': 200, 'spreadsheetId': event.get('spreadsheetId'), 'videosWithImages': videos}
+        if openai is not None:
+            response['openaiMetrics'] = summarize_metrics(metrics)
+        return response
+
+    return generate_image
+
+
+def synthesize_speech_handler(services):
+    speech = services.speech
+
+    def synthesize(video, key):
+        s3_key = key or f"audio/{video['rowIndex']}_speech.mp3"
+        script = services.resolve(video.get('script', ''))
+        if speech is None:
+            audio = silent_mp3_bytes(max(1, len(script)) * SPEECH_SECONDS_PER_CHARACTER)
+            return {'s3Key': s3_key, 'data': audio,
+                    'value': {'durationSeconds': round(mp3.probe(audio)['duration'], 3)}}
+        result = speech.synthesize(script)
+        return {'s3Key': s3_key, 'data': result['audio'], 'value': {
+            'durationSeconds': round(result['duration'], 3),
+            # Slides only need sentence starts; word marks stay with the audio
+            'speechMarks': [mark for mark in result['speech_marks'] if mark['type'] == 'sentence'],
+            'chunks': result['chunks'],
+        }}
+
+    def synthesize_speech(event):
+        voice = speech.voice if speech else SPEECH_VOICE
+        engine = speech.engine if speech else SPEECH_ENGINE
+        videos = []
+        for video in event.get('processedVideos', []):
+            inputs = {'voice': voice, 'engine': engine, 'text': services.resolve(video.get('script', ''))}
+            result, hit = services.cached('audio', inputs, lambda key: synthesize(video, key), '.mp3')
+            videos.append(dict(
+                result['value'],
+                rowIndex=video['rowIndex'],
+                title=video['title'],
+                audioGenerated=True,
+                audioS3Key=result['s3Key'],
+                voice=voice,
+                cached=hit,
+            ))
+        services.flush()
+        return {'statusCode': 200, 'videosWithAudio': videos}
+
+    return synthesize_speech
+
+
+def compose_video_handler(services, timestamp=0):
+    """ComposeVideo; ``timestamp`` is used in the composed object keys"""
+
+    def compose_video(event):
+        audio_by_row = {video['rowIndex']: video for video in event.get('videosWithAudio', [])}
+        composed = []
+        for video in event.get('videosWithImages', []):
+            audio = audio_by_row.get(video['rowIndex'])
+            if not audio:
+                continue
+            composed.append({
+                'rowIndex': video['rowIndex'],
+                'title': video['title'],
+                'videoS3Key': f"videos/composed_{video['rowIndex']}_{timestamp}.mp4",
+                'videoComposed': True,
+                'durationSeconds': audio['durationSeconds'],
+                'encodingProfile': get_profile(video.get('encodingProfile', DEFAULT_PROFILE))['name'],
+                PRIORITY_COLUMN: video.get(PRIORITY_COLUMN, ''),
+                'slides': [
+                    dict(timing, s3Key=image['s3Key'])
+                    for timing, image in zip(
+                        slide_timings(len(video['images']), audio['durationSeconds'],
+                                      services.resolve(audio.get('speechMarks'))),
+                        video['images'],
+                    )
+                ],
+            })
+        return {'statusCode': 200, 'composedVideos': composed}
+
+    return compose_video
+
+
+def upload_to_youtube_handler(services, sheet_target, timestamp=0):
+    """UploadToYouTube; writes back to the sheet WriteScript recorded in ``sheet_target``"""
+    sheets = services.sheets
+
+    def upload_to_youtube(event):
+        services.credentials(YOUTUBE_SECRET_ID, SHEETS_SECRET_ID)
+        uploaded = []
+
+        def upload(video):
+            uploaded.append(video)
+            return {
+                'rowIndex': video['rowIndex'],
+                'title': video['title'],
+                'videoId': f"local-{video['rowIndex']}",
+                'uploaded': True,
+            }
+
+        # Queued videos remember which sheet they came from, for a later drain
+        videos = [dict(video, **sheet_target) for video in event.get('composedVideos', [])]
+        if services.queue is None:
+            results, deferred = [upload(video) for video in videos], []
+        else:
+            results, deferred = upload_queued(services.queue, videos, upload)
+
+        new_keys = {video['videoS3Key'] for video in videos}
+        processed_at = datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+        updates = [(video, {'status': 'completed', 'processed_at': processed_at}) for video in uploaded]
+        updates += [(dict(video, **sheet_target), {'status': 'queued'})
+                    for video in deferred if video['videoS3Key'] in new_keys]
+        targets = {}
+        for video, fields in updates:
+            if video.get('spreadsheetId'):
+                targets.setdefault((video['spreadsheetId'], video['sheetName']), []).append((video, fields))
+        for target, target_updates in targets.items():
+            if sheets is not None:
+                batch = SheetWriteBatch(sheets, *target)
+                for video, fields in target_updates:
+                    batch.update_row(video['rowIndex'], **fields)
+                batch.flush()
+            if services.reader is not None:
+                # Only once the sheet shows them done may the snapshot move past their inputs
+                services.reader.complete(*target, [video['rowIndex'] for video, _ in target_updates])
+        return {'statusCode': 200, 'uploadResults': results, 'deferredVideos': deferred}
+
+    return upload_to_youtube
+
+
+def stub_handlers(rows, services=None, timestamp=0):
+    """Handlers keyed by function name that mimic each Lambda's contract.
+
+    ``rows`` are the spreadsheet rows ReadSpreadsheet returns;
+    ``services`` is a ``LocalServices`` with the collaborators to use in
+    place of the defaults; ``timestamp`` is used in generated object keys
+    so runs are reproducible.
+    """
+    services = services or LocalServices()
+    # Where to write back; the upload event does not carry the spreadsheet
+    sheet_target = {}
+    handlers = {
+        'ReadSpreadsheet': read_spreadsheet_handler(rows, services),
+        'GenerateScript': generate_script_handler(services),
+        'WriteScript': write_script_handler(services, sheet_target),
+        'GenerateImage': generate_image_handler(services),
+        'SynthesizeSpeech': synthesize_speech_handler(services),
+        'ComposeVideo': compose_video_handler(services, timestamp),
+        'UploadToYouTube': upload_to_youtube_handler(services, sheet_target, timestamp),
+    }
+    if services.claims is not None:
+        handlers = {name: services.claims.wrap(handler) for name, handler in handlers.items()}
+    return handlers
@@ -0,0 +1,450 @@
+"""
+In-process interpreter for the video generation state machine
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from videogen.claim_check import MAX_STATE_PAYLOAD_BYTES
+
+# Definitions synthesized from step-functions-stack.ts by
+# infrastructure/bin/application/definitions.ts, one per processing mode
+DEFINITIONS_DIR = os.path.join(os.path.dirname(__file__), 'definitions')
+
+# Optimized Lambda integration; Parameters carry FunctionName and Payload
+LAMBDA_INVOKE = 'arn:aws:states:::lambda:invoke'
+
+# Imported function ARNs are written as export names such as
+# VideoGen-LambdaLight-ReadSpreadsheetFunctionArn-dev
+_FUNCTION_EXPORT = re.compile(r"-(\w+?)FunctionArn-")
+
+
+def handler_name(function_name):
+    """Local handler key for a Lambda FunctionName in a synthesized definition"""
+    match = _FUNCTION_EXPORT.search(function_name)
+    return match.group(1) if match else function_name
+
+
+def _set_max_concurrency(states, max_concurrency):
+    for state in states.values():
+        if state['Type'] == 'Map':
+            state['MaxConcurrency'] = max_concurrency
+            _set_max_concurrency(state.get('ItemProcessor', state.get('Iterator'))['States'], max_concurrency)
+        elif state['Type'] == 'Parallel':
+            for branch in state['Branches']:
+                _set_max_concurrency(branch['States'], max_concurrency)
+
+
+def build_definition(processing_mode='batch', max_concurrency=5, drain_upload_queue=False):
+    """The deployed state machine definition for ``processing_mode``.
+
+    ``processing_mode`` is ``'batch'`` or ``'perVideo'``, as in the stage
+    config; perVideo runs the video states once per row inside a Map of
+    at most ``max_concurrency`` iterations. ``drain_upload_queue`` selects
+    the variant that starts with DrainUploadQueueTask. Tasks invoke Lambda
+    functions through ``lambda:invoke``; the runner calls the local handler
+    named after each function instead.
+    """
+    suffix = '-drain' if drain_upload_queue else ''
+    path = os.path.join(DEFINITIONS_DIR, f'{processing_mode}{suffix}.asl.json')
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown processing mode {processing_mode!r}")
+    with open(path, encoding='utf-8') as f:
+        definition = json.load(f)
+    _set_max_concurrency(definition['States'], max_concurrency)
+    return definition
+
+
+VIDEO_GENERATION_DEFINITION = build_definition()
+
+
+class StatesError(Exception):
+    """An error raised while running a state, named like its ASL counterpart"""
+
+    def __init__(self, error, cause=''):
+        super().__init__(f"{error}: {cause}" if cause else error)
+        self.error = error
+        self.cause = cause
+
+
+_PATH_TOKEN = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]")
+
+
+def read_path(data, path):
+    """Resolve a reference path such as ``$.body.videos`` or ``$[0].key``"""
+    if path == '$':
+        return data
+    if not path.startswith('$'):
+        raise StatesError('States.Runtime', f"Invalid path {path!r}")
+    value = data
+    position = 1
+    while position < len(path):
+        match = _PATH_TOKEN.match(path, position)
+        if not match:
+            raise StatesError('States.Runtime', f"Invalid path {path!r}")
+        key, index = match.groups()
+        try:
+            value = value[key] if key is not None else value[int(index)]
+        except (KeyError, IndexError, TypeError):
+            raise StatesError(
+                'States.Runtime',
+                f"The JSONPath {path!r} could not be found in the input",
+            ) from None
+        position = match.end()
+    return value
+
+
+def write_path(data, path, value):
+    """Apply a ResultPath; returns the new state data"""
+    if path is None:
+        return data
+    if path == '$':
+        return value
+    keys = [key for key, _ in _PATH_TOKEN.findall(path)]
+    result = dict(data) if isinstance(data, dict) else {}
+    target = result
+    for key in keys[:-1]:
+        target[key] = dict(target.get(key) or {})
+        target = target[key]
+    target[keys[-1]] = value
+    return result
+
+
+_INTRINSIC = re.compile(r"^States\.Array\((.*)\)$")
+
+
+def _resolve(path, data, context):
+    intrinsic = _INTRINSIC.match(path)
+    if intrinsic:
+        return [
+            _resolve(arg.strip(), data, context)
+            for arg in intrinsic.group(1).split(',') if arg.strip()
+        ]
+    if path.startswith('$$'):
+        return read_path(context or {}, path[1:])
+    return read_path(data, path)
+
+
+def apply_parameters(template, data, context=None):
+    """Expand a Parameters template; keys ending in ``.$`` are paths.
+
+    ``$$.`` paths read from ``context`` (e.g. ``$$.Map.Item.Value``) and the
+    ``States.Array`` intrinsic is supported.
+    """
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith('.$'):
+                resolved[key[:-2]] = _resolve(value, data, context)
+            else:
+                resolved[key] = apply_parameters(value, data, context)
+        return resolved
+    if isinstance(template, list):
+        return [apply_parameters(item, data, context) for item in template]
+    return template
+
+
+def _matches(error, error_equals):
+    # States.Runtime always fails the execution, even under States.ALL
+    if error == 'States.Runtime':
+        return False
+    # An oversized payload is terminal unless a catcher names it explicitly
+    if error == 'States.DataLimitExceeded':
+        return error in error_equals
+    return 'States.ALL' in error_equals or error in error_equals or (
+        'States.TaskFailed' in error_equals and error != 'States.Timeout'
+    )
+
+
+_COMPARATORS = {
+    'NumericEquals': lambda a, b: isinstance(a, (int, float)) and a == b,
+    'NumericGreaterThan': lambda a, b: isinstance(a, (int, float)) and a > b,
+    'NumericLessThan': lambda a, b: isinstance(a, (int, float)) and a < b,
+    'StringEquals': lambda a, b: isinstance(a, str) and a == b,
+    'BooleanEquals': lambda a, b: isinstance(a, bool) and a == b,
+}
+
+
+def _evaluate(rule, data):
+    if 'And' in rule:
+        return all(_evaluate(r, data) for r in rule['And'])
+    if 'Or' in rule:
+        return any(_evaluate(r, data) for r in rule['Or'])
+    if 'Not' in rule:
+        return not _evaluate(rule['Not'], data)
+    try:
+        value = read_path(data, rule['Variable'])
+    except StatesError:
+        if 'IsPresent' in rule:
+            return rule['IsPresent'] is False
+        raise
+    if 'IsPresent' in rule:
+        return rule['IsPresent'] is True
+    for operator, compare in _COMPARATORS.items():
+        if operator in rule:
+            return compare(value, rule[operator])
+    raise StatesError('States.Runtime', f"Unsupported choice rule {rule}")
+
+
+def _json_copy(value):
+    """Round-trip through JSON, as state data does between AWS states"""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+class _History:
+    """Thread-safe recorder of get_execution_history-shaped events"""
+
+    def __init__(self, include_execution_data):
+        self.events = []
+        self.include_execution_data = include_execution_data
+        self._lock = threading.Lock()
+
+    def record(self, event_type, previous_id, details_key=None, **details):
+        if not self.include_execution_data:
+            details.pop('input', None)
+            details.pop('output', None)
+        with self._lock:
+            event = {
+                'id': len(self.events) + 1,
+                'previousEventId': previous_id,
+                'type': event_type,
+                'timestamp': datetime.now(timezone.utc),
+            }
+            if details_key:
+                event[details_key] = details
+            self.events.append(event)
+            return event['id']
+
+    def dump(self, value):
+        return json.dumps(value, ensure_ascii=False) if self.include_execution_data else None
+
+
+class LocalStateMachine:
+    """Run a state machine definition in-process against local handlers.
+
+    ``handlers`` maps each invoked function (``ReadSpreadsheet``, ...) or
+    other Task ``Resource`` to a callable taking the Lambda event and
+    returning its payload, so any task can be a stub or a real local
+    implementation. Runs produce the same history events as the AWS
+    API, so they can be inspected with ``ExecutionHistoryIndex``. Retry
+    intervals are skipped unless a ``sleep`` function is supplied. State
+    outputs over ``max_payload_bytes`` fail with States.DataLimitExceeded,
+    as they do in AWS.
+    """
+
+    def __init__(self, handlers, definition=VIDEO_GENERATION_DEFINITION, max_workers=8,
+                 sleep=None, include_execution_data=True, max_payload_bytes=MAX_STATE_PAYLOAD_BYTES):
+        self.handlers = handlers
+        self.definition = definition
+        self.max_workers = max_workers
+        self.sleep = sleep
+        self.include_execution_data = include_execution_data
+        self.max_payload_bytes = max_payload_bytes
+
+    def run(self, execution_input):
+        """Run one execution and return its status, output and history"""
+        history = _History(self.include_execution_data)
+        started = time.perf_counter()
+        previous_id = history.record(
+            'ExecutionStarted', 0, 'executionStartedEventDetails', input=history.dump(execution_input)
+        )
+        result = {'status': 'SUCCEEDED', 'output': None, 'error': None, 'cause': None}
+        try:
+            result['output'], previous_id = self._run_machine(
+                self.definition, _json_copy(execution_input), previous_id, history
+            )
+            history.record('ExecutionSucceeded', previous_id, 'executionSucceededEventDetails',
+                           output=history.dump(result['output']))
+        except StatesError as e:
+            result.update(status='FAILED', error=e.error, cause=e.cause)
+            history.record('ExecutionFailed', len(history.events), 'executionFailedEventDetails',
+                           error=e.error, cause=e.cause)
+        result['duration_seconds'] = time.perf_counter() - started
+        result['events'] = history.events
+        return result
+
+    def _run_machine(self, machine, data, previous_id, history):
+        name = machine['StartAt']
+        while name:
+            state = machine['States'][name]
+            name, data, previous_id = self._run_state(name, state, data, previous_id, history)
+        return data, previous_id
+
+    def _run_state(self, name, state, data, previous_id, history):
+        state_type = state['Type']
+        previous_id = history.record(
+            f"{state_type}StateEntered", previous_id, 'stateEnteredEventDetails',
+            name=name, input=history.dump(data),
+        )
+
+        if state_type == 'Fail':
+            raise StatesError(state.get('Error'), state.get('Cause', ''))
+
+        if state_type == 'Choice':
+            next_name = next(
+                (rule['Next'] for rule in state['Choices'] if _evaluate(rule, data)),
+                state.get('Default'),
+            )
+            if next_name is None:
+                raise StatesError('States.NoChoiceMatched', f"No choice matched in {name}")
+            previous_id = self._exit(name, state_type, data, previous_id, history)
+            return next_name, data, previous_id
+
+        effective = read_path(data, state.get('InputPath', '$'))
+        if 'Parameters' in state and state_type != 'Map':
+            effective = apply_parameters(state['Parameters'], effective)
+
+        try:
+            if state_type == 'Task':
+                result, previous_id = self._run_task(state, effective, previous_id, history)
+            elif state_type == 'Parallel':
+                result, previous_id = self._run_parallel(state, effective, previous_id, history)
+            elif state_type == 'Map':
+                result, previous_id = self._run_map(name, state, effective, previous_id, history)
+            elif state_type == 'Pass':
+                result = state.get('Result', effective)
+            elif state_type == 'Succeed':
+                result = effective
+            else:
+                raise StatesError('States.Runtime', f"Unsupported state type {state_type}")
+        except StatesError as e:
+            catcher = next(
+                (c for c in state.get('Catch', []) if _matches(e.error, c['ErrorEquals'])),
+                None,
+            )
+            if catcher is None:
+                raise
+            error_output = {'Error': e.error, 'Cause': e.cause}
+            data = write_path(data, catcher.get('ResultPath', '$'), error_output)
+            previous_id = self._exit(name, state_type, data, previous_id, history)
+            return catcher['Next'], data, previous_id
+
+        output = write_path(data, state.get('ResultPath', '$'), result)
+        output = read_path(output, state.get('OutputPath', '$'))
+        self._check_size(name, output)
+        previous_id = self._exit(name, state_type, output, previous_id, history)
+        next_name = None if state.get('End') or state_type == 'Succeed' else state['Next']
+        return next_name, output, previous_id
+
+    def _check_size(self, name, output):
+        if self.max_payload_bytes is None:
+            return
+        size = len(json.dumps(output, ensure_ascii=False).encode('utf-8'))
+        if size > self.max_payload_bytes:
+            raise StatesError('States.DataLimitExceeded',
+                              f"The state/task '{name}' returned a result with a size exceeding "
+                              f"the maximum number of bytes service limit ({size} bytes)")
+
+    def _exit(self, name, state_type, output, previous_id, history):
+        return history.record(
+            f"{state_type}StateExited", previous_id, 'stateExitedEventDetails',
+            name=name, output=history.dump(output),
+        )
+
+    def _run_task(self, state, event, previous_id, history):
+        resource = state['Resource']
+        if resource == LAMBDA_INVOKE:
+            resource = handler_name(event['FunctionName'])
+            event = event.get('Payload', {})
+        handler = self.handlers.get(resource)
+        if handler is None:
+            raise StatesError('States.Runtime', f"No local handler for {resource}")
+
+        retriers = state.get('Retry', [])
+        attempts = {}
+        while True:
+            previous_id = history.record('TaskScheduled', previous_id, 'taskScheduledEventDetails',
+                                         resource=resource)
+            previous_id = history.record('TaskStarted', previous_id)
+            try:
+                payload = _json_copy(handler(_json_copy(event)))
+            except Exception as e:
+                error = getattr(e, 'error', type(e).__name__)
+                cause = json.dumps({'errorMessage': str(e), 'errorType': error}, ensure_ascii=False)
+                previous_id = history.record('TaskFailed', previous_id, 'taskFailedEventDetails',
+                                             error=error, cause=cause)
+                retrier = next((r for r in retriers if _matches(error, r['ErrorEquals'])), None)
+                if retrier is None:
+                    raise StatesError(error, cause) from e
+                index = retriers.index(retrier)
+                attempts[index] = attempts.get(index, 0) + 1
+                if attempts[index] > retrier.get('MaxAttempts', 3):
+                    raise StatesError(error, cause) from e
+                if self.sleep:
+                    self.sleep(retrier.get('IntervalSeconds', 1)
+                               * retrier.get('BackoffRate', 2.0) ** (attempts[index] - 1))
+                continue
+
+            result = {'ExecutedVersion': '$LATEST', 'Payload': payload, 'StatusCode': 200}
+            previous_id = history.record('TaskSucceeded', previous_id, 'taskSucceededEventDetails',
+                                         resource=resource, output=history.dump(result))
+            return result, previous_id
+
+    def _run_parallel(self, state, data, previous_id, history):
+        previous_id = history.record('ParallelStateStarted', previous_id)
+        branches = state['Branches']
+        with ThreadPoolExecutor(max_workers=min(len(branches), self.max_workers)) as pool:
+            futures = [
+                pool.submit(self._run_machine, branch, data, previous_id, history)
+                for branch in branches
+            ]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except StatesError as e:
+                    history.record('ParallelStateFailed', len(history.events),
+                                   'parallelStateFailedEventDetails', error=e.error, cause=e.cause)
+                    raise
+        last_id = max(branch_id for _, branch_id in outcomes)
+        previous_id = history.record('ParallelStateSucceeded', last_id)
+        return [output for output, _ in outcomes], previous_id
+
+    def _run_iteration(self, name, processor, item_input, index, previous_id, history):
+        previous_id = history.record('MapIterationStarted', previous_id,
+                                     'mapIterationStartedEventDetails', name=name, index=index)
+        try:
+            output, previous_id = self._run_machine(processor, item_input, previous_id, history)
+        except StatesError:
+            history.record('MapIterationFailed', len(history.events),
+                           'mapIterationFailedEventDetails', name=name, index=index)
+            raise
+        previous_id = history.record('MapIterationSucceeded', previous_id,
+                                     'mapIterationSucceededEventDetails', name=name, index=index)
+        return output, previous_id
+
+    def _run_map(self, name, state, data, previous_id, history):
+        items = read_path(data, state.get('ItemsPath', '$'))
+        if not isinstance(items, list):
+            raise StatesError('States.Runtime', f"ItemsPath of {name} did not select an array")
+        previous_id = history.record('MapStateStarted', previous_id, 'mapStateStartedEventDetails',
+                                     length=len(items))
+        if not items:
+            return [], history.record('MapStateSucceeded', previous_id)
+
+        selector = state.get('ItemSelector', state.get('Parameters'))
+        processor = state.get('ItemProcessor', state.get('Iterator'))
+        # MaxConcurrency 0 means no limit, as in Step Functions
+        workers = min(state.get('MaxConcurrency') or len(items), len(items), self.max_workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for index, item in enumerate(items):
+                context = {'Map': {'Item': {'Index': index, 'Value': item}}}
+                item_input = apply_parameters(selector, data, context) if selector else item
+                futures.append(pool.submit(self._run_iteration, name, processor,
+                                           _json_copy(item_input), index, previous_id, history))
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except StatesError as e:
+                    history.record('MapStateFailed', len(history.events),
+                                   'mapStateFailedEventDetails', error=e.error, cause=e.cause)
+                    raise
+        last_id = max(iteration_id for _, iteration_id in outcomes)
+        previous_id = history.record('MapStateSucceeded', last_id)
+        return [output for output, _ in outcomes], previous_id
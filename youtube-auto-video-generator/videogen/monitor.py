@@ -0,0 +1,100 @@
+"""
+Event-driven monitor for running Step Functions executions
+"""
+import asyncio
+import json
+
+from videogen.history import EXECUTION_STATUS_BY_EVENT_TYPE
+
+
+class ExecutionMonitor:
+    """Tail the history of one or more executions and report transitions.
+
+    Each poll reads the history newest-first, following ``nextToken`` only
+    until it reaches an event it has already seen, so a poll costs a single
+    API call however long the execution has run. The poll interval starts at
+    ``min_interval`` and grows by ``backoff`` while nothing happens, up to
+    ``max_interval``; any new event resets it.
+    """
+
+    def __init__(self, client, on_event=None, min_interval=0.5, max_interval=10.0,
+                 backoff=1.5, max_concurrent_calls=4):
+        self.client = client
+        self.on_event = on_event
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_concurrent_calls = max_concurrent_calls
+        self._semaphore = None
+
+    async def _new_events(self, execution_arn, last_seen_id):
+        """Events newer than ``last_seen_id``, oldest first"""
+        if self._semaphore is None:
+            # Created lazily so it binds to the loop that runs the monitor
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_calls)
+        fresh = []
+        kwargs = {'executionArn': execution_arn, 'reverseOrder': True, 'maxResults': 100}
+        while True:
+            async with self._semaphore:
+                response = await asyncio.to_thread(self.client.get_execution_history, **kwargs)
+            for event in response['events']:
+                if event['id'] <= last_seen_id:
+                    return list(reversed(fresh))
+                fresh.append(event)
+            if not response.get('nextToken'):
+                return list(reversed(fresh))
+            kwargs['nextToken'] = response['nextToken']
+
+    async def watch(self, execution_arn):
+        """Follow one execution until it finishes and return its result"""
+        last_seen_id = 0
+        interval = self.min_interval
+        while True:
+            events = await self._new_events(execution_arn, last_seen_id)
+            for event in events:
+                last_seen_id = event['id']
+                if self.on_event:
+                    self.on_event(execution_arn, event)
+                status = EXECUTION_STATUS_BY_EVENT_TYPE.get(event['type'])
+                if status:
+                    return _result(execution_arn, status, event)
+
+            if events:
+                interval = self.min_interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+            await asyncio.sleep(interval)
+
+    async def watch_all(self, execution_arns):
+        """Follow many executions concurrently; results keep the input order"""
+        return await asyncio.gather(*(self.watch(arn) for arn in execution_arns))
+
+
+def _result(execution_arn, status, event):
+    details = next(
+        (value for key, value in event.items() if key.endswith('EventDetails')),
+        {},
+    )
+    result = {'executionArn': execution_arn, 'status': status}
+    if details.get('output'):
+        result['output'] = json.loads(details['output'])
+    for key in ('error', 'cause'):
+        if details.get(key):
+            result[key] = details[key]
+    return result
+
+
+def describe_transition(event):
+    """One-line description of a state transition event, or None"""
+    event_type = event['type']
+    if event_type.endswith('StateEntered'):
+        return f"▶️  {event['stateEnteredEventDetails']['name']}"
+    if event_type.endswith('StateExited'):
+        return f"✅ {event['stateExitedEventDetails']['name']}"
+    if event_type.endswith('Failed') or event_type.endswith('TimedOut'):
+        details = next(
+            (value for key, value in event.items() if key.endswith('EventDetails')),
+            {},
+        )
+        return f"❌ {event_type}: {details.get('error', 'Unknown error')}"
+    return None
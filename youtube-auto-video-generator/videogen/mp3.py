@@ -0,0 +1,224 @@
+"""
+MPEG audio frame parsing, duration probing and frame-level MP3 concatenation
+"""
+import mmap
+
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and for MPEG-2/2.5
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+MONO = 3
+
+INFO_TAGS = (b'Xing', b'Info')
+# The Fraunhofer VBRI header sits at a fixed offset after the frame header
+VBRI_OFFSET = 36
+
+# Xing/Info flags for the optional fields that follow them, in order
+XING_FRAMES, XING_BYTES, XING_TOC, XING_QUALITY = 1, 2, 4, 8
+# Encoder tags that carry LAME's delay/padding field after the Info header
+LAME_TAGS = (b'LAME', b'Lavc', b'Lavf')
+
+
+def frame_header(data, offset=0):
+    """Decode the Layer III frame header at ``offset``, or None if there is none.
+
+    Returns ``version``, ``sample_rate``, ``channel_mode``, ``samples``
+    (per frame), ``length`` (bytes, including the header) and
+    ``side_info`` (where the Xing/Info tag would start).
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    version = _VERSIONS.get((b1 >> 3) & 3)
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version is None or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    channel_mode = b3 >> 6
+    samples = 1152 if version == 1 else 576
+    length = samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 1)
+    if version == 1:
+        side_info = 17 if channel_mode == MONO else 32
+    else:
+        side_info = 9 if channel_mode == MONO else 17
+    crc = 0 if b1 & 1 else 2
+    return {
+        'version': version,
+        'sample_rate': sample_rate,
+        'channel_mode': channel_mode,
+        'samples': samples,
+        'length': length,
+        'side_info': 4 + crc + side_info,
+    }
+
+
+def id3v2_size(data):
+    """Bytes taken by a leading ID3v2 tag, 0 if there is none"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _synced(data, offset):
+    """A frame header at ``offset`` that is followed by another frame or the end"""
+    header = frame_header(data, offset)
+    if header is None:
+        return None
+    following = offset + header['length']
+    if following < len(data) and frame_header(data, following) is None and following + 4 <= len(data):
+        # The next bytes may be a trailing tag; a lone frame is still a frame
+        if data[following:following + 3] not in (b'TAG', b'APE'):
+            return None
+    return header
+
+
+def iter_frames(data):
+    """Yield ``(offset, header)`` for every audio frame, skipping tags and junk"""
+    offset = id3v2_size(data)
+    while offset + 4 <= len(data):
+        header = _synced(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        if offset + header['length'] > len(data):
+            return
+        yield offset, header
+        offset += header['length']
+
+
+def is_info_frame(data, offset, header):
+    """Whether the frame carries a Xing/Info or VBRI header instead of audio"""
+    tag_at = offset + header['side_info']
+    return (data[tag_at:tag_at + 4] in INFO_TAGS
+            or data[offset + VBRI_OFFSET:offset + VBRI_OFFSET + 4] == b'VBRI')
+
+
+def _info_header(data, offset, header):
+    """Frame count and gapless trim from a Xing/Info or VBRI header, if present.
+
+    Returns ``(frames, delay, padding)`` with the encoder delay and
+    padding in samples from the LAME tag (0 without one), or None.
+    """
+    tag_at = offset + header['side_info']
+    if data[tag_at:tag_at + 4] in INFO_TAGS:
+        flags = int.from_bytes(data[tag_at + 4:tag_at + 8], 'big')
+        if not flags & XING_FRAMES:
+            return None
+        frames = int.from_bytes(data[tag_at + 8:tag_at + 12], 'big')
+        lame_at = tag_at + 8 + sum(size for flag, size in ((XING_FRAMES, 4), (XING_BYTES, 4),
+                                                           (XING_TOC, 100), (XING_QUALITY, 4))
+                                   if flags & flag)
+        delay = padding = 0
+        if data[lame_at:lame_at + 4] in LAME_TAGS:
+            trim = int.from_bytes(data[lame_at + 21:lame_at + 24], 'big')
+            delay, padding = trim >> 12, trim & 0xFFF
+        return frames, delay, padding
+    vbri_at = offset + VBRI_OFFSET
+    if data[vbri_at:vbri_at + 4] == b'VBRI':
+        return int.from_bytes(data[vbri_at + 14:vbri_at + 18], 'big'), 0, 0
+    return None
+
+
+def probe(data):
+    """Duration of an MP3 from its headers, without decoding any audio.
+
+    An encoder's Xing/Info or VBRI header gives the frame count from the
+    first frame alone, less the encoder delay and padding a LAME tag
+    records. Without one, every frame header is read, which touches 4
+    bytes per frame. ``data`` is bytes or anything indexable like them,
+    such as an ``mmap``. Returns ``duration`` (seconds), ``frames``,
+    ``sample_rate`` and ``source`` (``'header'`` or ``'frames'``).
+    """
+    frames = iter_frames(data)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("No MPEG Layer III frames found")
+    offset, header = first
+    info = _info_header(data, offset, header)
+    if info is not None and info[0]:
+        count, delay, padding = info
+        samples = count * header['samples'] - delay - padding
+        source = 'header'
+    else:
+        # A Xing header without a frame count is not audio itself
+        count = 0 if info is not None or is_info_frame(data, offset, header) else 1
+        samples = count * header['samples']
+        for _, other in frames:
+            count += 1
+            samples += other['samples']
+        source = 'frames'
+    return {'duration': samples / header['sample_rate'], 'frames': count,
+            'sample_rate': header['sample_rate'], 'source': source}
+
+
+def probe_file(path):
+    """``probe`` a file through a memory map, so only touched pages are read"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return probe(data)
+
+
+def read_frames(data):
+    """The audio frames of an MP3 with tags and the Xing/Info frame removed.
+
+    Returns ``data`` (the frames), ``frames``, ``samples``,
+    ``sample_rate``, ``channel_mode`` and ``duration`` in seconds.
+    """
+    frames = []
+    first = None
+    for offset, header in iter_frames(data):
+        if first is None:
+            first = header
+            if is_info_frame(data, offset, header):
+                continue
+        elif (header['sample_rate'], header['channel_mode']) != (first['sample_rate'], first['channel_mode']):
+            raise ValueError("MP3 changes sample rate or channel mode mid-stream")
+        frames.append((offset, header))
+    if not frames:
+        raise ValueError("No MPEG Layer III frames found")
+    samples = sum(header['samples'] for _, header in frames)
+    return {
+        'data': b''.join(data[offset:offset + header['length']] for offset, header in frames),
+        'frames': len(frames),
+        'samples': samples,
+        'sample_rate': first['sample_rate'],
+        'channel_mode': first['channel_mode'],
+        'duration': samples / first['sample_rate'],
+    }
+
+
+def duration_seconds(data):
+    """Playing time of an MP3 from its headers"""
+    return probe(data)['duration']
+
+
+def concatenate(parts):
+    """Join MP3s at frame level without re-encoding.
+
+    Each part's ID3 tags and Xing/Info frame are dropped, since a header
+    describing one part would make players misjudge the joined length,
+    and a tag in the middle would be decoded as noise. Every part must
+    use the same sample rate and channel mode. ``parts`` are MP3 bytes
+    or results of ``read_frames``.
+    """
+    streams = [part if isinstance(part, dict) else read_frames(part) for part in parts]
+    if not streams:
+        raise ValueError("Nothing to concatenate")
+    formats = {(stream['sample_rate'], stream['channel_mode']) for stream in streams}
+    if len(formats) > 1:
+        raise ValueError(f"Cannot join MP3s with different formats: {sorted(formats)}")
+    return b''.join(stream['data'] for stream in streams)
@@ -0,0 +1,186 @@
+"""
+Concurrent OpenAI chat and image requests under the account's rate limits
+"""
+import base64
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from videogen.rate_limit import RateLimiter, retry_after_seconds
+
+API_BASE_URL = 'https://api.openai.com/v1'
+
+CHAT_MODEL = 'gpt-3.5-turbo'
+IMAGE_MODEL = 'dall-e-3'
+IMAGE_SIZE = '1792x1024'
+
+# Our usage tier's limits; the stacks override them per stage
+DEFAULT_REQUESTS_PER_MINUTE = 3500
+DEFAULT_TOKENS_PER_MINUTE = 90000
+DEFAULT_IMAGES_PER_MINUTE = 50
+DEFAULT_CONCURRENCY = 8
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+def estimate_tokens(text):
+    """Rough token count: about 4 ASCII characters per token, 1 per other character"""
+    ascii_characters = sum(1 for character in text if character < '\x80')
+    return (ascii_characters + 3) // 4 + len(text) - ascii_characters
+
+
+def _request(url, headers, body, timeout=120):
+    """POST ``body``; returns ``(status, headers, body)`` with lower-case header names"""
+    parts = urlsplit(url)
+    connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                        else http.client.HTTPConnection)
+    connection = connection_class(parts.netloc, timeout=timeout)
+    try:
+        connection.request('POST', parts.path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    finally:
+        connection.close()
+
+
+class OpenAIError(Exception):
+    """The API rejected a request, or kept throttling it past the retries"""
+
+    def __init__(self, status, body):
+        super().__init__(f"OpenAI request failed with HTTP {status}: {body[:500]}")
+        self.status = status
+
+
+class OpenAIClient:
+    """Chat completions and image generations with rate limiting and retries.
+
+    Calls from any number of threads share one ``RateLimiter`` per
+    endpoint family: chat calls reserve a request and their estimated
+    tokens (prompt plus ``max_tokens``, as OpenAI counts them) before
+    they are sent, and image calls reserve one image. A 429 pauses every
+    caller for the ``Retry-After`` the server sends, plus a little
+    jitter each; without the header, and for 5xx and dropped
+    connections, the caller backs off exponentially with full jitter.
+    Each result carries ``metrics`` for its call: ``latency`` (seconds,
+    including waits), ``waited``, ``attempts``, ``throttled`` and the
+    token counts. ``map`` runs calls ``concurrency`` at a time.
+    """
+
+    def __init__(self, api_key, base_url=API_BASE_URL, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, images_per_minute=DEFAULT_IMAGES_PER_MINUTE,
+                 concurrency=DEFAULT_CONCURRENCY, max_retries=6, base_delay=1.0, max_delay=30.0,
+                 period=60.0, clock=time.monotonic, sleep=time.sleep, request=_request):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.chat_limiter = RateLimiter(requests_per_minute, tokens_per_minute, period=period,
+                                        clock=clock, sleep=sleep)
+        self.image_limiter = RateLimiter(images_per_minute, period=period, clock=clock, sleep=sleep)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.request = request
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def _auth(self):
+        value = self.api_key() if callable(self.api_key) else self.api_key
+        return {'Authorization': f"Bearer {value}", 'Content-Type': 'application/json'}
+
+    def _post(self, endpoint, payload, limiter, tokens=0):
+        started = self.clock()
+        metrics = {'endpoint': endpoint, 'model': payload.get('model'), 'attempts': 0,
+                   'throttled': 0, 'waited': 0.0}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        for attempt in range(self.max_retries + 1):
+            metrics['waited'] += limiter.acquire(tokens)
+            metrics['attempts'] += 1
+            try:
+                status, headers, response = self.request(f"{self.base_url}{endpoint}", self._auth(), body)
+            except (ConnectionError, http.client.HTTPException, TimeoutError):
+                if attempt == self.max_retries:
+                    limiter.settle(tokens, 0)
+                    raise
+                status, headers, response = None, {}, b''
+            if status == 200:
+                break
+            # A refused call used no tokens; the retry reserves them again
+            limiter.settle(tokens, 0)
+            if status is not None and (status not in RETRYABLE_STATUSES or attempt == self.max_retries):
+                raise OpenAIError(status, response.decode('utf-8', 'replace'))
+            retry_after = retry_after_seconds(headers)
+            backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            if status == 429:
+                metrics['throttled'] += 1
+            if retry_after is not None:
+                # The limit is account-wide: hold the other threads too, then
+                # stagger them so they do not all retry at the same instant
+                limiter.pause(retry_after)
+                backoff /= 4
+            if backoff > 0:
+                self.sleep(backoff)
+                metrics['waited'] += backoff
+        result = json.loads(response)
+        usage = result.get('usage') or {}
+        limiter.settle(tokens, usage.get('total_tokens'))
+        metrics.update(latency=self.clock() - started, promptTokens=usage.get('prompt_tokens', 0),
+                       completionTokens=usage.get('completion_tokens', 0),
+                       totalTokens=usage.get('total_tokens', 0))
+        with self._lock:
+            self.metrics.append(metrics)
+        return result, metrics
+
+    def chat(self, messages, model=CHAT_MODEL, max_tokens=1500, temperature=0.7, response_format=None):
+        """Complete ``messages``; returns ``content``, ``finishReason``, ``usage`` and ``metrics``"""
+        tokens = sum(estimate_tokens(message['content']) for message in messages) + max_tokens
+        payload = {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        if response_format:
+            payload['response_format'] = response_format
+        result, metrics = self._post('/chat/completions', payload, self.chat_limiter, tokens)
+        choice = result['choices'][0]
+        return {'content': choice['message']['content'], 'finishReason': choice.get('finish_reason'),
+                'usage': result.get('usage', {}), 'metrics': metrics}
+
+    def generate_image(self, prompt, model=IMAGE_MODEL, size=IMAGE_SIZE, quality='standard'):
+        """Generate one image; returns its PNG ``data``, ``revisedPrompt`` and ``metrics``"""
+        result, metrics = self._post('/images/generations', {
+            'model': model, 'prompt': prompt, 'size': size, 'quality': quality, 'n': 1,
+            'response_format': 'b64_json',
+        }, self.image_limiter)
+        image = result['data'][0]
+        return {'data': base64.b64decode(image['b64_json']), 'revisedPrompt': image.get('revised_prompt'),
+                'metrics': metrics}
+
+    def map(self, function, items):
+        """``[function(item) for item in items]``, ``concurrency`` calls at a time"""
+        items = list(items)
+        if len(items) <= 1 or self.concurrency <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as pool:
+            return list(pool.map(function, items))
+
+
+def summarize_metrics(metrics):
+    """Totals and latency percentiles for a list of per-call ``metrics``"""
+    latencies = sorted(m['latency'] for m in metrics)
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else 0.0
+
+    return {
+        'calls': len(metrics),
+        'attempts': sum(m['attempts'] for m in metrics),
+        'throttled': sum(m['throttled'] for m in metrics),
+        'waitedSeconds': round(sum(m['waited'] for m in metrics), 3),
+        'latencyP50': percentile(0.5),
+        'latencyP95': percentile(0.95),
+        'promptTokens': sum(m['promptTokens'] for m in metrics),
+        'completionTokens': sum(m['completionTokens'] for m in metrics),
+        'totalTokens': sum(m['totalTokens'] for m in metrics),
+    }
@@ -0,0 +1,126 @@
+"""
+Token-bucket rate limiting for per-minute API limits (requests and tokens)
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """``capacity`` units that refill continuously at ``capacity`` per ``period``.
+
+    A per-minute limit of N is a bucket of N refilling at N / 60 per
+    second: a burst of N goes through at once, after which calls are
+    spaced to the sustained rate.
+    """
+
+    def __init__(self, capacity, period=60.0, clock=time.monotonic):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.level = float(capacity)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount):
+        """Seconds until ``amount`` units are available (0 if they are now)"""
+        self._refill()
+        # A request larger than the bucket waits for a full one
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by concurrent callers.
+
+    ``acquire(tokens)`` blocks until both buckets can cover the call and
+    returns the seconds it waited. Token counts are estimates made
+    before the call; ``settle`` returns the difference once the real
+    usage is known. Either limit may be None; ``period`` is only
+    shortened by tests.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, period=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.requests = (TokenBucket(requests_per_minute, period, clock)
+                         if requests_per_minute else None)
+        self.tokens = TokenBucket(tokens_per_minute, period, clock) if tokens_per_minute else None
+        self.clock = clock
+        self.sleep = sleep
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self._paused_until - self.clock()
+                for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                    if bucket is not None and amount:
+                        delay = max(delay, bucket.delay(amount))
+                if delay <= 0:
+                    if self.requests is not None:
+                        self.requests.take(1)
+                    if self.tokens is not None and tokens:
+                        self.tokens.take(tokens)
+                    return waited
+            self.sleep(delay)
+            waited += delay
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket for a call that used ``actual`` tokens"""
+        if self.tokens is None or actual is None:
+            return
+        with self._lock:
+            if actual < estimated:
+                self.tokens.give_back(estimated - actual)
+            else:
+                self.tokens.take(actual - estimated)
+
+    def pause(self, seconds):
+        """Hold every caller for ``seconds``, as a 429's Retry-After asks"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+
+def retry_after_seconds(headers, now=None):
+    """Seconds a 429/503 response asks to wait, or None if it does not say.
+
+    Reads ``Retry-After`` (delta-seconds or an HTTP date) and OpenAI's
+    ``retry-after-ms``. ``headers`` must have lower-case names.
+    """
+    if headers.get('retry-after-ms'):
+        try:
+            return max(0.0, float(headers['retry-after-ms']) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc) if now is None else now
+    return max(0.0, (when - now).total_seconds())
@@ -0,0 +1,282 @@
+"""
+Concurrent multipart S3 uploads and ranged downloads that resume after a failure
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from videogen.aws_errors import NOT_FOUND_CODES, PRECONDITION_FAILED_CODES, error_code
+
+# S3 multipart parts must be at least 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+
+# S3 allows at most this many parts per upload
+MAX_PARTS = 10000
+
+NO_SUCH_UPLOAD_CODES = ('NoSuchUpload', '404')
+
+
+def part_ranges(size, part_size):
+    """``(part_number, offset, length)`` for each part of a ``size``-byte object"""
+    if size == 0:
+        return [(1, 0, 0)]
+    return [(number, offset, min(part_size, size - offset))
+            for number, offset in enumerate(range(0, size, part_size), start=1)]
+
+
+def fit_part_size(size, part_size=DEFAULT_PART_SIZE):
+    """Grow ``part_size`` until ``size`` fits in ``MAX_PARTS`` parts"""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while size > part_size * MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def _md5_etag(data):
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def _read_range(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _run_parts(pool_size, func, items):
+    """Run ``func`` over ``items`` on a thread pool; the first failure cancels the rest"""
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        futures = [pool.submit(func, item) for item in items]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in done:
+            future.result()
+
+
+class MultipartUploader:
+    """Upload a stream of bytes to S3 as a multipart upload of fixed-size parts.
+
+    Full parts are sent from a pool of ``concurrency`` threads while the
+    caller keeps writing; at most ``concurrency`` parts are buffered, so
+    memory stays bounded no matter how long the stream is.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=DEFAULT_PART_SIZE,
+                 content_type='video/mp4', concurrency=DEFAULT_CONCURRENCY):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )['UploadId']
+        self.parts = []
+        self.size = 0
+        self._buffer = bytearray()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+        self._slots = threading.Semaphore(concurrency)
+        self._futures = []
+
+    def _upload(self, number, data):
+        try:
+            response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=data)
+            return {'PartNumber': number, 'ETag': response['ETag']}
+        finally:
+            self._slots.release()
+
+    def _send(self, data):
+        self._slots.acquire()
+        number = len(self._futures) + 1
+        self._futures.append(self._pool.submit(self._upload, number, bytes(data)))
+        self.size += len(data)
+        # Surface a failed part now rather than after the whole stream is read
+        for future in self._futures:
+            if future.done() and future.exception():
+                raise future.exception()
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            self._send(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+
+    def complete(self):
+        if self._buffer or not self._futures:
+            self._send(self._buffer)
+            self._buffer.clear()
+        self.parts = [future.result() for future in self._futures]
+        self._pool.shutdown()
+        self.s3.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                          MultipartUpload={'Parts': self.parts})
+        return {'parts': len(self.parts), 'size': self.size}
+
+    def abort(self):
+        self._pool.shutdown(cancel_futures=True)
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def _uploaded_parts(s3_client, bucket, key, upload_id):
+    parts = {}
+    marker = 0
+    while True:
+        response = s3_client.list_parts(Bucket=bucket, Key=key, UploadId=upload_id,
+                                        PartNumberMarker=marker)
+        for part in response.get('Parts', []):
+            parts[part['PartNumber']] = part
+        if not response.get('IsTruncated'):
+            return parts
+        marker = response['NextPartNumberMarker']
+
+
+def _pending_upload(s3_client, bucket, key):
+    """The newest unfinished multipart upload of ``key``, if any"""
+    response = s3_client.list_multipart_uploads(Bucket=bucket, Prefix=key)
+    uploads = [upload for upload in response.get('Uploads', []) if upload['Key'] == key]
+    if not uploads:
+        return None
+    return max(uploads, key=lambda upload: upload['Initiated'])['UploadId']
+
+
+def upload_file(s3_client, path, bucket, key, part_size=DEFAULT_PART_SIZE,
+                concurrency=DEFAULT_CONCURRENCY, content_type='application/octet-stream',
+                resume=True):
+    """Upload a local file, sending parts concurrently.
+
+    Files up to one part go in a single PutObject. Larger files use a
+    multipart upload; if an earlier attempt for the same key left one
+    unfinished, its parts are listed and every part whose MD5 matches
+    the local bytes is kept, so a retried Lambda only sends what is
+    missing. A failed attempt leaves the upload open for the next one;
+    the buckets' lifecycle rule aborts uploads nobody comes back for.
+    """
+    size = os.path.getsize(path)
+    if size <= part_size:
+        with open(path, 'rb') as f:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=f.read(), ContentType=content_type)
+        return {'key': key, 'size': size, 'parts': 1, 'resumed': 0}
+
+    part_size = fit_part_size(size, part_size)
+    upload_id = _pending_upload(s3_client, bucket, key) if resume else None
+    existing = {}
+    if upload_id:
+        try:
+            existing = _uploaded_parts(s3_client, bucket, key, upload_id)
+        except Exception as e:
+            if error_code(e) not in NO_SUCH_UPLOAD_CODES:
+                raise
+            upload_id = None
+    if not upload_id:
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )['UploadId']
+
+    completed = {}
+    lock = threading.Lock()
+
+    def send(part):
+        number, offset, length = part
+        data = _read_range(path, offset, length)
+        previous = existing.get(number)
+        # Parts of an earlier attempt are only reused if they hold the same bytes
+        if previous and previous['Size'] == length and previous['ETag'] == _md5_etag(data):
+            etag = previous['ETag']
+        else:
+            etag = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                         PartNumber=number, Body=data)['ETag']
+        with lock:
+            completed[number] = etag
+
+    parts = part_ranges(size, part_size)
+    _run_parts(concurrency, send, parts)
+    s3_client.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=upload_id,
+        MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': completed[n]} for n, _, _ in parts]},
+    )
+    resumed = sum(1 for n, _, _ in parts if existing.get(n, {}).get('ETag') == completed[n])
+    return {'key': key, 'size': size, 'parts': len(parts), 'resumed': resumed}
+
+
+def _load_progress(state_path, etag, size, part_size):
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if (state.get('etag'), state.get('size'), state.get('part_size')) != (etag, size, part_size):
+        return set()
+    return set(state.get('done', []))
+
+
+def download_file(s3_client, bucket, key, path, part_size=DEFAULT_PART_SIZE,
+                  concurrency=DEFAULT_CONCURRENCY, resume=True):
+    """Download an object with concurrent ranged GETs.
+
+    Ranges are written in place into ``{path}.part``; the finished part
+    numbers are recorded in ``{path}.part.json`` so a retry only fetches
+    what is missing. Every GET is conditional on the ETag seen at the
+    start, so an object replaced mid-download is never stitched
+    together from two versions. The file is renamed to ``path`` once
+    complete.
+    """
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    size, etag = head['ContentLength'], head.get('ETag')
+    temp_path = f"{path}.part"
+    state_path = f"{temp_path}.json"
+
+    done = _load_progress(state_path, etag, size, part_size) if resume else set()
+    if not done or not os.path.exists(temp_path) or os.path.getsize(temp_path) != size:
+        done = set()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.truncate(size)
+
+    lock = threading.Lock()
+
+    def save_progress():
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'size': size, 'part_size': part_size, 'done': sorted(done)}, f)
+
+    def fetch(part):
+        number, offset, length = part
+        if length == 0:
+            return
+        kwargs = {'IfMatch': etag} if etag else {}
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=key,
+                                        Range=f"bytes={offset}-{offset + length - 1}", **kwargs)['Body']
+        except Exception as e:
+            if error_code(e) in PRECONDITION_FAILED_CODES + NOT_FOUND_CODES:
+                # The object changed or vanished; progress for the old version is useless
+                with lock:
+                    done.clear()
+                    save_progress()
+            raise
+        with open(temp_path, 'r+b') as f:
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                chunk = body.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise IOError(f"s3://{bucket}/{key}: range at {offset} ended early")
+                f.write(chunk)
+                remaining -= len(chunk)
+        with lock:
+            done.add(number)
+            save_progress()
+
+    parts = part_ranges(size, part_size)
+    resumed = len(done)
+    _run_parts(concurrency, fetch, [part for part in parts if part[0] not in done])
+    os.replace(temp_path, path)
+    try:
+        os.remove(state_path)
+    except FileNotFoundError:
+        pass
+    return {'path': path, 'size': size, 'parts': len(parts), 'resumed': resumed}
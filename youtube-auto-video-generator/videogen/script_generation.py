@@ -0,0 +1,208 @@
+"""
+Script generation prompts, per row or with several rows packed into one chat request
+"""
+import json
+import re
+
+from videogen.openai_client import CHAT_MODEL, OpenAIError
+
+SCRIPT_SYSTEM_PROMPT = (
+    'あなたは教育系 YouTube チャンネルの台本作家です。'
+    '与えられたタイトルとテーマで、ナレーション用の台本を日本語で書いてください。\n'
+    '- 冒頭の挨拶で動画のテーマを一言で伝え、最後に要点を 3 つにまとめて締めくくってください。\n'
+    '- 対象の視聴者が前提知識なしで理解できる言葉を選び、専門用語には短い説明を添えてください。\n'
+    '- 読み上げ用なので、見出し・箇条書き・記号・URL・絵文字は使わず、話し言葉の文章だけにしてください。\n'
+    '- 1 文は 60 文字以内を目安にし、文末は「。」「！」「？」のいずれかで終えてください。\n'
+    '- 指定された長さ（分）に合わせ、1 分あたり 300 文字程度の分量にしてください。'
+)
+
+BATCH_INSTRUCTIONS = (
+    '次の JSON 配列の各行について台本と 100 文字程度の動画説明文を作成し、JSON オブジェクトだけを返してください。'
+    'キーは各行の rowIndex（文字列）、値は {"script": 台本, "description": 説明文} です。'
+    '行を省略したり、配列にない行を追加したりしないでください。'
+)
+
+# Completion tokens for a row without a readable duration
+DEFAULT_MAX_TOKENS = 1500
+# gpt-3.5-turbo stops at 4096 completion tokens however many rows a batch holds
+MAX_COMPLETION_TOKENS = 4096
+# The system prompt asks for about this many characters per minute, and a
+# Japanese character is about one token (see estimate_tokens)
+CHARS_PER_MINUTE = 300
+# Per row, room for the description, JSON quoting and a script that runs long
+ROW_OVERHEAD_TOKENS = 400
+
+DURATION_MINUTES = re.compile(r'\d+(?:\.\d+)?')
+
+ROW_FIELDS = ('rowIndex', 'title', 'theme', 'target_audience', 'duration', 'keywords')
+
+
+def duration_minutes(video):
+    """Minutes in the row's ``duration`` column ("3分", "3"), or None"""
+    match = DURATION_MINUTES.search(str(video.get('duration', '')))
+    return float(match.group()) if match else None
+
+
+def completion_tokens(video):
+    """Completion tokens to allow for one row's script and description"""
+    minutes = duration_minutes(video)
+    if minutes is None:
+        return DEFAULT_MAX_TOKENS
+    return int(minutes * CHARS_PER_MINUTE) + ROW_OVERHEAD_TOKENS
+
+
+def default_description(video):
+    return f"{video['title']}の動画です。"
+
+
+def row_messages(video, theme):
+    """Chat messages asking for one row's script"""
+    return [
+        {'role': 'system', 'content': SCRIPT_SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"{video['title']}\nテーマ: {theme}\n"
+                                    f"対象: {video.get('target_audience', '')}\n"
+                                    f"長さ: {video.get('duration', '')}\n"
+                                    f"キーワード: {video.get('keywords', '')}"},
+    ]
+
+
+def batch_messages(rows):
+    """Chat messages asking for the scripts of ``rows`` (``(video, theme)`` pairs) at once"""
+    fields = [{name: (theme if name == 'theme' else video.get(name, '')) for name in ROW_FIELDS}
+              for video, theme in rows]
+    return [
+        {'role': 'system', 'content': SCRIPT_SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"{BATCH_INSTRUCTIONS}\n{json.dumps(fields, ensure_ascii=False)}"},
+    ]
+
+
+def parse_batch(content, row_indexes):
+    """Validate a batch answer; returns ``(scripts, failed)``.
+
+    ``scripts`` maps each row index with a non-empty ``script`` string to
+    ``{'script', 'description'}``; ``failed`` lists the row indexes that
+    are missing or malformed, all of them if ``content`` is not a JSON
+    object (e.g. cut off at the token limit). A Markdown code fence
+    around the JSON is tolerated.
+    """
+    text = content.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    try:
+        answer = json.loads(text)
+    except ValueError:
+        answer = None
+    if not isinstance(answer, dict):
+        return {}, list(row_indexes)
+    scripts = {}
+    failed = []
+    for row_index in row_indexes:
+        entry = answer.get(str(row_index))
+        script = entry.get('script') if isinstance(entry, dict) else None
+        if not isinstance(script, str) or not script.strip():
+            failed.append(row_index)
+            continue
+        description = entry.get('description')
+        scripts[row_index] = {'script': script.strip(),
+                              'description': description.strip() if isinstance(description, str) else None}
+    return scripts, failed
+
+
+class ScriptGenerator:
+    """Generate scripts for many rows through an ``OpenAIClient``.
+
+    With ``batch_size`` 1 every row is its own chat request, the system
+    prompt included. With a larger ``batch_size`` rows are packed into
+    requests of up to that many rows that answer with JSON keyed by
+    ``rowIndex``, so the system prompt and instructions are sent once
+    per batch. Each row is given ``completion_tokens`` for its duration
+    (or ``max_tokens`` when set), and a batch only takes as many rows
+    as fit in ``MAX_COMPLETION_TOKENS``; a row that fits with no other
+    is sent on its own. Rows a batch answer leaves out or garbles, or
+    every row of a batch that fails outright or is cut off, are retried
+    as single-row requests. Batches and fallbacks run concurrently
+    through ``client.map``.
+    """
+
+    def __init__(self, client, batch_size=1, model=CHAT_MODEL, max_tokens=None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.client = client
+        self.batch_size = batch_size
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def _tokens(self, video):
+        return self.max_tokens or completion_tokens(video)
+
+    def _chunks(self, rows):
+        """Consecutive rows grouped so each group's completion budget fits one request"""
+        chunks = []
+        budget = 0
+        for row in rows:
+            tokens = self._tokens(row[0])
+            if chunks and len(chunks[-1]) < self.batch_size and budget + tokens <= MAX_COMPLETION_TOKENS:
+                chunks[-1].append(row)
+                budget += tokens
+            else:
+                chunks.append([row])
+                budget = tokens
+        return chunks
+
+    def _one(self, row):
+        video, theme = row
+        result = self.client.chat(row_messages(video, theme), model=self.model,
+                                  max_tokens=min(MAX_COMPLETION_TOKENS, self._tokens(video)))
+        return {'script': result['content'].strip(), 'description': default_description(video)}, result['metrics']
+
+    def _batch(self, rows):
+        """``(scripts, failed, metrics, truncated)`` for one batched request"""
+        row_indexes = [video['rowIndex'] for video, _ in rows]
+        try:
+            result = self.client.chat(batch_messages(rows), model=self.model,
+                                      max_tokens=sum(self._tokens(video) for video, _ in rows),
+                                      response_format={'type': 'json_object'})
+        except OpenAIError as e:
+            if e.status == 429:
+                raise
+            return {}, row_indexes, None, False
+        scripts, failed = parse_batch(result['content'], row_indexes)
+        return scripts, failed, result['metrics'], result['finishReason'] == 'length'
+
+    def generate(self, rows):
+        """Scripts for ``rows``, a list of ``(video, theme)`` pairs.
+
+        Returns ``scripts`` (row index to ``{'script', 'description'}``),
+        per-call ``metrics``, ``requests``, ``batches``, ``truncated``
+        (batches cut off at their token limit) and ``fallbacks`` (rows
+        that needed a single-row retry).
+        """
+        rows = list(rows)
+        scripts = {}
+        metrics = []
+        chunks = self._chunks(rows) if self.batch_size > 1 else [[row] for row in rows]
+        batch_chunks = [chunk for chunk in chunks if len(chunk) > 1]
+        truncated = 0
+        failed = set()
+        for batch_scripts, batch_failed, batch_metrics, cut_off in self.client.map(self._batch, batch_chunks):
+            scripts.update(batch_scripts)
+            failed.update(batch_failed)
+            truncated += cut_off
+            if batch_metrics is not None:
+                metrics.append(batch_metrics)
+        singles = [chunk[0] for chunk in chunks if len(chunk) == 1]
+        pending = singles + [row for row in rows if row[0]['rowIndex'] in failed]
+        for (video, _), (script, call_metrics) in zip(pending, self.client.map(self._one, pending)):
+            scripts[video['rowIndex']] = script
+            metrics.append(call_metrics)
+        for video, _ in rows:
+            if scripts[video['rowIndex']]['description'] is None:
+                scripts[video['rowIndex']]['description'] = default_description(video)
+        return {
+            'scripts': scripts,
+            'metrics': metrics,
+            'requests': len(metrics),
+            'batches': len(batch_chunks),
+            'truncated': truncated,
+            'fallbacks': len(pending) - len(singles),
+        }
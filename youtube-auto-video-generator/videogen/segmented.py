@@ -0,0 +1,172 @@
+"""
+Parallel segmented encoding for long videos, joined with the concat demuxer
+"""
+import math
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+from videogen.compose import FFMPEG_PATH
+from videogen.encoding import DEFAULT_PROFILE, audio_args, get_profile, video_args
+from videogen.slideshow import (
+    CROSSFADE_SECONDS,
+    crossfade_graph,
+    fit_crossfade,
+    prerender_stills,
+    slide_timings,
+    still_inputs,
+)
+
+AAC_SAMPLE_RATE = 48000
+AAC_FRAME_SAMPLES = 1024
+
+# Below this a segment costs more in FFmpeg start-up than it saves
+MIN_SEGMENT_SECONDS = 30
+
+
+def boundary_quantum(fps, sample_rate=AAC_SAMPLE_RATE):
+    """Shortest interval that is a whole number of video frames and AAC frames"""
+    video = Fraction(1, fps)
+    audio = Fraction(AAC_FRAME_SAMPLES, sample_rate)
+    return Fraction(math.lcm(video.numerator, audio.numerator),
+                    math.gcd(video.denominator, audio.denominator))
+
+
+def plan_segments(duration_seconds, segments, fps, sample_rate=AAC_SAMPLE_RATE):
+    """Split the timeline into ``segments`` pieces on aligned boundaries.
+
+    Every boundary falls on a whole video frame and a whole AAC frame, so
+    the segments hold an exact number of frames and their concatenation
+    is exactly as long as a single encode. Returns dicts with ``start``,
+    ``duration`` (seconds) and ``frames``.
+    """
+    total_frames = round(Fraction(duration_seconds).limit_denominator(1000) * fps)
+    quantum = boundary_quantum(fps, sample_rate)
+    starts = []
+    for i in range(segments):
+        start = round(Fraction(duration_seconds) * i / segments / quantum) * quantum
+        if not starts or start > starts[-1]:
+            starts.append(start)
+    frame_bounds = [int(start * fps) for start in starts] + [total_frames]
+    return [
+        {
+            'index': i,
+            'start': float(Fraction(frame_bounds[i], fps)),
+            'duration': float(Fraction(frame_bounds[i + 1] - frame_bounds[i], fps)),
+            'frames': frame_bounds[i + 1] - frame_bounds[i],
+        }
+        for i in range(len(starts))
+        if frame_bounds[i + 1] > frame_bounds[i]
+    ]
+
+
+def default_segment_count(duration_seconds, workers=None):
+    """One segment per core, but none shorter than ``MIN_SEGMENT_SECONDS``"""
+    workers = workers or os.cpu_count() or 1
+    return max(1, min(workers, int(duration_seconds // MIN_SEGMENT_SECONDS)))
+
+
+def segment_slides(timings, segment, fps, crossfade):
+    """The slides visible in ``segment``, retimed to a local origin.
+
+    The origin is the segment start, or the frame at or before the start
+    of a crossfade already running at the segment start. Offsets stay on
+    the same frame grid as the whole timeline, so transitions match a
+    single-pass encode. Returns ``(first, local, skip_frames)``: the index
+    of the first slide used, the slide timings relative to the origin, and
+    the frames between the origin and the segment start.
+    """
+    start = segment['start']
+    end = start + segment['duration']
+    current = max(i for i, timing in enumerate(timings) if timing['start'] <= start + 1e-9)
+    first, origin = current, start
+    if current > 0 and start < timings[current]['start'] + crossfade:
+        first, origin = current - 1, math.floor(timings[current]['start'] * fps + 1e-9) / fps
+    last = max(i for i, timing in enumerate(timings) if timing['start'] < end)
+    timeline_end = timings[-1]['start'] + timings[-1]['duration']
+    local = []
+    for i in range(first, last + 1):
+        local_start = max(0.0, timings[i]['start'] - origin)
+        next_start = timings[i + 1]['start'] if i + 1 < len(timings) else timeline_end
+        local.append({'index': i, 'start': round(local_start, 3),
+                      'duration': round(next_start - origin - local_start, 3)})
+    return first, local, round((start - origin) * fps)
+
+
+def segment_command(still_paths, timings, segment, output_path, profile, crossfade,
+                    ffmpeg_path=FFMPEG_PATH, threads=None):
+    """Encode one segment of the slideshow timeline, video only.
+
+    Only the slides visible in the segment are read, with crossfade
+    offsets relative to the segment (see ``segment_slides``), so the cost
+    of a segment does not grow with how late in the timeline it starts.
+    """
+    first, local, skip = segment_slides(timings, segment, profile['fps'], crossfade)
+    graph = crossfade_graph(local, crossfade, '[full]')
+    graph += (f";[full]trim=start_frame={skip}:end_frame={skip + segment['frames']},"
+              f"setpts=PTS-STARTPTS[v]")
+    command = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+        *still_inputs(still_paths[first:first + len(local)], local, profile['fps'], crossfade),
+        '-filter_complex', graph, '-map', '[v]',
+        *video_args(profile),
+        '-an', '-frames:v', str(segment['frames']),
+    ]
+    if threads:
+        command += ['-threads', str(threads)]
+    return command + [output_path]
+
+
+def concat_command(list_path, audio_path, output_path, duration_seconds, profile,
+                   ffmpeg_path=FFMPEG_PATH):
+    """Join the segments without re-encoding video and add the audio track.
+
+    Audio is encoded once over the whole timeline, which is cheap next to
+    video and avoids AAC priming samples at every segment boundary.
+    """
+    return [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'concat', '-safe', '0', '-i', list_path,
+        '-i', audio_path,
+        '-map', '0:v', '-map', '1:a',
+        '-c:v', 'copy', *audio_args(profile), '-ar', str(AAC_SAMPLE_RATE),
+        '-t', f"{duration_seconds:.3f}", '-movflags', '+faststart', output_path,
+    ]
+
+
+def encode_segmented(image_paths, audio_path, output_path, duration_seconds, segments=None,
+                     speech_marks=None, profile=None, crossfade=CROSSFADE_SECONDS,
+                     ffmpeg_path=FFMPEG_PATH, max_workers=None):
+    """Render the slideshow as parallel segments and join them into one MP4"""
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    max_workers = max_workers or os.cpu_count() or 1
+    segments = segments or default_segment_count(duration_seconds, max_workers)
+    timings = slide_timings(len(image_paths), duration_seconds, speech_marks)
+    crossfade = fit_crossfade(timings, crossfade)
+    plan = plan_segments(duration_seconds, segments, profile['fps'])
+    # Share the cores between concurrent encoders instead of oversubscribing them
+    threads = max(1, (os.cpu_count() or 1) // min(len(plan), max_workers))
+
+    with tempfile.TemporaryDirectory(prefix='segments-') as workdir:
+        stills = prerender_stills(image_paths, workdir, ffmpeg_path)
+        paths = [os.path.join(workdir, f"segment_{s['index']:03d}.mp4") for s in plan]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Each worker just waits on its own FFmpeg process
+            futures = [
+                pool.submit(subprocess.run, segment_command(stills, timings, segment, path, profile,
+                                                            crossfade, ffmpeg_path, threads),
+                            check=True)
+                for segment, path in zip(plan, paths)
+            ]
+            for future in futures:
+                future.result()
+
+        list_path = os.path.join(workdir, 'segments.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"file '{path}'\n" for path in paths)
+        subprocess.run(concat_command(list_path, audio_path, output_path, duration_seconds, profile,
+                                      ffmpeg_path), check=True)
+
+    return {'segments': plan, 'slides': timings, 'profile': profile['name']}
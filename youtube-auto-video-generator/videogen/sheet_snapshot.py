@@ -0,0 +1,222 @@
+"""
+Incremental spreadsheet reads: row content hashes and atomic row claims
+"""
+import hashlib
+import json
+import time
+from datetime import datetime
+
+from videogen.aws_errors import NOT_FOUND_CODES, PRECONDITION_FAILED_CODES, error_code
+
+# Columns a video is generated from; script, description, status and
+# processed_at are outputs and do not make a row dirty
+INPUT_COLUMNS = ('title', 'theme', 'target_audience', 'duration', 'keywords')
+
+DEFAULT_PREFIX = 'sheet-state/'
+
+# A claim older than this is assumed to belong to a run that died
+DEFAULT_LEASE_SECONDS = 2 * 60 * 60
+
+
+def row_hash(row):
+    """Hash of the input columns of a spreadsheet row"""
+    inputs = {column: str(row.get(column, '')).strip() for column in INPUT_COLUMNS}
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class SnapshotConflict(Exception):
+    """The snapshot kept changing underneath an update; too many concurrent writers"""
+
+
+class IncrementalSheetReader:
+    """Select the rows of a sheet that need work and claim them.
+
+    A snapshot of per-row input hashes is kept in S3 at
+    ``{prefix}{spreadsheetId}/{sheetName}/snapshot.json``. A row is selected
+    when its status is ``pending``, when its inputs changed since the last
+    snapshot, or when it is stuck in ``processing`` with no live claim
+    (expired, or lost with the run that held it).
+    Each selected row is then claimed by creating
+    ``.../claims/{rowIndex}.json`` with a conditional put, so when two runs
+    overlap every row goes to exactly one of them. A selected row keeps its
+    previous snapshot hash until ``complete`` records the hash it was
+    claimed with, so an edit is not lost with a run that dies before
+    marking the row; its claim then expires and the row is selected again.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=DEFAULT_PREFIX,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, clock=time.time, max_conflicts=10):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.max_conflicts = max_conflicts
+
+    def _base(self, spreadsheet_id, sheet_name):
+        return f"{self.prefix}{spreadsheet_id}/{sheet_name}/"
+
+    def _fetch_snapshot(self, spreadsheet_id, sheet_name):
+        """``(rows, etag)``; a missing snapshot is empty with no ETag"""
+        try:
+            response = self.s3.get_object(
+                Bucket=self.bucket, Key=self._base(spreadsheet_id, sheet_name) + 'snapshot.json'
+            )
+        except Exception as e:
+            if error_code(e) not in NOT_FOUND_CODES:
+                raise
+            return {}, None
+        return json.loads(response['Body'].read())['rows'], response.get('ETag')
+
+    def load_snapshot(self, spreadsheet_id, sheet_name):
+        """Map of row index (as a string) to the input hash last completed"""
+        return self._fetch_snapshot(spreadsheet_id, sheet_name)[0]
+
+    def _update_snapshot(self, spreadsheet_id, sheet_name, change):
+        """Apply ``change(rows)`` with optimistic concurrency; it returns whether anything changed"""
+        key = self._base(spreadsheet_id, sheet_name) + 'snapshot.json'
+        for _ in range(self.max_conflicts):
+            rows, etag = self._fetch_snapshot(spreadsheet_id, sheet_name)
+            if not change(rows):
+                return rows
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                self.s3.put_object(Bucket=self.bucket, Key=key, Body=json.dumps({'rows': rows}).encode('utf-8'),
+                                   ContentType='application/json', **condition)
+                return rows
+            except Exception as e:
+                if error_code(e) not in PRECONDITION_FAILED_CODES:
+                    raise
+        raise SnapshotConflict(f"s3://{self.bucket}/{key} changed {self.max_conflicts} times in a row")
+
+    def _claims(self, spreadsheet_id, sheet_name):
+        """Existing claims keyed by row index, from a single listing"""
+        prefix = self._base(spreadsheet_id, sheet_name) + 'claims/'
+        claims = {}
+        kwargs = {'Bucket': self.bucket, 'Prefix': prefix}
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            for item in response.get('Contents', []):
+                row_index = item['Key'][len(prefix):-len('.json')]
+                claims[row_index] = item
+            if not response.get('IsTruncated'):
+                return claims
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def _stale(self, claim):
+        modified = claim['LastModified']
+        if isinstance(modified, datetime):
+            modified = modified.timestamp()
+        return self.clock() - modified > self.lease_seconds
+
+    def _delete(self, keys):
+        if keys:
+            self.s3.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': key} for key in keys], 'Quiet': True,
+            })
+
+    def try_claim(self, spreadsheet_id, sheet_name, row, run_id, existing=None):
+        """Atomically claim a row for ``run_id``; False if another run holds it.
+
+        A new claim is created with ``IfNoneMatch='*'``. An existing claim
+        is only replaced once it has expired, with ``IfMatch`` on its ETag,
+        so only one run can win.
+        """
+        key = f"{self._base(spreadsheet_id, sheet_name)}claims/{row['rowIndex']}.json"
+        body = json.dumps({'runId': run_id, 'hash': row_hash(row), 'claimedAt': self.clock()})
+        condition = {'IfNoneMatch': '*'}
+        if existing is not None:
+            if not self._stale(existing):
+                return False
+            condition = {'IfMatch': existing['ETag']}
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=body.encode('utf-8'),
+                               ContentType='application/json', **condition)
+            return True
+        except Exception as e:
+            if error_code(e) in PRECONDITION_FAILED_CODES:
+                return False
+            raise
+
+    def select(self, spreadsheet_id, sheet_name, rows, run_id):
+        """Rows this run should process, each already claimed.
+
+        Returns ``(selected, stats)`` where stats counts rows by reason.
+        """
+        snapshot = self.load_snapshot(spreadsheet_id, sheet_name)
+        claims = self._claims(spreadsheet_id, sheet_name)
+        selected = []
+        stats = {'pending': 0, 'changed': 0, 'stale': 0, 'claimed_elsewhere': 0, 'unchanged': 0}
+        done = {}
+        finished_claims = []
+
+        for row in rows:
+            row_index = str(row['rowIndex'])
+            status = row.get('status', 'pending') or 'pending'
+            claim = claims.get(row_index)
+            current = row_hash(row)
+            changed = row_index in snapshot and snapshot[row_index] != current
+
+            if status == 'pending':
+                reason = 'pending'
+            elif status == 'processing':
+                reason = 'stale' if claim is None or self._stale(claim) else None
+            else:
+                reason = 'changed' if changed else None
+
+            if reason is None:
+                stats['unchanged'] += 1
+                if status != 'processing':
+                    # Done with these inputs; a claim left on it belongs to a
+                    # run that marked the row but did not get to complete it
+                    done[row_index] = current
+                    if claim is not None:
+                        finished_claims.append(claim['Key'])
+            elif self.try_claim(spreadsheet_id, sheet_name, row, run_id, claim):
+                stats[reason] += 1
+                selected.append(row)
+            else:
+                stats['claimed_elsewhere'] += 1
+
+        present = {str(row['rowIndex']) for row in rows}
+
+        def record(snapshot_rows):
+            removed = [row_index for row_index in snapshot_rows if row_index not in present]
+            for row_index in removed:
+                del snapshot_rows[row_index]
+            added = {row_index: value for row_index, value in done.items() if snapshot_rows.get(row_index) != value}
+            snapshot_rows.update(added)
+            return bool(removed or added)
+
+        self._delete(finished_claims)
+        self._update_snapshot(spreadsheet_id, sheet_name, record)
+        return selected, stats
+
+    def complete(self, spreadsheet_id, sheet_name, row_indexes):
+        """Record that the sheet now shows ``row_indexes`` as done.
+
+        Each row's snapshot hash advances to the hash in its claim, the
+        inputs that were actually processed, and the claim is cleared.
+        Rows without a claim are left alone.
+        """
+        base = self._base(spreadsheet_id, sheet_name)
+        hashes = {}
+        for row_index in row_indexes:
+            try:
+                response = self.s3.get_object(Bucket=self.bucket, Key=f"{base}claims/{row_index}.json")
+            except Exception as e:
+                if error_code(e) not in NOT_FOUND_CODES:
+                    raise
+                continue
+            hashes[str(row_index)] = json.loads(response['Body'].read())['hash']
+        if not hashes:
+            return {}
+
+        def record(snapshot_rows):
+            snapshot_rows.update(hashes)
+            return True
+
+        self._update_snapshot(spreadsheet_id, sheet_name, record)
+        self._delete([f"{base}claims/{row_index}.json" for row_index in hashes])
+        return hashes
@@ -0,0 +1,135 @@
+"""
+Batched Google Sheets write-back and read-back
+"""
+import json
+import random
+import time
+
+# Output columns in the TECHNICAL_GUIDE sheet layout
+COLUMN_BY_FIELD = {
+    'status': 'F',
+    'script': 'G',
+    'description': 'H',
+    'processed_at': 'I',
+}
+
+# Keep each request well inside the Sheets API payload limit
+MAX_RANGES_PER_REQUEST = 500
+MAX_BYTES_PER_REQUEST = 2 * 1024 * 1024
+
+RATE_LIMIT_STATUSES = (429,)
+
+
+def _column_number(letter):
+    return ord(letter) - ord('A')
+
+
+def _column_letter(number):
+    return chr(ord('A') + number)
+
+
+def _status(error):
+    """HTTP status of a googleapiclient HttpError, or None"""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def execute_with_backoff(request, max_retries=5, base_delay=1.0, max_delay=32.0, sleep=time.sleep):
+    """Execute a Sheets API request, retrying 429s with exponential backoff"""
+    for attempt in range(max_retries + 1):
+        try:
+            return request.execute()
+        except Exception as e:
+            if _status(e) not in RATE_LIMIT_STATUSES or attempt == max_retries:
+                raise
+            # Full jitter keeps concurrent writers from retrying in lockstep
+            sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+class SheetWriteBatch:
+    """Collect cell updates for a run and send them in few batchUpdate calls.
+
+    Updates to adjacent columns of a row are merged into one range, so a
+    row whose status, script, description and processed_at all change
+    becomes a single ``F{row}:I{row}`` range. ``flush`` splits the ranges
+    into requests bounded by ``max_ranges`` and ``max_bytes``.
+    """
+
+    def __init__(self, service, spreadsheet_id, sheet_name='Sheet1',
+                 max_ranges=MAX_RANGES_PER_REQUEST, max_bytes=MAX_BYTES_PER_REQUEST,
+                 max_retries=5, sleep=time.sleep):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.max_ranges = max_ranges
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.stats = {'requests': 0, 'ranges': 0, 'cells': 0}
+        self._cells = {}
+
+    def __len__(self):
+        return len(self._cells)
+
+    def update_row(self, row_index, **fields):
+        """Queue new values for the named output columns of a row"""
+        for field, value in fields.items():
+            if field not in COLUMN_BY_FIELD:
+                raise ValueError(f"Unknown spreadsheet field: {field}")
+            self._cells[(row_index, _column_number(COLUMN_BY_FIELD[field]))] = value
+
+    def value_ranges(self):
+        """Queued updates as batchUpdate ValueRanges, one per run of adjacent cells"""
+        ranges = []
+        for (row_index, column), value in sorted(self._cells.items()):
+            last = ranges[-1] if ranges else None
+            if last and last['row'] == row_index and last['end'] == column - 1:
+                last['end'] = column
+                last['values'].append(value)
+            else:
+                ranges.append({'row': row_index, 'start': column, 'end': column, 'values': [value]})
+        return [
+            {
+                'range': f"{self.sheet_name}!{_column_letter(r['start'])}{r['row']}:"
+                         f"{_column_letter(r['end'])}{r['row']}",
+                'values': [r['values']],
+            }
+            for r in ranges
+        ]
+
+    def _chunks(self, value_ranges):
+        chunk, size = [], 0
+        for value_range in value_ranges:
+            range_size = len(json.dumps(value_range, ensure_ascii=False).encode('utf-8'))
+            if chunk and (len(chunk) >= self.max_ranges or size + range_size > self.max_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(value_range)
+            size += range_size
+        if chunk:
+            yield chunk
+
+    def flush(self):
+        """Send every queued update; returns the number of cells written"""
+        values = self.service.spreadsheets().values()
+        written = 0
+        for chunk in self._chunks(self.value_ranges()):
+            request = values.batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': chunk},
+            )
+            response = execute_with_backoff(request, self.max_retries, sleep=self.sleep)
+            written += response.get('totalUpdatedCells', 0)
+            self.stats['requests'] += 1
+            self.stats['ranges'] += len(chunk)
+        self.stats['cells'] += written
+        self._cells.clear()
+        return written
+
+
+def batch_get(service, spreadsheet_id, ranges, max_retries=5, sleep=time.sleep):
+    """Read several ranges in one values.batchGet call; returns a list of row lists"""
+    request = service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id, ranges=ranges)
+    response = execute_with_backoff(request, max_retries, sleep=sleep)
+    return [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
@@ -0,0 +1,128 @@
+"""
+Timed multi-image slideshow composition with crossfades
+"""
+import json
+import os
+import subprocess
+import tempfile
+
+from videogen.compose import FFMPEG_PATH, HEIGHT, WIDTH, video_filter
+from videogen.encoding import DEFAULT_PROFILE, encode_args, get_profile
+
+CROSSFADE_SECONDS = 1.0
+
+
+def parse_speech_marks(text):
+    """Parse Polly speech marks (one JSON object per line) into a list"""
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def slide_timings(image_count, duration_seconds, speech_marks=None):
+    """Start and length (seconds) of each slide over the audio timeline.
+
+    With Polly ``sentence`` speech marks, slides change on the sentence
+    boundary closest to an even split, so an image never switches
+    mid-sentence. Otherwise the duration is split evenly.
+    """
+    if image_count < 1:
+        raise ValueError("A slideshow needs at least one image")
+    even = [duration_seconds * i / image_count for i in range(image_count)]
+    starts = even
+    sentence_starts = sorted(
+        mark['time'] / 1000 for mark in speech_marks or [] if mark.get('type') == 'sentence'
+    )
+    if len(sentence_starts) >= image_count:
+        snapped = [0.0]
+        for target in even[1:]:
+            later = [t for t in sentence_starts if t > snapped[-1]]
+            snapped.append(min(later, key=lambda t: abs(t - target)) if later else target)
+        if all(a < b for a, b in zip(snapped, snapped[1:] + [duration_seconds])):
+            starts = snapped
+    bounds = starts + [duration_seconds]
+    return [
+        {'index': i, 'start': round(bounds[i], 3), 'duration': round(bounds[i + 1] - bounds[i], 3)}
+        for i in range(image_count)
+    ]
+
+
+def prerender_command(image_path, still_path, ffmpeg_path=FFMPEG_PATH, width=WIDTH, height=HEIGHT):
+    """Scale and pad an image to the output frame once, instead of per frame"""
+    return [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y', '-i', image_path,
+            '-vf', video_filter(width, height), '-frames:v', '1', still_path]
+
+
+def still_inputs(still_paths, timings, fps, crossfade=CROSSFADE_SECONDS):
+    """Input arguments looping each still for its slot plus the crossfade overlap"""
+    args = []
+    last = len(still_paths) - 1
+    for i, (path, timing) in enumerate(zip(still_paths, timings)):
+        length = timing['duration'] + (crossfade if i < last else 0)
+        args += ['-loop', '1', '-framerate', str(fps), '-t', f"{length:.3f}", '-i', path]
+    return args
+
+
+def crossfade_graph(timings, crossfade=CROSSFADE_SECONDS, output='[v]'):
+    """Filter graph chaining ``xfade`` over the still inputs into ``output``"""
+    last = len(timings) - 1
+    if last == 0:
+        return f'[0:v]format=yuv420p{output}'
+    steps = []
+    previous = '[0:v]'
+    for i in range(1, last + 1):
+        label = output if i == last else f'[x{i}]'
+        steps.append(f"{previous}[{i}:v]xfade=transition=fade:duration={crossfade}:"
+                     f"offset={timings[i]['start']:.3f}{label}")
+        previous = label
+    return ';'.join(steps)
+
+
+def build_slideshow_command(still_paths, timings, audio_path, output_path, ffmpeg_path=FFMPEG_PATH,
+                            profile=None, crossfade=CROSSFADE_SECONDS):
+    """FFmpeg arguments that crossfade the stills over the audio track.
+
+    Each still is looped for its slot plus the crossfade overlap, and each
+    ``xfade`` starts at the next slide's start time, so the video is
+    exactly as long as the slot durations add up to. Stills are read at
+    the profile's low frame rate, so only a few frames a second are encoded.
+    """
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    return [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+        *still_inputs(still_paths, timings, profile['fps'], crossfade),
+        '-i', audio_path,
+        '-filter_complex', crossfade_graph(timings, crossfade),
+        '-map', '[v]', '-map', f'{len(still_paths)}:a',
+        *encode_args(profile),
+        '-shortest', '-movflags', '+faststart', output_path,
+    ]
+
+
+def prerender_stills(image_paths, workdir, ffmpeg_path=FFMPEG_PATH):
+    """Scale every image to the output frame once; returns the still paths"""
+    stills = []
+    for i, image_path in enumerate(image_paths):
+        still = os.path.join(workdir, f"still_{i}.png")
+        subprocess.run(prerender_command(image_path, still, ffmpeg_path), check=True)
+        stills.append(still)
+    return stills
+
+
+def fit_crossfade(timings, crossfade=CROSSFADE_SECONDS):
+    """Keep each crossfade inside the shortest slide"""
+    return min(crossfade, min(t['duration'] for t in timings) / 2)
+
+
+def compose_slideshow(image_paths, audio_path, output_path, duration_seconds, speech_marks=None,
+                      ffmpeg_path=FFMPEG_PATH, profile=None, crossfade=CROSSFADE_SECONDS):
+    """Render a crossfading slideshow of ``image_paths`` timed to the audio"""
+    timings = slide_timings(len(image_paths), duration_seconds, speech_marks)
+    crossfade = fit_crossfade(timings, crossfade)
+    with tempfile.TemporaryDirectory(prefix='slideshow-') as workdir:
+        stills = prerender_stills(image_paths, workdir, ffmpeg_path)
+        subprocess.run(
+            build_slideshow_command(stills, timings, audio_path, output_path, ffmpeg_path,
+                                    profile, crossfade),
+            check=True,
+        )
+    return {'slides': timings, 'profile': (profile or get_profile(DEFAULT_PROFILE))['name'],
+            'crossfade': crossfade}
@@ -0,0 +1,192 @@
+"""
+Polly synthesis of long scripts: sentence chunks in parallel, joined into one MP3
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from videogen import mp3
+from videogen.aws_errors import error_code
+from videogen.slideshow import parse_speech_marks
+
+# SynthesizeSpeech rejects more than 3000 billed characters of text
+MAX_REQUEST_CHARACTERS = 3000
+# Smaller chunks spread a long script over more concurrent requests
+DEFAULT_CHUNK_CHARACTERS = 1000
+DEFAULT_CONCURRENCY = 4
+
+DEFAULT_VOICE = 'Takumi'
+DEFAULT_ENGINE = 'standard'
+
+SENTENCE_ENDINGS = '。！？!?\n'
+# Closing brackets and quotes stay with the sentence they end
+CLOSING_MARKS = '」』）)】"\''
+# Where an over-long sentence is split when it has no sentence ending
+CLAUSE_ENDINGS = '、，,'
+
+SPEECH_MARK_TYPES = ('sentence', 'word')
+
+RETRYABLE_CODES = ('ThrottlingException', 'ServiceFailureException')
+
+
+def split_sentences(text):
+    """Split after 。！？ (and line breaks), keeping every character.
+
+    ``''.join(split_sentences(text)) == text``, so byte offsets into the
+    pieces map straight back onto the script.
+    """
+    sentences = []
+    start = 0
+    i = 0
+    while i < len(text):
+        if text[i] in SENTENCE_ENDINGS:
+            i += 1
+            while i < len(text) and (text[i] in CLOSING_MARKS or text[i] in SENTENCE_ENDINGS
+                                     or text[i].isspace()):
+                i += 1
+            sentences.append(text[start:i])
+            start = i
+        else:
+            i += 1
+    if start < len(text):
+        if text[start:].strip() or not sentences:
+            sentences.append(text[start:])
+        else:
+            sentences[-1] += text[start:]
+    return sentences
+
+
+def _split_long(sentence, max_characters):
+    """Cut a sentence longer than ``max_characters`` at clause endings, or hard"""
+    pieces = []
+    while len(sentence) > max_characters:
+        cut = max((sentence.rfind(mark, 0, max_characters) for mark in CLAUSE_ENDINGS), default=-1) + 1
+        if cut <= 0:
+            cut = max_characters
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:]
+    return pieces + [sentence] if sentence else pieces
+
+
+def chunk_script(text, max_characters=DEFAULT_CHUNK_CHARACTERS):
+    """Pack whole sentences into chunks of at most ``max_characters``.
+
+    Chunks only break between sentences, unless a single sentence is
+    longer than the limit. Joining the chunks gives back ``text``.
+    """
+    if not 0 < max_characters <= MAX_REQUEST_CHARACTERS:
+        raise ValueError(f"max_characters must be between 1 and {MAX_REQUEST_CHARACTERS}")
+    chunks = []
+    current = ''
+    for sentence in split_sentences(text):
+        for piece in _split_long(sentence, max_characters):
+            if current and len(current) + len(piece) > max_characters:
+                chunks.append(current)
+                current = ''
+            current += piece
+    if current:
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def format_speech_marks(marks):
+    """Speech marks as Polly writes them, one JSON object per line"""
+    return '\n'.join(json.dumps(mark, ensure_ascii=False) for mark in marks) + '\n'
+
+
+class SpeechSynthesizer:
+    """Synthesize scripts of any length with Polly.
+
+    The script is cut into sentence-aligned chunks that are synthesized
+    by up to ``concurrency`` requests at a time. The MP3s are joined at
+    frame level, so there is no re-encode and no tag or header frame at
+    the joins, and the speech marks of each chunk are shifted by the
+    exact playing time of the frames before it. Throttling is retried
+    with jittered backoff.
+    """
+
+    def __init__(self, polly_client, voice=DEFAULT_VOICE, engine=DEFAULT_ENGINE,
+                 chunk_characters=DEFAULT_CHUNK_CHARACTERS, concurrency=DEFAULT_CONCURRENCY,
+                 speech_mark_types=SPEECH_MARK_TYPES, sample_rate=None, max_retries=4,
+                 base_delay=0.5, max_delay=8.0, sleep=time.sleep):
+        self.polly = polly_client
+        self.voice = voice
+        self.engine = engine
+        self.chunk_characters = chunk_characters
+        self.concurrency = concurrency
+        self.speech_mark_types = tuple(speech_mark_types)
+        self.sample_rate = sample_rate
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.stats = {'requests': 0, 'retries': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _call(self, text, output_format, **kwargs):
+        params = dict(Text=text, TextType='text', OutputFormat=output_format,
+                      VoiceId=self.voice, Engine=self.engine, **kwargs)
+        if self.sample_rate:
+            params['SampleRate'] = str(self.sample_rate)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count('requests')
+                return self.polly.synthesize_speech(**params)['AudioStream'].read()
+            except Exception as e:
+                if error_code(e) not in RETRYABLE_CODES or attempt == self.max_retries:
+                    raise
+                self._count('retries')
+                self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def synthesize_chunk(self, text):
+        """Audio frames and speech marks for one chunk"""
+        audio = mp3.read_frames(self._call(text, 'mp3'))
+        marks = []
+        if self.speech_mark_types:
+            marks = parse_speech_marks(self._call(
+                text, 'json', SpeechMarkTypes=list(self.speech_mark_types)
+            ).decode('utf-8'))
+        return audio, marks
+
+    def synthesize(self, text):
+        """Synthesize ``text``; returns the joined MP3 and its speech marks.
+
+        The result has ``audio`` (MP3 bytes), ``speech_marks`` (Polly
+        marks with ``time`` in milliseconds and ``start``/``end`` byte
+        offsets into ``text``), ``duration`` in seconds and ``chunks``.
+        """
+        chunks = chunk_script(text, self.chunk_characters)
+        if not chunks:
+            raise ValueError("Nothing to synthesize")
+        workers = max(1, min(self.concurrency, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self.synthesize_chunk, chunks))
+
+        # Chunks drop leading blank text, so offsets are found in the script
+        marks = []
+        samples = 0
+        byte_offset = 0
+        search_from = 0
+        for chunk, (audio, chunk_marks) in zip(chunks, results):
+            position = text.index(chunk, search_from)
+            byte_offset += len(text[search_from:position].encode('utf-8'))
+            time_offset = round(samples * 1000 / audio['sample_rate'])
+            for mark in chunk_marks:
+                marks.append(dict(mark, time=mark['time'] + time_offset,
+                                  start=mark['start'] + byte_offset, end=mark['end'] + byte_offset))
+            samples += audio['samples']
+            byte_offset += len(chunk.encode('utf-8'))
+            search_from = position + len(chunk)
+
+        return {
+            'audio': mp3.concatenate([audio for audio, _ in results]),
+            'speech_marks': marks,
+            'duration': samples / results[0][0]['sample_rate'],
+            'chunks': len(chunks),
+        }
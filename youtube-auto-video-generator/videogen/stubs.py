@@ -0,0 +1,879 @@
+"""
+In-memory stand-ins for AWS and Google clients used by the offline test scripts
+"""
+import base64
+import hashlib
+import http.server
+import io
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from videogen.fixtures import png_bytes, silent_mp3_bytes
+from videogen.history import EXECUTION_STATUS_BY_EVENT_TYPE
+from videogen.openai_client import estimate_tokens
+from videogen.rate_limit import TokenBucket
+from videogen.script_generation import CHARS_PER_MINUTE, duration_minutes
+
+
+class StubStepFunctionsClient:
+    """Minimal moto-style Step Functions client backed by a dict.
+
+    ``executions`` maps execution ARN to its list of history events.
+    Every API call is appended to ``calls`` so scripts can assert on them.
+    With ``reveal_per_call`` set, executions start out empty and each new
+    history read exposes that many more events, emulating a running
+    execution.
+    """
+
+    def __init__(self, executions=None, page_size=None, reveal_per_call=None):
+        self.executions = executions or {}
+        self.page_size = page_size
+        self.reveal_per_call = reveal_per_call
+        self.calls = []
+        self._visible = {}
+
+    def _page(self, items, max_results, next_token):
+        start = int(next_token) if next_token else 0
+        limit = max_results or len(items)
+        if self.page_size:
+            limit = min(limit, self.page_size)
+        end = start + limit
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    def get_execution_history(self, executionArn, maxResults=None, nextToken=None,
+                              reverseOrder=False, includeExecutionData=True):
+        self.calls.append(('get_execution_history', executionArn, nextToken))
+        events = self.executions[executionArn]
+        if self.reveal_per_call:
+            if nextToken is None:
+                self._visible[executionArn] = self._visible.get(executionArn, 0) + self.reveal_per_call
+            events = events[:self._visible[executionArn]]
+        if reverseOrder:
+            events = list(reversed(events))
+        page, token = self._page(events, maxResults, nextToken)
+        response = {'events': page}
+        if token:
+            response['nextToken'] = token
+        return response
+
+    def _summary(self, execution_arn):
+        events = self.executions[execution_arn]
+        status = EXECUTION_STATUS_BY_EVENT_TYPE.get(events[-1]['type'], 'RUNNING')
+        summary = {
+            'executionArn': execution_arn,
+            'name': execution_arn.rsplit(':', 1)[-1],
+            'status': status,
+            'startDate': events[0]['timestamp'],
+        }
+        if status != 'RUNNING':
+            summary['stopDate'] = events[-1]['timestamp']
+        return summary
+
+    def list_executions(self, stateMachineArn, statusFilter=None, maxResults=None, nextToken=None):
+        self.calls.append(('list_executions', stateMachineArn, nextToken))
+        prefix = stateMachineArn.replace(':stateMachine:', ':execution:') + ':'
+        executions = [
+            self._summary(arn) for arn in self.executions if arn.startswith(prefix)
+        ]
+        executions.sort(key=lambda e: e['startDate'], reverse=True)
+        if statusFilter:
+            executions = [e for e in executions if e['status'] == statusFilter]
+        page, token = self._page(executions, maxResults, nextToken)
+        response = {'executions': page}
+        if token:
+            response['nextToken'] = token
+        return response
+
+
+class StubClientError(Exception):
+    """Carries a botocore-style ``response`` so callers can read the error code"""
+
+    def __init__(self, code, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {'Error': {'Code': code}}
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class StubS3Client:
+    """In-memory S3 client covering the object calls the tooling makes.
+
+    ``objects`` maps ``(bucket, key)`` to bytes; calls are recorded in
+    ``calls`` as ``(operation, key)``. Conditional writes (``IfNoneMatch``
+    and ``IfMatch``) are honoured, and ``clock`` supplies LastModified.
+    """
+
+    def __init__(self, objects=None, clock=time.time):
+        self.objects = objects if objects is not None else {}
+        self.clock = clock
+        self.calls = []
+        self._meta = {}
+        self._lock = threading.Lock()
+
+    def _etag(self, bucket, key):
+        return self._meta.get((bucket, key), {}).get('ETag') or (
+            f'"{hashlib.md5(self.objects[(bucket, key)]).hexdigest()}"'
+        )
+
+    def put_object(self, Bucket, Key, Body=b'', IfNoneMatch=None, IfMatch=None, **kwargs):
+        self.calls.append(('put_object', Key))
+        data = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        with self._lock:
+            exists = (Bucket, Key) in self.objects
+            if (IfNoneMatch == '*' and exists) or (
+                IfMatch is not None and (not exists or self._etag(Bucket, Key) != IfMatch)
+            ):
+                raise StubClientError('PreconditionFailed', 'PutObject')
+            self.objects[(Bucket, Key)] = data
+            etag = f'"{hashlib.md5(data).hexdigest()}-{len(self.calls)}"'
+            self._meta[(Bucket, Key)] = {'ETag': etag, 'LastModified': self.clock()}
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('get_object', Key))
+        if (Bucket, Key) not in self.objects:
+            raise StubClientError('NoSuchKey', 'GetObject')
+        data = self.objects[(Bucket, Key)]
+        return {'Body': _Body(data), 'ContentLength': len(data), 'ETag': self._etag(Bucket, Key)}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None):
+        self.calls.append(('list_objects_v2', Prefix))
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        response = {
+            'Contents': [
+                {
+                    'Key': key,
+                    'Size': len(self.objects[(Bucket, key)]),
+                    'ETag': self._etag(Bucket, key),
+                    'LastModified': self._meta.get((Bucket, key), {}).get('LastModified', 0),
+                }
+                for key in page
+            ],
+            'IsTruncated': start + MaxKeys < len(keys),
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + MaxKeys)
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('head_object', Key))
+        if (Bucket, Key) not in self.objects:
+            raise StubClientError('404', 'HeadObject')
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('delete_object', Key))
+        self.objects.pop((Bucket, Key), None)
+        self._meta.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        deleted = []
+        for item in Delete['Objects']:
+            self.calls.append(('delete_object', item['Key']))
+            self.objects.pop((Bucket, item['Key']), None)
+            self._meta.pop((Bucket, item['Key']), None)
+            deleted.append({'Key': item['Key']})
+        return {'Deleted': deleted}
+
+
+class LocalS3Client:
+    """S3 client backed by a directory: objects live at ``{root}/{bucket}/{key}``.
+
+    ``get_object`` returns an open file as the body so reads stream from
+    disk and honours ``Range`` and ``IfMatch``; multipart uploads are
+    assembled from part files and can be listed until completed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.calls = []
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _etag(self, path):
+        stat = os.stat(path)
+        return f'"{stat.st_size}-{stat.st_mtime_ns}"'
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self.calls.append(('put_object', Key))
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            if hasattr(Body, 'read'):
+                shutil.copyfileobj(Body, f)
+            else:
+                f.write(Body.encode('utf-8') if isinstance(Body, str) else Body)
+        return {'ETag': self._etag(path)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, **kwargs):
+        self.calls.append(('get_object', Key))
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise StubClientError('NoSuchKey', 'GetObject')
+        if IfMatch and IfMatch != self._etag(path):
+            raise StubClientError('PreconditionFailed', 'GetObject')
+        body = open(path, 'rb')
+        if not Range:
+            return {'Body': body, 'ContentLength': os.path.getsize(path), 'ETag': self._etag(path)}
+        start, end = (int(n) for n in Range[len('bytes='):].split('-'))
+        end = min(end, os.path.getsize(path) - 1)
+        body.seek(start)
+        data = body.read(end - start + 1)
+        body.close()
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data), 'ETag': self._etag(path),
+                'ContentRange': f"bytes {start}-{end}/{os.path.getsize(path)}"}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('head_object', Key))
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise StubClientError('404', 'HeadObject')
+        return {'ContentLength': os.path.getsize(path), 'ETag': self._etag(path)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('delete_object', Key))
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append(('create_multipart_upload', Key))
+        with self._lock:
+            upload_id = f"upload-{len(self.calls)}"
+            self._uploads[upload_id] = {
+                'Bucket': Bucket, 'Key': Key, 'Initiated': len(self.calls),
+                'dir': tempfile.mkdtemp(prefix='multipart-', dir=self.root),
+            }
+        return {'UploadId': upload_id}
+
+    def _upload(self, upload_id, operation):
+        if upload_id not in self._uploads:
+            raise StubClientError('NoSuchUpload', operation)
+        return self._uploads[upload_id]
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self.calls.append(('upload_part', Key))
+        with open(os.path.join(self._upload(UploadId, 'UploadPart')['dir'], f"{PartNumber:05d}"), 'wb') as f:
+            f.write(Body)
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        self.calls.append(('list_parts', Key))
+        part_dir = self._upload(UploadId, 'ListParts')['dir']
+        parts = []
+        for name in sorted(os.listdir(part_dir)):
+            if int(name) <= PartNumberMarker:
+                continue
+            with open(os.path.join(part_dir, name), 'rb') as f:
+                data = f.read()
+            parts.append({'PartNumber': int(name), 'Size': len(data),
+                          'ETag': f'"{hashlib.md5(data).hexdigest()}"'})
+        page = parts[:MaxParts]
+        response = {'Parts': page, 'IsTruncated': len(parts) > MaxParts}
+        if response['IsTruncated']:
+            response['NextPartNumberMarker'] = page[-1]['PartNumber']
+        return response
+
+    def list_multipart_uploads(self, Bucket, Prefix='', **kwargs):
+        self.calls.append(('list_multipart_uploads', Prefix))
+        return {'Uploads': [
+            {'UploadId': upload_id, 'Key': upload['Key'], 'Initiated': upload['Initiated']}
+            for upload_id, upload in self._uploads.items()
+            if upload['Bucket'] == Bucket and upload['Key'].startswith(Prefix)
+        ]}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append(('complete_multipart_upload', Key))
+        part_dir = self._upload(UploadId, 'CompleteMultipartUpload')['dir']
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            for part in MultipartUpload['Parts']:
+                with open(os.path.join(part_dir, f"{part['PartNumber']:05d}"), 'rb') as f:
+                    shutil.copyfileobj(f, out)
+        del self._uploads[UploadId]
+        shutil.rmtree(part_dir)
+        return {'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append(('abort_multipart_upload', Key))
+        upload = self._uploads.pop(UploadId, None)
+        if upload:
+            shutil.rmtree(upload['dir'], ignore_errors=True)
+        return {}
+
+
+class FakePollyClient:
+    """Polly ``synthesize_speech`` returning silent audio of a fixed length per character.
+
+    MP3 output is tagged like encoder output; JSON output holds
+    ``sentence`` and ``word`` speech marks timed at the same rate, so
+    they line up with the audio. Text over ``max_characters`` is
+    rejected as Polly does, the first ``throttle`` calls fail with
+    ThrottlingException and each call takes ``latency`` seconds.
+    ``max_in_flight`` records the most concurrent calls seen.
+    """
+
+    def __init__(self, seconds_per_character=0.15, latency=0, throttle=0, max_characters=3000):
+        self.seconds_per_character = seconds_per_character
+        self.latency = latency
+        self.throttle = throttle
+        self.max_characters = max_characters
+        self.calls = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _marks(self, text, types):
+        patterns = {'sentence': r'[^。！？\s][^。！？]*[。！？]?', 'word': r'[^、。！？\s]+'}
+        marks = []
+        for kind in types:
+            for match in re.finditer(patterns[kind], text):
+                marks.append({
+                    'time': round(match.start() * self.seconds_per_character * 1000),
+                    'type': kind,
+                    'start': len(text[:match.start()].encode('utf-8')),
+                    'end': len(text[:match.end()].encode('utf-8')),
+                    'value': match.group(),
+                })
+        marks.sort(key=lambda mark: (mark['time'], mark['type'] != 'sentence'))
+        return '\n'.join(json.dumps(mark, ensure_ascii=False) for mark in marks).encode('utf-8')
+
+    def synthesize_speech(self, Text, OutputFormat, VoiceId, SpeechMarkTypes=None, **kwargs):
+        with self._lock:
+            self.calls.append((OutputFormat, len(Text)))
+            if len(self.calls) <= self.throttle:
+                raise StubClientError('ThrottlingException', 'SynthesizeSpeech')
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if len(Text) > self.max_characters:
+                raise StubClientError('TextLengthExceededException', 'SynthesizeSpeech')
+            if self.latency:
+                time.sleep(self.latency)
+            if OutputFormat == 'json':
+                return {'AudioStream': _Body(self._marks(Text, SpeechMarkTypes or ['sentence'])),
+                        'ContentType': 'application/x-json-stream'}
+            audio = silent_mp3_bytes(len(Text) * self.seconds_per_character, tagged=True)
+            return {'AudioStream': _Body(audio), 'ContentType': 'audio/mpeg',
+                    'RequestCharacters': len(Text)}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class FakeSecretsManagerClient:
+    """Secrets Manager ``get_secret_value`` over a dict of secret id to JSON value.
+
+    Every call is recorded in ``calls`` and takes ``latency`` seconds;
+    ``rotate`` replaces a value under a new version, as a rotation
+    Lambda would. Unknown ids raise ResourceNotFoundException.
+    """
+
+    def __init__(self, secrets, latency=0):
+        self.secrets = {secret_id: (value, 1) for secret_id, value in secrets.items()}
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def rotate(self, secret_id, value):
+        with self._lock:
+            self.secrets[secret_id] = (value, self.secrets[secret_id][1] + 1)
+
+    def get_secret_value(self, SecretId, **kwargs):
+        with self._lock:
+            self.calls.append(SecretId)
+            if SecretId not in self.secrets:
+                raise StubClientError('ResourceNotFoundException', 'GetSecretValue')
+            value, version = self.secrets[SecretId]
+        if self.latency:
+            time.sleep(self.latency)
+        return {'Name': SecretId, 'SecretString': json.dumps(value), 'VersionId': f'v{version}'}
+
+
+class StubLambdaClient:
+    """Lambda configuration and ``invoke`` over in-memory functions.
+
+    ``functions`` maps a name to a configuration as
+    ``get_function_configuration`` returns it (``CodeSize``, ``Layers``
+    with their ``CodeSize``, ``Environment``). The first invocation after
+    a configuration change is a cold start whose REPORT line carries an
+    Init Duration of ``init_ms`` plus ``init_ms_per_mb`` for every MB of
+    code and layers; later invocations reuse the warm environment.
+    """
+
+    def __init__(self, functions, init_ms=100.0, init_ms_per_mb=20.0):
+        self.functions = {name: dict(config, FunctionName=name) for name, config in functions.items()}
+        self.init_ms = init_ms
+        self.init_ms_per_mb = init_ms_per_mb
+        self.updates = []
+        self._warm = set()
+
+    def get_function_configuration(self, FunctionName, **kwargs):
+        return json.loads(json.dumps(self.functions[FunctionName]))
+
+    def update_function_configuration(self, FunctionName, Environment=None, **kwargs):
+        self.updates.append(FunctionName)
+        if Environment is not None:
+            self.functions[FunctionName]['Environment'] = Environment
+        self._warm.discard(FunctionName)
+        return self.get_function_configuration(FunctionName)
+
+    def get_waiter(self, name):
+        return type('Waiter', (), {'wait': lambda self, **kwargs: None})()
+
+    def invoke(self, FunctionName, Payload=b'', LogType='None', **kwargs):
+        config = self.functions[FunctionName]
+        report = 'REPORT RequestId: stub\tDuration: 12.00 ms\tBilled Duration: 12 ms\t'
+        report += 'Memory Size: 512 MB\tMax Memory Used: 80 MB\t'
+        if FunctionName not in self._warm:
+            total = config['CodeSize'] + sum(layer.get('CodeSize', 0) for layer in config.get('Layers', []))
+            report += f"Init Duration: {self.init_ms + self.init_ms_per_mb * total / 1e6:.2f} ms\t"
+            self._warm.add(FunctionName)
+        response = {'StatusCode': 200, 'Payload': _Body(json.dumps({'statusCode': 200}).encode('utf-8'))}
+        if LogType == 'Tail':
+            response['LogResult'] = base64.b64encode(report.encode('utf-8')).decode('ascii')
+        return response
+
+
+class ResumableUploadServer:
+    """Local HTTP server speaking the YouTube resumable upload protocol.
+
+    POST opens a session and answers with its ``Location``; each PUT
+    appends a chunk and answers 308 Resume Incomplete with the committed
+    ``Range`` until the last byte arrives, then 200 with a video
+    resource. ``faults`` maps the n-th chunk PUT (1-based) to a failure:
+    ``'drop'`` keeps half the chunk and closes the connection without a
+    response, ``'partial'`` keeps half and answers 308, and an integer
+    is returned as the HTTP status without keeping anything.
+    """
+
+    def __init__(self, faults=None):
+        self.faults = dict(faults or {})
+        self.sessions = {}
+        self.videos = {}
+        self.requests = []
+        self.bytes_received = 0
+        self._chunk_puts = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def upload_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/upload/youtube/v3/videos?uploadType=resumable&part=snippet,status"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def expire_sessions(self):
+        self.sessions.clear()
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, headers=None, body=b''):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.requests.append(('POST', self.path, None))
+                with server._lock:
+                    session_id = f"session-{len(server.requests)}"
+                    server.sessions[session_id] = {
+                        'metadata': json.loads(body),
+                        'size': int(self.headers['X-Upload-Content-Length']),
+                        'data': bytearray(),
+                    }
+                host, port = server._server.server_address
+                self._reply(200, {'Location': f"http://{host}:{port}/upload/session/{session_id}"})
+
+            def do_PUT(self):
+                content_range = self.headers.get('Content-Range', '')
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.requests.append(('PUT', self.path, content_range))
+                session = server.sessions.get(self.path.rsplit('/', 1)[-1])
+                if session is None:
+                    return self._reply(404, body=b'{"error": "session expired"}')
+
+                if data:
+                    server.bytes_received += len(data)
+                    with server._lock:
+                        server._chunk_puts += 1
+                        fault = server.faults.get(server._chunk_puts)
+                    if isinstance(fault, int):
+                        return self._reply(fault, body=b'{"error": "injected"}')
+                    start = int(content_range.split(' ')[1].split('-')[0])
+                    if start > len(session['data']):
+                        return self._reply(400, body=b'{"error": "gap in upload"}')
+                    if fault in ('drop', 'partial'):
+                        data = data[:len(data) // 2]
+                    del session['data'][start:]
+                    session['data'].extend(data)
+                    if fault == 'drop':
+                        self.close_connection = True
+                        return
+
+                if len(session['data']) == session['size']:
+                    video_id = f"video-{len(server.videos) + 1}"
+                    server.videos[video_id] = {'data': bytes(session['data']),
+                                               'metadata': session['metadata']}
+                    resource = dict(session['metadata'], id=video_id, kind='youtube#video')
+                    return self._reply(200, {'Content-Type': 'application/json'},
+                                       json.dumps(resource).encode('utf-8'))
+                headers = {'Range': f"bytes=0-{len(session['data']) - 1}"} if session['data'] else {}
+                self._reply(308, headers)
+
+        return Handler
+
+
+class _ConcurrentHTTPServer(http.server.ThreadingHTTPServer):
+    # The default backlog of 5 drops connection bursts, which then wait a
+    # second for the SYN to be resent
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class OpenAIStubServer:
+    """Local HTTP server answering chat completions and image generations like OpenAI.
+
+    It enforces its own ``requests_per_minute``, ``tokens_per_minute``
+    (prompt plus ``max_tokens``) and ``images_per_minute`` over
+    ``period`` seconds, answering 429 with ``Retry-After`` (whole
+    seconds), ``retry-after-ms`` and ``x-ratelimit-*`` headers when a
+    request does not fit. The first ``throttle`` requests are refused
+    with a ``Retry-After`` of ``throttle_seconds`` whatever the limits.
+    Each request takes ``latency`` seconds plus ``seconds_per_token``
+    per completion token; ``max_in_flight`` records the most concurrent
+    requests and ``throttled`` the 429s sent. Tokens are counted with
+    ``estimate_tokens``. Scripts run to about ``CHARS_PER_MINUTE``
+    characters per minute of the row's duration. JSON-mode requests built
+    by ``batch_messages`` get a script per row keyed by ``rowIndex``,
+    except rows in ``garbled_rows``, and answers longer than
+    ``max_tokens`` are cut off with ``finish_reason`` ``length``.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, images_per_minute=None,
+                 period=60.0, latency=0, throttle=0, throttle_seconds=1, seconds_per_token=0,
+                 garbled_rows=()):
+        buckets = {'requests': requests_per_minute, 'tokens': tokens_per_minute,
+                   'images': images_per_minute}
+        self.buckets = {name: TokenBucket(limit, period) for name, limit in buckets.items() if limit}
+        self.latency = latency
+        self.throttle = throttle
+        self.throttle_seconds = throttle_seconds
+        self.seconds_per_token = seconds_per_token
+        self.garbled_rows = set(garbled_rows)
+        self.requests = []
+        self.throttled = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _ConcurrentHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _admit(self, needs):
+        """None if the request fits the limits, else the seconds until it would"""
+        with self._lock:
+            if len(self.requests) <= self.throttle:
+                self.throttled += 1
+                return self.throttle_seconds
+            delay = max((self.buckets[name].delay(amount) for name, amount in needs.items()
+                         if name in self.buckets), default=0.0)
+            if delay > 0:
+                self.throttled += 1
+                return delay
+            for name, amount in needs.items():
+                if name in self.buckets:
+                    self.buckets[name].take(amount)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            return None
+
+    @staticmethod
+    def _script(title, duration=''):
+        """About ``CHARS_PER_MINUTE`` characters per minute of ``duration``, as the system prompt asks"""
+        script = f"こんにちは！{title}について、順番に解説していきます。"
+        minutes = duration_minutes({'duration': duration})
+        if minutes:
+            sentence = f"{title}の大切な点を、例を挙げながら一つずつ確かめていきましょう。"
+            script += sentence * max(0, round((minutes * CHARS_PER_MINUTE - len(script)) / len(sentence)))
+        return script
+
+    def _complete(self, payload):
+        prompt = payload['messages'][-1]['content']
+        if (payload.get('response_format') or {}).get('type') == 'json_object':
+            rows = json.loads(prompt[prompt.index('\n[') + 1:])
+            content = json.dumps({
+                str(row['rowIndex']): ({'script': ''} if row['rowIndex'] in self.garbled_rows else
+                                       {'script': self._script(row['title'], row.get('duration', '')),
+                                        'description': f"{row['title']}を解説する動画です。"})
+                for row in rows
+            }, ensure_ascii=False)
+        else:
+            lines = prompt.splitlines()
+            duration = next((line[len('長さ: '):] for line in lines if line.startswith('長さ: ')), '')
+            content = self._script(lines[0], duration)
+        finish_reason = 'stop'
+        if estimate_tokens(content) > payload.get('max_tokens', float('inf')):
+            # No character is more than one token, so this fits
+            content, finish_reason = content[:payload['max_tokens']], 'length'
+        completion_tokens = estimate_tokens(content)
+        if self.seconds_per_token:
+            time.sleep(completion_tokens * self.seconds_per_token)
+        prompt_tokens = sum(estimate_tokens(message['content']) for message in payload['messages'])
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        return {'object': 'chat.completion', 'model': payload['model'], 'usage': usage,
+                'choices': [{'index': 0, 'finish_reason': finish_reason,
+                             'message': {'role': 'assistant', 'content': content}}]}
+
+    @staticmethod
+    def _image(payload):
+        seed = int(hashlib.sha256(payload['prompt'].encode('utf-8')).hexdigest()[:4], 16)
+        data = base64.b64encode(png_bytes(32, 18, seed)).decode('ascii')
+        return {'created': int(time.time()), 'data': [{'b64_json': data, 'revised_prompt': payload['prompt']}]}
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                server.requests.append((self.path, payload.get('model')))
+                if self.path.endswith('/chat/completions'):
+                    tokens = (sum(estimate_tokens(m['content']) for m in payload['messages'])
+                              + payload.get('max_tokens', 0))
+                    needs, respond = {'requests': 1, 'tokens': tokens}, server._complete
+                elif self.path.endswith('/images/generations'):
+                    needs, respond = {'images': payload.get('n', 1)}, server._image
+                else:
+                    return self._reply(404, {'error': {'message': 'Unknown endpoint'}})
+                delay = server._admit(needs)
+                if delay is not None:
+                    return self._reply(429, {'error': {'type': 'requests', 'code': 'rate_limit_exceeded',
+                                                       'message': 'Rate limit reached'}}, {
+                        'Retry-After': str(math.ceil(delay)),
+                        'retry-after-ms': str(round(delay * 1000)),
+                        'x-ratelimit-remaining-requests': '0',
+                    })
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    body = respond(payload)
+                finally:
+                    # Counted out before the reply, so the client cannot send
+                    # its next request while this one still looks in flight
+                    with server._lock:
+                        server._in_flight -= 1
+                self._reply(200, body)
+
+        return Handler
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient's HttpError: the status is on ``resp``"""
+
+    def __init__(self, status):
+        super().__init__(f"<HttpError {status}>")
+        self.resp = type('Response', (), {'status': status})()
+
+
+class _Request:
+    def __init__(self, service, operation, run):
+        self._service = service
+        self._operation = operation
+        self._run = run
+
+    def execute(self):
+        self._service.calls.append(self._operation)
+        if self._service.rate_limit_failures:
+            self._service.rate_limit_failures -= 1
+            raise FakeHttpError(429)
+        return self._run()
+
+
+class FakeSheetsService:
+    """In-memory Google Sheets service for the values collection.
+
+    Mirrors the ``service.spreadsheets().values().<method>(...).execute()``
+    chain of googleapiclient. ``cells`` maps ``(sheet, row, column)`` (both
+    1-based) to values; the first ``rate_limit_failures`` executed requests
+    fail with HTTP 429.
+    """
+
+    def __init__(self, rate_limit_failures=0):
+        self.cells = {}
+        self.calls = []
+        self.rate_limit_failures = rate_limit_failures
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    @staticmethod
+    def _parse(a1_range):
+        sheet, _, cells = a1_range.partition('!')
+        start, _, end = cells.partition(':')
+        end = end or start
+
+        def cell(ref, default_row):
+            letters = ''.join(ch for ch in ref if ch.isalpha())
+            digits = ''.join(ch for ch in ref if ch.isdigit())
+            column = 0
+            for ch in letters:
+                column = column * 26 + ord(ch.upper()) - ord('A') + 1
+            return (int(digits) if digits else default_row), column
+
+        return sheet, cell(start, 1), cell(end, 1000)
+
+    def _write(self, a1_range, values):
+        sheet, (row, column), _ = self._parse(a1_range)
+        count = 0
+        for r, row_values in enumerate(values):
+            for c, value in enumerate(row_values):
+                self.cells[(sheet, row + r, column + c)] = value
+                count += 1
+        return count
+
+    def _read(self, a1_range):
+        sheet, (top, left), (bottom, right) = self._parse(a1_range)
+        rows = []
+        for r in range(top, bottom + 1):
+            row = [self.cells.get((sheet, r, c), '') for c in range(left, right + 1)]
+            while row and row[-1] == '':
+                row.pop()
+            rows.append(row)
+        while rows and not rows[-1]:
+            rows.pop()
+        return {'range': a1_range, 'values': rows}
+
+    def update(self, spreadsheetId, range, body, valueInputOption='RAW'):
+        return _Request(self, 'update', lambda: {'updatedCells': self._write(range, body['values'])})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            total = sum(self._write(item['range'], item['values']) for item in body['data'])
+            return {'totalUpdatedCells': total, 'totalUpdatedRanges': len(body['data'])}
+        return _Request(self, 'batchUpdate', run)
+
+    def get(self, spreadsheetId, range):
+        return _Request(self, 'get', lambda: self._read(range))
+
+    def batchGet(self, spreadsheetId, ranges):
+        return _Request(self, 'batchGet', lambda: {'valueRanges': [self._read(r) for r in ranges]})
+
+    def clear(self, spreadsheetId, range, body=None):
+        def run():
+            sheet, (top, left), (bottom, right) = self._parse(range)
+            for key in [k for k in self.cells if k[0] == sheet
+                        and top <= k[1] <= bottom and left <= k[2] <= right]:
+                del self.cells[key]
+            return {'clearedRange': range}
+        return _Request(self, 'clear', run)
+
+
+def linear_history(task_names, start=None, step_seconds=1.0, retries=None, failed_state=None):
+    """Build a plausible history for a run of sequential Task states.
+
+    ``retries`` maps a state name to the number of extra attempts it made;
+    ``failed_state`` names the state at which the execution fails.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    retries = retries or {}
+    clock = [start or datetime(2025, 6, 14, tzinfo=timezone.utc)]
+    events = []
+
+    def add(event_type, advance=0.0, **details):
+        clock[0] += timedelta(seconds=advance)
+        event = {
+            'id': len(events) + 1,
+            'previousEventId': len(events),
+            'type': event_type,
+            'timestamp': clock[0],
+        }
+        event.update(details)
+        events.append(event)
+
+    add('ExecutionStarted', executionStartedEventDetails={'input': '{}'})
+    for name in task_names:
+        add('TaskStateEntered', stateEnteredEventDetails={'name': name, 'input': '{}'})
+        for _ in range(retries.get(name, 0)):
+            add('TaskScheduled')
+            add('TaskStarted')
+            add('TaskFailed', step_seconds, taskFailedEventDetails={'error': 'Lambda.ServiceException'})
+        add('TaskScheduled')
+        add('TaskStarted')
+        if name == failed_state:
+            add('TaskFailed', step_seconds, taskFailedEventDetails={'error': 'States.TaskFailed'})
+            add('ExecutionFailed', executionFailedEventDetails={'error': 'States.TaskFailed'})
+            return events
+        add('TaskSucceeded', step_seconds,
+            taskSucceededEventDetails={'output': '{"Payload": {"statusCode": 200}}'})
+        add('TaskStateExited', stateExitedEventDetails={'name': name, 'output': '{}'})
+    add('ExecutionSucceeded', executionSucceededEventDetails={'output': '{}'})
+    return events
@@ -0,0 +1,234 @@
+"""
+Quota-aware YouTube upload queue that defers overflow videos to the next quota day
+"""
+import json
+import math
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from videogen.aws_errors import NOT_FOUND_CODES, PRECONDITION_FAILED_CODES, error_code
+
+# videos.insert costs 1600 units against the default 10,000 a day
+UNITS_PER_UPLOAD = 1600
+DEFAULT_DAILY_QUOTA = 10000
+
+# The YouTube Data API quota resets at midnight Pacific Time
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# Spreadsheet column ordering uploads: 1 goes first, blank goes last
+PRIORITY_COLUMN = 'priority'
+
+DEFAULT_PREFIX = 'upload-queue/'
+
+# UploadToYouTube's Lambda timeout: a reservation older than this belongs
+# to an attempt that is gone, so a retry may take it over
+DEFAULT_LEASE_SECONDS = 15 * 60
+
+# How long uploaded videos are remembered, so a retried attempt that is
+# handed the same videos again does not upload them twice
+UPLOADED_RETENTION_SECONDS = 24 * 60 * 60
+
+# What a deferred video needs for its upload and sheet write-back later
+QUEUED_FIELDS = ('rowIndex', 'title', 'description', 'keywords', 'videoS3Key', PRIORITY_COLUMN,
+                 'spreadsheetId', 'sheetName')
+
+# Error reasons YouTube gives when the project is out of upload quota
+QUOTA_REASONS = ('quotaExceeded', 'uploadLimitExceeded', 'dailyLimitExceeded')
+
+
+def quota_day(timestamp):
+    """Pacific date the quota counter for ``timestamp`` belongs to"""
+    return datetime.fromtimestamp(timestamp, QUOTA_TIMEZONE).date().isoformat()
+
+
+def priority(video):
+    """Sort value of a video's priority column; blank or invalid sorts last"""
+    try:
+        return float(str(video.get(PRIORITY_COLUMN, '')).strip())
+    except ValueError:
+        return math.inf
+
+
+class QueueConflict(Exception):
+    """The queue state kept changing underneath us; another run is busy with it"""
+
+
+class UploadQueue:
+    """Reserve daily upload quota and park the videos that do not fit.
+
+    The state lives in ``{prefix}state.json``: the Pacific quota day, the
+    units reserved on it, the queued videos and the recently uploaded
+    ones. Every change is a conditional put on the previous ETag, so
+    concurrent Map iterations never hand out the same units twice. A
+    video is reserved just before its upload and stays queued, marked
+    with its reservation, until the upload is committed; a failed upload
+    is released, refunding its units. Composed videos stay in S3, so a
+    deferred video costs nothing until a later run uploads it.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=DEFAULT_PREFIX, daily_quota=DEFAULT_DAILY_QUOTA,
+                 units_per_upload=UNITS_PER_UPLOAD, clock=time.time, max_conflicts=10,
+                 lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = f"{prefix}state.json"
+        self.daily_quota = daily_quota
+        self.units_per_upload = units_per_upload
+        self.clock = clock
+        self.max_conflicts = max_conflicts
+        self.lease_seconds = lease_seconds
+
+    def _load(self):
+        """``(state, etag)``; a missing state starts empty with no ETag"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+        except Exception as e:
+            if error_code(e) not in NOT_FOUND_CODES:
+                raise
+            return {'quotaDay': None, 'unitsUsed': 0, 'pending': [], 'uploaded': {}}, None
+        return json.loads(response['Body'].read()), response.get('ETag')
+
+    def _update(self, change):
+        """Apply ``change(state)`` with optimistic concurrency and return its result"""
+        for _ in range(self.max_conflicts):
+            state, etag = self._load()
+            now = self.clock()
+            today = quota_day(now)
+            if state['quotaDay'] != today:
+                state.update(quotaDay=today, unitsUsed=0)
+            state['uploaded'] = {key: at for key, at in state.get('uploaded', {}).items()
+                                 if now - at < UPLOADED_RETENTION_SECONDS}
+            result = change(state)
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                self.s3.put_object(Bucket=self.bucket, Key=self.key,
+                                   Body=json.dumps(state, ensure_ascii=False).encode('utf-8'),
+                                   ContentType='application/json', **condition)
+                return result
+            except Exception as e:
+                if error_code(e) not in PRECONDITION_FAILED_CODES:
+                    raise
+        raise QueueConflict(f"s3://{self.bucket}/{self.key} changed {self.max_conflicts} times in a row")
+
+    def state(self):
+        return self._load()[0]
+
+    def _held(self, video):
+        """Whether a live upload attempt holds ``video``'s reservation"""
+        return 'reservedAt' in video and self.clock() - video['reservedAt'] < self.lease_seconds
+
+    def enqueue(self, videos=()):
+        """Queue ``videos`` and return the ones free to upload, in upload order.
+
+        That is priority order, then oldest first. Videos uploaded
+        recently or already queued are not added again; videos a live
+        attempt is uploading are left out.
+        """
+        now = self.clock()
+
+        def change(state):
+            queued = {video['videoS3Key'] for video in state['pending']}
+            for video in videos:
+                if video['videoS3Key'] in queued or video['videoS3Key'] in state['uploaded']:
+                    continue
+                entry = {field: video[field] for field in QUEUED_FIELDS if field in video}
+                state['pending'].append(dict(entry, queuedAt=now))
+                queued.add(video['videoS3Key'])
+            return sorted((video for video in state['pending'] if not self._held(video)),
+                          key=lambda v: (priority(v), v['queuedAt'], v.get('rowIndex', 0)))
+
+        return self._update(change)
+
+    def reserve(self, video):
+        """Take ``units_per_upload`` for one queued video.
+
+        Returns ``'reserved'``, ``'held'`` when another live attempt has it
+        or it is no longer queued, or ``'quota'`` when the day's quota is
+        spent. An abandoned reservation from the same quota day is taken
+        over without charging its units again.
+        """
+        now = self.clock()
+
+        def change(state):
+            entry = next((v for v in state['pending'] if v['videoS3Key'] == video['videoS3Key']), None)
+            if entry is None or self._held(entry):
+                return 'held'
+            if entry.get('reservedDay') != state['quotaDay']:
+                if state['unitsUsed'] + self.units_per_upload > self.daily_quota:
+                    return 'quota'
+                state['unitsUsed'] += self.units_per_upload
+            entry.update(reservedAt=now, reservedDay=state['quotaDay'])
+            return 'reserved'
+
+        return self._update(change)
+
+    def commit(self, video):
+        """The upload succeeded: take the video off the queue for good"""
+        def change(state):
+            state['pending'] = [v for v in state['pending'] if v['videoS3Key'] != video['videoS3Key']]
+            state['uploaded'][video['videoS3Key']] = self.clock()
+
+        self._update(change)
+
+    def release(self, video, quota_exhausted=False):
+        """The upload failed: keep the video queued and refund its units.
+
+        With ``quota_exhausted`` YouTube refused it for quota, so the rest
+        of the day is closed instead.
+        """
+        def change(state):
+            for entry in state['pending']:
+                if entry['videoS3Key'] == video['videoS3Key']:
+                    if entry.pop('reservedDay', None) == state['quotaDay']:
+                        state['unitsUsed'] = max(0, state['unitsUsed'] - self.units_per_upload)
+                    entry.pop('reservedAt', None)
+            if quota_exhausted:
+                state['unitsUsed'] = max(state['unitsUsed'], self.daily_quota)
+
+        self._update(change)
+
+    def deferred(self):
+        """Queued videos no attempt is uploading, in upload order"""
+        return sorted((video for video in self.state()['pending'] if not self._held(video)),
+                      key=lambda v: (priority(v), v['queuedAt'], v.get('rowIndex', 0)))
+
+
+def is_quota_error(error):
+    """Whether an upload failed because the API quota is used up"""
+    return getattr(error, 'reason', None) in QUOTA_REASONS
+
+
+def upload_queued(queue, videos, upload):
+    """Upload what today's quota allows and defer the rest.
+
+    ``upload(video)`` returns the result dict for one video. Each video
+    is reserved right before its upload and committed only once it
+    succeeded; any failure releases it back onto the queue with its
+    units refunded before the error propagates. If YouTube rejects an
+    upload for quota anyway (for example because another client shares
+    the project), the day is closed and the remaining videos stay queued
+    instead of failing the execution.
+    """
+    results = []
+    for video in queue.enqueue(videos):
+        outcome = queue.reserve(video)
+        if outcome == 'quota':
+            break
+        if outcome != 'reserved':
+            continue
+        try:
+            result = upload(video)
+        except Exception as e:
+            queue.release(video, quota_exhausted=is_quota_error(e))
+            if not is_quota_error(e):
+                raise
+            break
+        queue.commit(video)
+        results.append(result)
+    deferred = [
+        {'rowIndex': video['rowIndex'], 'title': video['title'], 'videoS3Key': video['videoS3Key'],
+         'uploaded': False, 'deferred': True}
+        for video in queue.deferred()
+    ]
+    return results, deferred
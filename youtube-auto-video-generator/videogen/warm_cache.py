@@ -0,0 +1,210 @@
+"""
+Module-scope cache of decoded secrets and API clients that survives warm Lambda invocations
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_REGION = 'ap-northeast-1'
+
+# Secrets the Lambdas and tools read, as created by the setup-*.sh scripts
+OPENAI_SECRET_ID = 'youtube-auto-video-generator/openai-api-key'
+SHEETS_SECRET_ID = 'youtube-auto-video-generator/google-sheets-api'
+YOUTUBE_SECRET_ID = 'youtube-auto-video-generator/youtube-api'
+
+# Secrets are re-read at most this often; rotation takes effect within it
+DEFAULT_TTL_SECONDS = int(os.environ.get('SECRETS_CACHE_TTL_SECONDS', 60 * 60))
+# Entries this close to expiry are refreshed in the background while
+# callers keep using the cached value
+DEFAULT_REFRESH_AHEAD_SECONDS = 5 * 60
+
+# Statuses an API answers when the credential it was given is no longer valid
+AUTH_FAILURE_STATUSES = (401,)
+AUTH_FAILURE_ERRORS = ('RefreshError', 'AuthenticationError')
+
+
+def is_auth_failure(e):
+    """Whether ``e`` says the credential was rejected, as opposed to any other failure"""
+    status = getattr(e, 'status', None)
+    if status is None:
+        status = getattr(getattr(e, 'resp', None), 'status', None)
+    return status in AUTH_FAILURE_STATUSES or type(e).__name__ in AUTH_FAILURE_ERRORS
+
+
+class WarmCache:
+    """Values loaded once and reused until ``ttl_seconds`` have passed.
+
+    ``get(key, loader)`` only calls ``loader()`` when there is no value
+    or it has expired; concurrent callers wait for a single load. Once
+    a value is within ``refresh_ahead_seconds`` of expiring, the first
+    caller starts one background reload and everyone keeps getting the
+    current value until it lands; a failed background reload leaves the
+    value in place to be retried on a later call. ``invalidate`` drops
+    values immediately, e.g. after a credential is rejected.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, refresh_ahead_seconds=DEFAULT_REFRESH_AHEAD_SECONDS,
+                 clock=time.monotonic, background=True):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self.clock = clock
+        self.background = background
+        self.stats = {'hits': 0, 'loads': 0, 'refreshes': 0, 'refresh_failures': 0, 'invalidations': 0}
+        self._entries = {}
+        self._refreshing = {}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None or self.clock() - entry[1] >= self.ttl_seconds:
+            return None
+        return entry
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.stats['refresh_failures'] += 1
+        else:
+            self._store(key, value)
+            with self._lock:
+                self.stats['refreshes'] += 1
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.stats['hits'] += 1
+                if (self.background and self.clock() - entry[1] >= self.ttl_seconds - self.refresh_ahead_seconds
+                        and key not in self._refreshing):
+                    thread = threading.Thread(target=self._refresh, args=(key, loader), daemon=True)
+                    self._refreshing[key] = thread
+                    thread.start()
+                return entry[0]
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    # Loaded by the caller we waited for
+                    self.stats['hits'] += 1
+                    return entry[0]
+            value = loader()
+            self._store(key, value)
+            with self._lock:
+                self.stats['loads'] += 1
+            return value
+
+    def invalidate(self, key=None):
+        """Forget ``key``, or everything"""
+        with self._lock:
+            if key is None:
+                self.stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def wait(self):
+        """Block until background refreshes finish (for tests and shutdown)"""
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join()
+
+
+def decode_secret(response):
+    """A ``GetSecretValue`` response as a dict (JSON), str or bytes"""
+    if 'SecretString' in response:
+        try:
+            return json.loads(response['SecretString'])
+        except ValueError:
+            return response['SecretString']
+    return response['SecretBinary']
+
+
+class SecretCache:
+    """Decoded Secrets Manager secrets and the API clients built from them.
+
+    ``secret(secret_id)`` makes one ``GetSecretValue`` call per TTL;
+    ``client(name, secret_id, factory)`` builds ``factory(secret)``
+    once and rebuilds it only when a re-read secret has changed.
+    ``call`` runs an operation on such a client and, if the credential
+    is rejected, invalidates the secret and client and tries once more
+    with freshly read ones. The Secrets Manager client itself is
+    created on first use.
+    """
+
+    def __init__(self, secrets_client=None, cache=None, region=DEFAULT_REGION):
+        self._secrets_client = secrets_client
+        self.region = region
+        self.cache = cache or WarmCache()
+        self.stats = {'clients_built': 0}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def secrets_client(self):
+        with self._lock:
+            if self._secrets_client is None:
+                import boto3
+                self._secrets_client = boto3.client('secretsmanager', region_name=self.region)
+            return self._secrets_client
+
+    def secret(self, secret_id):
+        return self.cache.get(secret_id, lambda: decode_secret(
+            self.secrets_client.get_secret_value(SecretId=secret_id)
+        ))
+
+    def client(self, name, secret_id, factory):
+        secret = self.secret(secret_id)
+        with self._lock:
+            built = self._clients.get((name, secret_id))
+            # A refresh that returns the same secret keeps the client
+            if built is None or built[0] != secret:
+                built = (secret, factory(secret))
+                self._clients[(name, secret_id)] = built
+                self.stats['clients_built'] += 1
+            return built[1]
+
+    def invalidate(self, secret_id):
+        """Drop a secret and every client built from it"""
+        self.cache.invalidate(secret_id)
+        with self._lock:
+            for key in [key for key in self._clients if key[1] == secret_id]:
+                del self._clients[key]
+
+    def call(self, name, secret_id, factory, operation):
+        """``operation(client)``, retried once with a re-read secret if it is rejected"""
+        try:
+            return operation(self.client(name, secret_id, factory))
+        except Exception as e:
+            if not is_auth_failure(e):
+                raise
+            self.invalidate(secret_id)
+            return operation(self.client(name, secret_id, factory))
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The process-wide ``SecretCache``, kept at module scope across warm invocations"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SecretCache()
+        return _default
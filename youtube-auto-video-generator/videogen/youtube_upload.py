@@ -0,0 +1,276 @@
+"""
+Resumable, chunked YouTube uploads whose session survives Lambda retries
+"""
+import http.client
+import json
+import os
+import random
+import re
+import time
+from urllib.parse import urljoin, urlsplit
+
+from videogen.aws_errors import NOT_FOUND_CODES, error_code
+from videogen.s3_transfer import download_file
+
+UPLOAD_URL = ('https://www.googleapis.com/upload/youtube/v3/videos'
+              '?uploadType=resumable&part=snippet,status')
+
+# The resumable protocol requires every chunk but the last to be a
+# multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 32 * CHUNK_ALIGNMENT
+
+SESSION_PREFIX = 'youtube-sessions/'
+
+RESUME_INCOMPLETE = 308
+RETRYABLE_STATUSES = (500, 502, 503, 504)
+# The session URI is gone; start over with a new one
+EXPIRED_STATUSES = (404, 410)
+
+# The sheet separates keywords with spaces; commas (and their full-width
+# forms) are accepted too
+KEYWORD_SEPARATORS = re.compile(r'[\s,、，]+')
+
+
+def _error_reason(body):
+    """``error.errors[0].reason`` of a Google API error body, if any"""
+    try:
+        return json.loads(body)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class UploadError(Exception):
+    """The upload server rejected the request in a way retrying will not fix"""
+
+    def __init__(self, status, body):
+        super().__init__(f"YouTube upload failed with HTTP {status}: {body[:500]}")
+        self.status = status
+        self.reason = _error_reason(body)
+
+
+class UploadInterrupted(Exception):
+    """Transient failures outlasted the retries; the saved session can be resumed"""
+
+
+class _SessionExpired(Exception):
+    def __init__(self, status, body):
+        super().__init__(status)
+        self.status = status
+        self.body = body
+
+
+def _request(method, url, headers=None, body=None, timeout=60):
+    """Send one HTTP request; returns ``(status, headers, body)``"""
+    parts = urlsplit(url)
+    connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                        else http.client.HTTPConnection)
+    connection = connection_class(parts.netloc, timeout=timeout)
+    try:
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, response.read()
+    finally:
+        connection.close()
+
+
+def _committed_offset(headers):
+    """Bytes the server holds, from a 308 ``Range: bytes=0-N`` header"""
+    value = headers.get('range')
+    if not value:
+        return 0
+    return int(value.rsplit('-', 1)[1]) + 1
+
+
+class UploadSessionStore:
+    """Keep resumable session URIs and offsets in S3, one object per video.
+
+    The key is derived from the video's S3 key, so a retried Lambda, or a
+    later Step Functions attempt for the same video, finds the session
+    the previous attempt opened.
+    """
+
+    def __init__(self, s3_client, bucket, prefix=SESSION_PREFIX):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, session_key):
+        return f"{self.prefix}{session_key}.json"
+
+    def load(self, session_key):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(session_key))
+        except Exception as e:
+            if error_code(e) in NOT_FOUND_CODES:
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def save(self, session_key, session):
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(session_key),
+                           Body=json.dumps(session).encode('utf-8'),
+                           ContentType='application/json')
+
+    def delete(self, session_key):
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(session_key))
+
+
+class ResumableUploader:
+    """Upload a file with the YouTube resumable upload protocol.
+
+    ``access_token`` is a string or a callable returning one, so a
+    refreshed OAuth token can be used for later chunks. Each chunk is
+    one PUT; after every chunk the offset the server reports is saved
+    to ``store``. Transient failures (5xx, dropped connections) ask the
+    server for its offset and carry on from there, up to ``max_retries``
+    times in a row; after that ``UploadInterrupted`` is raised and the
+    saved session lets the next attempt resume instead of starting from
+    byte zero. An expired session (404/410) is replaced by a new one up
+    to ``max_restarts`` times, then ``UploadError`` is raised.
+    """
+
+    def __init__(self, access_token, store=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 upload_url=UPLOAD_URL, max_retries=5, max_restarts=2, base_delay=1.0, max_delay=32.0,
+                 sleep=time.sleep, request=_request):
+        if chunk_size <= 0 or chunk_size % CHUNK_ALIGNMENT:
+            raise ValueError(f"chunk_size must be a positive multiple of {CHUNK_ALIGNMENT} bytes")
+        self.access_token = access_token
+        self.store = store
+        self.chunk_size = chunk_size
+        self.upload_url = upload_url
+        self.max_retries = max_retries
+        self.max_restarts = max_restarts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.request = request
+        self.stats = {'sessions': 0, 'chunks': 0, 'bytes_sent': 0, 'retries': 0, 'resumed_from': 0}
+
+    def _auth(self):
+        value = self.access_token() if callable(self.access_token) else self.access_token
+        return {'Authorization': f"Bearer {value}"}
+
+    def start_session(self, metadata, size, content_type='video/mp4'):
+        """Open an upload session and return its URI"""
+        body = json.dumps(metadata).encode('utf-8')
+        status, headers, response = self.request('POST', self.upload_url, dict(
+            self._auth(),
+            **{'Content-Type': 'application/json; charset=UTF-8',
+               'X-Upload-Content-Length': str(size),
+               'X-Upload-Content-Type': content_type},
+        ), body)
+        if status != 200 or 'location' not in headers:
+            raise UploadError(status, response.decode('utf-8', 'replace'))
+        self.stats['sessions'] += 1
+        return urljoin(self.upload_url, headers['location'])
+
+    def _check(self, status, headers, response):
+        """Offset to continue from, or the finished video resource"""
+        if status == RESUME_INCOMPLETE:
+            return _committed_offset(headers), None
+        if status in (200, 201):
+            return None, json.loads(response)
+        if status in EXPIRED_STATUSES:
+            raise _SessionExpired(status, response.decode('utf-8', 'replace'))
+        if status in RETRYABLE_STATUSES:
+            raise ConnectionError(f"HTTP {status}")
+        raise UploadError(status, response.decode('utf-8', 'replace'))
+
+    def query_offset(self, session_uri, size):
+        """Ask the server how much of the file it already has"""
+        return self._check(*self.request('PUT', session_uri, dict(
+            self._auth(), **{'Content-Length': '0', 'Content-Range': f"bytes */{size}"}
+        )))
+
+    def _send_chunk(self, session_uri, f, offset, size):
+        length = min(self.chunk_size, size - offset)
+        f.seek(offset)
+        data = f.read(length)
+        self.stats['chunks'] += 1
+        self.stats['bytes_sent'] += length
+        return self._check(*self.request('PUT', session_uri, dict(
+            self._auth(),
+            **{'Content-Length': str(length),
+               'Content-Range': f"bytes {offset}-{offset + length - 1}/{size}"},
+        ), data))
+
+    def _save(self, session_key, session):
+        if self.store and session_key:
+            self.store.save(session_key, session)
+
+    def upload(self, path, metadata, session_key=None, content_type='video/mp4'):
+        """Upload ``path``; returns the video resource YouTube creates.
+
+        With a ``store`` and ``session_key``, an unfinished session saved
+        by an earlier attempt for the same file is resumed.
+        """
+        size = os.path.getsize(path)
+        session = self.store.load(session_key) if self.store and session_key else None
+        if session and session.get('size') != size:
+            session = None
+
+        with open(path, 'rb') as f:
+            failures = restarts = 0
+            offset, video = None, None
+            while video is None:
+                try:
+                    if session is None:
+                        session = {'sessionUri': self.start_session(metadata, size, content_type),
+                                   'size': size, 'offset': 0}
+                        self._save(session_key, session)
+                        offset = 0
+                    elif offset is None:
+                        offset, video = self.query_offset(session['sessionUri'], size)
+                        self.stats['resumed_from'] = offset or 0
+                        continue
+                    offset, video = self._send_chunk(session['sessionUri'], f, offset, size)
+                    failures = 0
+                    if video is None:
+                        session['offset'] = offset
+                        self._save(session_key, session)
+                except _SessionExpired as e:
+                    restarts += 1
+                    if restarts > self.max_restarts:
+                        raise UploadError(e.status, f"session expired {restarts} times: {e.body}") from e
+                    session, offset = None, None
+                except (ConnectionError, OSError, http.client.HTTPException) as e:
+                    failures += 1
+                    if failures > self.max_retries:
+                        offset = session['offset'] if session else 0
+                        raise UploadInterrupted(
+                            f"Upload of {path} interrupted at byte {offset} of {size}: {e}"
+                        ) from e
+                    self.stats['retries'] += 1
+                    # The server may have kept part of the chunk, so ask before resending
+                    offset = None
+                    self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** failures)))
+
+        if self.store and session_key:
+            self.store.delete(session_key)
+        return video
+
+
+def video_metadata(video, privacy_status='unlisted'):
+    """``videos.insert`` body for a composed video"""
+    return {
+        'snippet': {
+            'title': video['title'],
+            'description': video.get('description', ''),
+            'tags': [tag for tag in KEYWORD_SEPARATORS.split(video.get('keywords', '')) if tag],
+            'categoryId': '22',
+            'defaultLanguage': 'ja',
+        },
+        'status': {'privacyStatus': privacy_status, 'embeddable': True},
+    }
+
+
+def upload_composed_video(s3_client, video_bucket, video, uploader, workdir='/tmp'):
+    """Fetch a composed MP4 from S3 and upload it, resuming any earlier session"""
+    path = os.path.join(workdir, os.path.basename(video['videoS3Key']))
+    download_file(s3_client, video_bucket, video['videoS3Key'], path)
+    try:
+        return uploader.upload(path, video_metadata(video), session_key=video['videoS3Key'])
+    finally:
+        os.remove(path)